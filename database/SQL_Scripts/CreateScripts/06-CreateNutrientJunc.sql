@@ -4,7 +4,7 @@ CREATE TABLE IF NOT EXISTS nutrition_junc(
     nut_junc_id INT UNSIGNED PRIMARY KEY,
     item_id INT NOT NULL,
     nutrient_id INT NOT NULL,
-    alt_id INT NOT NULL,
+    alt_id INT,
     cat_id INT NOT NULL,
     ammount FLOAT,
     unit_id INT NOT NULL,
@@ -0,0 +1,338 @@
+import argparse
+import contextlib
+import dataclasses
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'scrapers'))
+
+import pandas as pd
+import bs4
+import nut_scrape
+import parsers
+import item_extract
+import storage
+
+# Offline benchmarks of the nutrition scraper. Every stage runs on the fixture pages in FIXTURES_DIR or on synthetic
+# tables in a temp directory, nothing is fetched. Results are written as JSON and can be compared against an earlier
+# run with --compare, which exits with 1 when a stage got slower than --tolerance allows.
+#
+#   python bench_scrape.py --output bench.json
+#   python bench_scrape.py --compare bench.json --sizes 10000
+
+LISTING_FIXTURE = os.path.join(FIXTURES_DIR, 'listing_page.html')
+ITEM_FIXTURE = os.path.join(FIXTURES_DIR, 'item_page.html')
+ITERATIONS = 500
+REPEAT = 5
+DATASET_SIZES = [10000, 100000, 1000000]
+#items per write_data call while the synthetic datasets are built, bounds the memory the 1M set needs
+WRITE_CHUNK_ITEMS = 50000
+TOLERANCE = 0.15
+
+
+def read_fixture(path: str) -> str:
+    with open(path, 'r') as file:
+        return file.read()
+
+def best_of(repeat: int, run) -> float:
+    """
+    Runs `run` `repeat` times and returns the fastest time in seconds. `run` is called with no arguments and
+    may return a callable, in which case only that callable is timed, so the setup of each run is not counted.
+    """
+    best = None
+    for _ in range(repeat):
+        timed = run()
+        if callable(timed):
+            start = time.perf_counter()
+            timed()
+            seconds = time.perf_counter() - start
+        else:
+            seconds = timed
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+def result(seconds: float, count: int, unit: str) -> dict:
+    """
+    Builds the JSON entry of a timed stage.
+
+    Parameters:
+        seconds (float): Time taken for `count` units.
+        count (int): Number of units processed, e.g. pages or items.
+        unit (str): What was counted.
+    """
+    return {'seconds': round(seconds, 6), 'count': count, 'unit': unit,
+            'per_second': round(count / seconds, 2) if seconds > 0 else None,
+            'ms_per_unit': round(seconds * 1000 / count, 4) if count else None}
+
+def use_temp_tables(data_dir: str) -> dict:
+    """
+    Points the scraper at an empty data directory and loads a fresh set of tables from it.
+    """
+    shutil.rmtree(data_dir, ignore_errors=True)
+    nut_scrape.use_data_dir(data_dir)
+    tables, restart = nut_scrape.load_tables()
+    return tables
+
+def unique_records(record: item_extract.ItemRecord, count: int) -> list:
+    """
+    Copies of `record` with distinct names and UPCs, so none of them is rejected as a duplicate.
+    """
+    return [dataclasses.replace(record, name=record.name + ' ' + str(i), upc=str(i).zfill(12),
+                                measures=list(record.measures), nutrients=dict(record.nutrients)) for i in range(count)]
+
+def bench_stages(work_dir: str, iterations: int, repeat: int, partial: bool) -> dict:
+    """
+    Times each stage of handling a listing page and an item page on the fixture pages.
+
+    Parameters:
+        work_dir (str): Scratch directory for the tables.
+        iterations (int): Pages or items handled per timed run.
+        repeat (int): Timed runs per stage, the fastest counts.
+        partial (bool): Parse only the regions the extractors read, see `nut_scrape.PARTIAL_PARSE`.
+
+    Returns:
+        dict: The result of each stage, see `result`.
+    """
+    backend = nut_scrape.PARSER_BACKEND
+    listing_html = read_fixture(LISTING_FIXTURE)
+    item_html = read_fixture(ITEM_FIXTURE)
+    listing_regions = parsers.LISTING_PAGE if partial else None
+    item_regions = parsers.ITEM_PAGE if partial else None
+    stages = {}
+
+    listing_bs = parsers.parse(listing_html, backend, listing_regions)
+    links = len(nut_scrape.get_table_links(listing_bs))
+    seconds = best_of(repeat, lambda: lambda: [parsers.parse(listing_html, backend, listing_regions) for _ in range(iterations)])
+    stages['parse_listing_page'] = result(seconds, iterations, 'pages')
+    seconds = best_of(repeat, lambda: lambda: [nut_scrape.get_table_links(listing_bs) for _ in range(iterations)])
+    stages['get_table_links'] = result(seconds, iterations * links, 'links')
+
+    item_bs = parsers.parse(item_html, backend, item_regions)
+    seconds = best_of(repeat, lambda: lambda: [parsers.parse(item_html, backend, item_regions) for _ in range(iterations)])
+    stages['parse_item_page'] = result(seconds, iterations, 'items')
+    #covers what get_nutrients did before the item page was extracted in one pass
+    seconds = best_of(repeat, lambda: lambda: [item_extract.extract_item(item_bs) for _ in range(iterations)])
+    stages['extract_item'] = result(seconds, iterations, 'items')
+    record = item_extract.extract_item(item_bs)
+
+    def gather():
+        tables = use_temp_tables(os.path.join(work_dir, 'stages'))
+        records = unique_records(record, iterations)
+        def run():
+            for rec in records:
+                nut_scrape.gather_item_info(rec, tables['items'], tables['unit_lu'], tables['item_index'])
+        return run
+    stages['gather_item_info'] = result(best_of(repeat, gather), iterations, 'items')
+
+    def measures():
+        tables = use_temp_tables(os.path.join(work_dir, 'stages'))
+        def run():
+            for item_id in range(1, iterations + 1):
+                nut_scrape.get_other_measures(record, item_id, tables['conversion_junc'], tables['unit_lu'])
+        return run
+    stages['get_other_measures'] = result(best_of(repeat, measures), iterations, 'items')
+
+    def nutrients():
+        tables = use_temp_tables(os.path.join(work_dir, 'stages'))
+        def run():
+            for item_id in range(1, iterations + 1):
+                nut_scrape.insert_nutrients(tables['nutrient_lu'], tables['nutrient_category_lu'], tables['nutrient_junc'],
+                                            tables['unit_lu'], record.nutrients, item_id)
+        return run
+    stages['insert_nutrients'] = result(best_of(repeat, nutrients), iterations, 'items')
+
+    def whole_item():
+        tables = use_temp_tables(os.path.join(work_dir, 'stages'))
+        def run():
+            for i in range(iterations):
+                rec = item_extract.extract_html(item_html, backend, partial)
+                rec.name, rec.upc = rec.name + ' ' + str(i), str(i).zfill(12)
+                nut_scrape.process_item(rec, tables)
+        return run
+    stages['item_page_total'] = result(best_of(repeat, whole_item), iterations, 'items')
+
+    return stages
+
+def template_rows(record: item_extract.ItemRecord, data_dir: str) -> tuple[dict, dict]:
+    """
+    Runs the fixture item through the scraper once and returns its rows as the template of the synthetic items.
+
+    Returns:
+        tuple[dict, dict]:
+            - tables (dict): The tables holding the lookups the template rows point to.
+            - rows (dict): The item, conversion and nutrient rows of the item, column-wise, keyed like `BUFFER_TABLES`.
+    """
+    tables = use_temp_tables(data_dir)
+    nut_scrape.process_item(record, tables)
+    rows = {name: tables[name].rows_since(0) for name in nut_scrape.BUFFER_TABLES}
+    for name in nut_scrape.BUFFER_TABLES:
+        tables[name].clear()
+        tables[name].ids.next_id = 1
+    return tables, rows
+
+def fill_buffers(tables: dict, rows: dict, first: int, count: int):
+    """
+    Buffers `count` synthetic items copied from the template rows, numbered from `first` for their names and UPCs.
+    """
+    item_ids = list(tables['items'].ids.reserve(count))
+    for name in nut_scrape.BUFFER_TABLES:
+        buffer = tables[name]
+        template = rows[name]
+        per_item = len(template[buffer.columns[0]])
+        columns = {}
+        for col in buffer.columns:
+            if col == buffer.columns[0] and name != 'items':
+                columns[col] = list(buffer.ids.reserve(count * per_item))
+            elif col == 'item_id':
+                columns[col] = item_ids if name == 'items' else [i for i in item_ids for _ in range(per_item)]
+            elif name == 'items' and col == 'name':
+                columns[col] = [template[col][0] + ' ' + str(i) for i in range(first, first + count)]
+            elif name == 'items' and col == 'upc':
+                columns[col] = [str(i).zfill(12) for i in range(first, first + count)]
+            else:
+                columns[col] = template[col] * count
+        buffer.extend(columns)
+
+def bench_dataset(record: item_extract.ItemRecord, work_dir: str, size: int) -> dict:
+    """
+    Builds a synthetic dataset of `size` items and times writing it and restarting on it.
+
+    Parameters:
+        record (item_extract.ItemRecord): The fixture item every synthetic item is copied from.
+        work_dir (str): Scratch directory for the tables.
+        size (int): Number of items.
+
+    Returns:
+        dict: The results of:
+            - 'write_data': Writing all `size` items through `write_data`, `WRITE_CHUNK_ITEMS` items per call.
+            - 'write_checkpoint': One more `JOURNAL_CHECKPOINT_ITEMS` item write with the dataset on disk.
+            - 'load_data_for_restart': Loading the lookups and ID state on restart.
+            - 'load_item_index': Building the duplicate index from the items table, the restart cost without a key file.
+            - 'read_items': Reading the whole items table.
+    """
+    data_dir = os.path.join(work_dir, 'dataset_' + str(size))
+    tables, rows = template_rows(record, data_dir)
+    written = {}
+
+    seconds = 0
+    for first in range(0, size, WRITE_CHUNK_ITEMS):
+        count = min(WRITE_CHUNK_ITEMS, size - first)
+        fill_buffers(tables, rows, first, count)
+        start = time.perf_counter()
+        nut_scrape.write_data(tables['items'], tables['unit_lu'], tables['conversion_junc'], tables['nutrient_lu'],
+                              tables['nutrient_category_lu'], tables['nutrient_junc'])
+        seconds += time.perf_counter() - start
+    written['write_data'] = result(seconds, size, 'items')
+
+    count = nut_scrape.JOURNAL_CHECKPOINT_ITEMS
+    fill_buffers(tables, rows, size, count)
+    start = time.perf_counter()
+    nut_scrape.write_data(tables['items'], tables['unit_lu'], tables['conversion_junc'], tables['nutrient_lu'],
+                          tables['nutrient_category_lu'], tables['nutrient_junc'])
+    written['write_checkpoint'] = result(time.perf_counter() - start, count, 'items')
+
+    start = time.perf_counter()
+    nut_scrape.load_data_for_restart()
+    written['load_data_for_restart'] = result(time.perf_counter() - start, size + count, 'items')
+
+    if os.path.exists(nut_scrape.ITEM_INDEX_PATH):
+        os.remove(nut_scrape.ITEM_INDEX_PATH)
+    start = time.perf_counter()
+    nut_scrape.load_item_index()
+    written['load_item_index'] = result(time.perf_counter() - start, size + count, 'items')
+
+    start = time.perf_counter()
+    storage.read_table(nut_scrape.ITEMS_PATH)
+    written['read_items'] = result(time.perf_counter() - start, size + count, 'items')
+
+    written['rows'] = {name: size * len(rows[name][tables[name].columns[0]]) for name in nut_scrape.BUFFER_TABLES}
+    shutil.rmtree(data_dir, ignore_errors=True)
+    return written
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Lists the results that got slower than `baseline` by more than `tolerance`, e.g. 0.15 for 15%.
+
+    Returns:
+        list: One message per regression, empty if there are none.
+    """
+    regressions = []
+    pairs = [(name, current['stages'].get(name), entry) for name, entry in baseline.get('stages', {}).items()]
+    for size, entries in baseline.get('datasets', {}).items():
+        for name, entry in entries.items():
+            if isinstance(entry, dict) and 'per_second' in entry:
+                pairs.append((name + ' @ ' + size, current.get('datasets', {}).get(size, {}).get(name), entry))
+
+    for name, now, before in pairs:
+        if not now or not now.get('per_second') or not before.get('per_second'):
+            continue
+        change = now['per_second'] / before['per_second'] - 1
+        if change < -tolerance:
+            regressions.append('%s: %.2f -> %.2f %s/s (%.1f%%)' % (name, before['per_second'], now['per_second'], now['unit'], change * 100))
+    return regressions
+
+def main(args) -> int:
+    nut_scrape.STORAGE_BACKEND = args.backend
+    nut_scrape.PARSER_BACKEND = args.parser
+    nut_scrape.CACHE_PAGES = False
+    storage.set_backend(args.backend)
+
+    work_dir = tempfile.mkdtemp(prefix='nut_bench_')
+    report = {'meta': {'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 'python': platform.python_version(),
+                       'platform': platform.platform(), 'pandas': pd.__version__, 'bs4': bs4.__version__,
+                       'parser_backend': args.parser, 'partial_parse': not args.full_parse, 'storage_backend': args.backend,
+                       'iterations': args.iterations, 'repeat': args.repeat},
+              'stages': {}, 'datasets': {}}
+    try:
+        #the scraper prints a line for every row it adds, which would be timed as well
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            report['stages'] = bench_stages(work_dir, args.iterations, args.repeat, not args.full_parse)
+        for name, entry in report['stages'].items():
+            print('%-24s %12.1f %s/s' % (name, entry['per_second'], entry['unit']))
+
+        record = item_extract.extract_html(read_fixture(ITEM_FIXTURE), args.parser)
+        for size in args.sizes:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                report['datasets'][str(size)] = bench_dataset(record, work_dir, size)
+            for name, entry in report['datasets'][str(size)].items():
+                if 'per_second' in entry:
+                    print('%-24s %12.1f %s/s  %8.3fs  @ %d items' % (name, entry['per_second'], entry['unit'], entry['seconds'], size))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print('Results written to', args.output)
+
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        for message in regressions:
+            print('REGRESSION', message)
+        if regressions:
+            return 1
+        print('No regressions against', args.compare)
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks the nutrition scraper offline')
+    parser.add_argument('--output', help='JSON file the results are written to')
+    parser.add_argument('--compare', metavar='BASELINE', help='JSON results of an earlier run to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='slowdown allowed by --compare, 0.15 is 15%%')
+    parser.add_argument('--sizes', type=int, nargs='*', default=DATASET_SIZES, help='synthetic dataset sizes in items')
+    parser.add_argument('--iterations', type=int, default=ITERATIONS, help='pages or items per timed stage run')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='timed runs per stage, the fastest counts')
+    parser.add_argument('--backend', choices=sorted(storage.EXTENSIONS), default=nut_scrape.STORAGE_BACKEND, help='file format of the tables')
+    parser.add_argument('--parser', choices=parsers.BACKENDS, default=nut_scrape.PARSER_BACKEND, help='HTML tree builder')
+    parser.add_argument('--full-parse', action='store_true', help='build the whole page instead of only the regions read')
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,107 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+import aiohttp
+import fetchers
+
+
+class TokenBucket:
+    """
+    Token bucket limiting the requests per second of every coroutine sharing it.
+
+    Parameters:
+        rate (float): Tokens added per second, 0 or less disables limiting.
+        capacity (float): Most tokens the bucket can hold, this is the largest burst allowed.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """
+        Waits until a token is available and takes it.
+        """
+        if self.rate <= 0:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncHttpFetcher:
+    """
+    Fetches pages concurrently over one aiohttp session. The number of requests in flight is bounded
+    by a semaphore and the request rate by a `TokenBucket`.
+
+    Parameters:
+        concurrency (int): Most requests in flight at once.
+        rate (float): Requests per second allowed, 0 or less disables limiting.
+        timeout (float): Seconds to wait for a page before giving up.
+        fallback: Optional blocking fetcher, e.g. `fetchers.SeleniumFetcher`, used when a page that was served
+                  fails `fetchers.page_looks_complete`. It runs on background threads.
+        fallback_workers (int): Background threads of the fallback, e.g. the browsers of its pool.
+
+    Notes:
+        - Must be used as an async context manager so the session is opened and closed on the running loop.
+    """
+
+    def __init__(self, concurrency: int = 100, rate: float = 20, timeout: float = 15, fallback=None,
+                 fallback_workers: int = 1):
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, capacity=max(rate, 1))
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.fallback = fallback
+        self.fallback_pool = ThreadPoolExecutor(max_workers=fallback_workers) if fallback else None
+        self.semaphore = None
+        self.session = None
+
+    async def __aenter__(self):
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        self.session = aiohttp.ClientSession(headers=fetchers.HTTP_HEADERS, timeout=self.timeout, connector=connector)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+        if self.fallback:
+            self.fallback_pool.shutdown()
+            self.fallback.close()
+
+    async def fetch(self, url: str) -> str:
+        """
+        Retrieves the html of a page.
+
+        Parameters:
+            url (str): The URL of the webpage to retrieve.
+
+        Returns:
+            str: The html of the page, a closed document without any markers is returned as it is, see
+                 `fetchers.FallbackFetcher`.
+
+        Raises:
+            aiohttp.ClientError: If the page can't be reached or the server answers with an error status.
+            fetchers.IncompletePage: If the document of the fallback was not served to the end.
+        """
+        async with self.semaphore:
+            await self.bucket.acquire()
+            async with self.session.get(url) as response:
+                response.raise_for_status()
+                html = await response.text()
+        if not self.fallback or fetchers.page_looks_complete(html):
+            return html
+
+        loop = asyncio.get_running_loop()
+        html = await loop.run_in_executor(self.fallback_pool, self.fallback.fetch, url)
+        if not fetchers.page_looks_complete(html) and not fetchers.document_closed(html):
+            raise fetchers.IncompletePage(url)
+        return html
@@ -0,0 +1,23 @@
+import argparse
+import os
+import storage
+
+DATA_PATH = '/home/bg-labs/bg_labs/fms/database/nutrition/data/'
+
+# Converts every nutrition table, segments included, from one storage backend to the other.
+# The source files are kept so the conversion can be checked before they are removed.
+parser = argparse.ArgumentParser(description='Converts the nutrition tables between storage backends')
+parser.add_argument('--source', choices=sorted(storage.EXTENSIONS), default='csv', help='backend the tables are stored in')
+parser.add_argument('--target', choices=sorted(storage.EXTENSIONS), default='parquet', help='backend to convert the tables to')
+parser.add_argument('--data', default=DATA_PATH, help='directory holding the tables')
+args = parser.parse_args()
+
+for table in storage.TABLE_SCHEMAS:
+    path = os.path.join(args.data, table + '.csv')
+    if not storage.table_exists(path, args.source):
+        print('Skipping', table, 'no', args.source, 'table found')
+        continue
+    rows = storage.convert_table(path, args.source, args.target)
+    before = sum(os.path.getsize(p) for p in storage.table_paths(path, args.source))
+    after = os.path.getsize(storage.backend_path(path, args.target))
+    print('Converted', table, rows, 'rows,', before, 'bytes ->', after, 'bytes')
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+import storage
+
+KEY_DTYPE = np.dtype('<u8')
+
+
+def item_key(name: str, brand: str) -> int:
+    """
+    Hashes an item's (name, brand) pair to a 64 bit key.
+    """
+    digest = hashlib.blake2b(('item\x1f' + str(name) + '\x1f' + str(brand)).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+def upc_key(upc: str) -> int:
+    """
+    Hashes a UPC to a 64 bit key.
+    """
+    digest = hashlib.blake2b(('upc\x1f' + str(upc)).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+def item_keys(name: str, brand: str, upc: str = '') -> list:
+    """
+    The keys of an item, its (name, brand) key and its UPC key if it has a UPC.
+    """
+    keys = [item_key(name, brand)]
+    if upc:
+        keys.append(upc_key(upc))
+    return keys
+
+
+class DedupIndex:
+    """
+    Set of every (name, brand) and UPC already scraped, kept across sessions. Keys are 64 bit hashes
+    held in a Python set and backed by an append-only binary file of little endian uint64.
+
+    Parameters:
+        path (str): Path of the key file.
+
+    Notes:
+        - With 64 bit keys a false duplicate needs a hash collision, which is negligible at our table sizes.
+        - New keys are only written by `flush`, which should run once the items they belong to are written.
+        - `shared` is set while crawling a frontier with other processes to its `claim`, see `claim`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.keys = set()
+        self.pending = []
+        self.shared = None
+
+    @classmethod
+    def load(cls, path: str, items_path: str) -> 'DedupIndex':
+        """
+        Loads the index from its key file. If the key file does not exist it is built once from the items table.
+
+        Parameters:
+            path (str): Path of the key file.
+            items_path (str): Path of the items table used to build a missing index.
+
+        Returns:
+            DedupIndex: The loaded index.
+        """
+        if not os.path.exists(path) and storage.table_exists(items_path):
+            return cls.build(path, storage.read_table(items_path, columns=['name', 'brand', 'upc']).fillna(''))
+        index = cls(path)
+        if os.path.exists(path):
+            index.keys = set(np.fromfile(path, dtype=KEY_DTYPE).tolist())
+        return index
+
+    @classmethod
+    def build(cls, path: str, items: pd.DataFrame) -> 'DedupIndex':
+        """
+        Builds the index of `items` and writes it to a new key file.
+
+        Parameters:
+            path (str): Path of the key file.
+            items (pd.DataFrame): The 'name', 'brand' and 'upc' of every item, without NaNs.
+
+        Returns:
+            DedupIndex: The built index.
+        """
+        index = cls(path)
+        for name, brand, upc in zip(items['name'], items['brand'], items['upc']):
+            index.add(name, brand, upc)
+        index.flush()
+        return index
+
+    def contains_item(self, name: str, brand: str) -> bool:
+        return item_key(name, brand) in self.keys
+
+    def contains_upc(self, upc: str) -> bool:
+        return bool(upc) and upc_key(upc) in self.keys
+
+    def add(self, name: str, brand: str, upc: str = ''):
+        """
+        Adds an item to the index.
+
+        Parameters:
+            name (str): Name of the item.
+            brand (str): Brand of the item, '' if it has none.
+            upc (str): UPC of the item, '' if it has none.
+        """
+        for key in item_keys(name, brand, upc):
+            if key not in self.keys:
+                self.keys.add(key)
+                self.pending.append(key)
+
+    def claim(self, claims: list) -> list:
+        """
+        Claims items for the pages they are scraped from in the index every process crawling a frontier shares,
+        see `frontier.Frontier.claim`. Only `shared` is asked, the local keys are checked by `contains_item`
+        and `contains_upc`.
+
+        Parameters:
+            claims (list): (keys, url) tuples, keys from `item_keys`.
+
+        Returns:
+            list: True for each item no other page claimed, always True without a `shared` index.
+        """
+        if self.shared is None:
+            return [True] * len(claims)
+        return self.shared(claims)
+
+    def flush(self):
+        """
+        Appends the keys added since the last flush to the key file.
+        """
+        if not self.pending:
+            return
+        with open(self.path, 'ab') as file:
+            np.array(self.pending, dtype=KEY_DTYPE).tofile(file)
+            file.flush()
+            os.fsync(file.fileno())
+        self.pending = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
@@ -0,0 +1,248 @@
+import requests
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from scraper_common import browser_pool
+
+HTTP_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:134.0) Gecko/20100101 Firefox/134.0',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+}
+
+#markers the extractors rely on, a page holding none of them was not fully served
+COMPLETE_PAGE_MARKERS = ('table_item_name', 'id="food-name"')
+#elements a browser waits for before its page is read, the listing links or the name of an item
+WAIT_SELECTOR = 'a.table_item_name, h1#food-name'
+
+
+class IncompletePage(Exception):
+    """
+    Raised when neither the primary nor the fallback fetcher returned a closed document, see `document_closed`.
+    Treated as transient by `retry.retryable`, the site may serve the page in full on a later try.
+    """
+
+    def __init__(self, url: str):
+        super().__init__('Incomplete page: ' + url)
+        self.url = url
+
+
+def document_closed(html: str) -> bool:
+    """
+    Checks whether the html returned for a page was served to the end.
+
+    Parameters:
+        html (str): The raw html of the page.
+
+    Returns:
+        bool: True if the closing </html> tag is in the last 512 characters.
+    """
+    return bool(html) and '</html>' in html[-512:].lower()
+
+def page_looks_complete(html: str) -> bool:
+    """
+    Checks whether the html returned for a page holds what the extractors need.
+
+    Parameters:
+        html (str): The raw html of the page.
+
+    Returns:
+        bool: True if the document is closed and contains at least one of `COMPLETE_PAGE_MARKERS`.
+    """
+    if not document_closed(html):
+        return False
+
+    return any(marker in html for marker in COMPLETE_PAGE_MARKERS)
+
+
+class HttpFetcher:
+    """
+    Fetches pages over a pooled keep-alive HTTP session.
+
+    Parameters:
+        pool_size (int): Number of connections kept alive per host.
+        timeout (float): Seconds to wait for the server before giving up on a request.
+    """
+
+    def __init__(self, pool_size: int = 10, timeout: float = 15):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(HTTP_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch(self, url: str) -> str:
+        """
+        Retrieves the html of a page.
+
+        Parameters:
+            url (str): The URL of the webpage to retrieve.
+
+        Returns:
+            str: The decoded html of the page.
+
+        Raises:
+            requests.HTTPError: If the server answers with an error status.
+        """
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.text
+
+    def close(self):
+        self.session.close()
+
+
+class SeleniumFetcher:
+    """
+    Fetches pages through Firefox, using the browsers of a `browser_pool.DriverPool`.
+
+    Parameters:
+        pool (browser_pool.DriverPool): Pool shared with other fetchers, which closes it. If None the fetcher
+                                        owns a pool of one browser, started on the first fetch.
+        wait_for (str): CSS selector of the elements waited for before the page is read, see `WAIT_SELECTOR`.
+    """
+
+    def __init__(self, pool: browser_pool.DriverPool = None, wait_for: str = WAIT_SELECTOR):
+        self.owns_pool = pool is None
+        self.pool = browser_pool.DriverPool() if pool is None else pool
+        self.wait_for = wait_for
+
+    def fetch(self, url: str) -> str:
+        """
+        Retrieves the rendered html of a page.
+
+        Parameters:
+            url (str): The URL of the webpage to retrieve.
+
+        Returns:
+            str: The page source once the browser shows the elements of `wait_for`, or after
+                 `browser_pool.WAIT_SECONDS` if it never does.
+        """
+        return self.pool.fetch(url, self.wait_for)
+
+    def close(self):
+        if self.owns_pool:
+            self.pool.close()
+
+
+class FallbackFetcher:
+    """
+    Fetches with `primary` and only falls back to `fallback` when the page the primary got does not pass the
+    `looks_complete` check. Errors of the primary, e.g. an error status or a timeout, are raised as they are so
+    the retries and the circuit breaker see them.
+
+    A closed document the fallback did not find any markers in either is returned as it is, e.g. the listing page
+    past the end of a letter, which holds no items. Only a page cut short by both fetchers is an error.
+
+    Parameters:
+        primary: A fetcher used for every page, normally an `HttpFetcher`.
+        fallback: A fetcher used when the primary result is unusable, normally a `SeleniumFetcher`.
+        looks_complete (callable): Takes the html and returns True if the page can be used.
+    """
+
+    def __init__(self, primary, fallback, looks_complete=page_looks_complete):
+        self.primary = primary
+        self.fallback = fallback
+        self.looks_complete = looks_complete
+        self.fallback_count = 0
+
+    def fetch(self, url: str) -> str:
+        """
+        Retrieves the html of a page, using the fallback fetcher only when needed.
+
+        Parameters:
+            url (str): The URL of the webpage to retrieve.
+
+        Returns:
+            str: The html of the page, which may hold nothing the extractors look for if it is a closed document.
+
+        Raises:
+            requests.RequestException: If the primary fetch fails, the fallback is not tried.
+            IncompletePage: If the document of the fallback was not served to the end.
+        """
+        html = self.primary.fetch(url)
+        if self.looks_complete(html):
+            return html
+
+        self.fallback_count += 1
+        html = self.fallback.fetch(url)
+        if not self.looks_complete(html) and not document_closed(html):
+            raise IncompletePage(url)
+        return html
+
+    def close(self):
+        self.primary.close()
+        self.fallback.close()
+
+
+class RateLimiter:
+    """
+    Spaces out requests so that all callers together stay under `max_per_second`.
+    Safe to share between worker threads.
+
+    Parameters:
+        max_per_second (float): The politeness limit, 0 or less disables limiting.
+    """
+
+    def __init__(self, max_per_second: float):
+        self.interval = 1 / max_per_second if max_per_second > 0 else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """
+        Blocks until the caller is allowed to send its next request.
+        """
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class RateLimitedFetcher:
+    """
+    Wraps a fetcher so each fetch first waits on a shared `RateLimiter`.
+
+    Parameters:
+        fetcher: The fetcher doing the actual work.
+        limiter (RateLimiter): The limiter shared by every worker.
+    """
+
+    def __init__(self, fetcher, limiter: RateLimiter):
+        self.fetcher = fetcher
+        self.limiter = limiter
+
+    def fetch(self, url: str) -> str:
+        self.limiter.wait()
+        return self.fetcher.fetch(url)
+
+    def close(self):
+        self.fetcher.close()
+
+
+def build_fetcher(mode: str = 'http', pool: browser_pool.DriverPool = None):
+    """
+    Builds the fetch backend used by the scrapers.
+
+    Parameters:
+        mode (str):
+            - 'http': pooled HTTP session with Selenium only as a fallback.
+            - 'selenium': every page goes through Firefox.
+        pool (browser_pool.DriverPool): Browsers shared by every fetcher, the fetcher starts its own if None.
+
+    Returns:
+        A fetcher exposing `fetch(url) -> str` and `close()`.
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    if mode == 'http':
+        return FallbackFetcher(HttpFetcher(), SeleniumFetcher(pool))
+    if mode == 'selenium':
+        return SeleniumFetcher(pool)
+    raise ValueError("Unknown fetch mode: " + mode)
@@ -1,12 +1,13 @@
 import pandas as pd
+import storage
 
-# Load lookup table and main data
-conv_junc = pd.read_csv('/home/bg-labs/bg_labs/fms/database/nutrition/data/conversion_junc.csv')
-unit_lu = pd.read_csv('/home/bg-labs/bg_labs/fms/database/nutrition/data/unit_lu.csv')
+# Load lookup table and main data, including the segments appended by the scraper
+conv_junc = storage.read_table('/home/bg-labs/bg_labs/fms/database/nutrition/data/conversion_junc.csv')
+unit_lu = storage.read_table('/home/bg-labs/bg_labs/fms/database/nutrition/data/unit_lu.csv')
 
 # Function to process the column
 def process_column(value):
-    if value == -1:
+    if not pd.isna(value) and value == -1:
         return 2
     else:
         return value
@@ -16,4 +17,4 @@ conv_junc['amt_unit'] = conv_junc['amt_unit'].apply(process_column)
 
 print(conv_junc.head())
 
-conv_junc.to_csv('/home/bg-labs/bg_labs/fms/database/nutrition/data/conversion_junc.csv', index=False)
\ No newline at end of file
+storage.replace_table('/home/bg-labs/bg_labs/fms/database/nutrition/data/conversion_junc.csv', conv_junc)
\ No newline at end of file
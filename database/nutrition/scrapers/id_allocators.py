@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import storage
+
+
+class IdAllocator:
+    """
+    Hands out increasing IDs in O(1). Safe to share between worker threads.
+
+    Parameters:
+        next_id (int): The first ID to hand out.
+    """
+
+    def __init__(self, next_id: int = 1):
+        self.next_id = next_id
+        self.lock = threading.Lock()
+
+    def next(self) -> int:
+        """
+        Returns the next free ID.
+        """
+        with self.lock:
+            id = self.next_id
+            self.next_id += 1
+        return id
+
+    def advance_past(self, id: int):
+        """
+        Makes sure `id` is never handed out, e.g. after replaying rows that already hold IDs.
+        """
+        with self.lock:
+            self.next_id = max(self.next_id, id + 1)
+
+    def reserve(self, count: int) -> range:
+        """
+        Reserves a block of IDs, e.g. for a parallel worker that allocates on its own.
+
+        Parameters:
+            count (int): Number of IDs to reserve.
+
+        Returns:
+            range: The reserved IDs.
+        """
+        with self.lock:
+            start = self.next_id
+            self.next_id += count
+        return range(start, start + count)
+
+
+class BlockAllocator(IdAllocator):
+    """
+    Hands out IDs from blocks taken from a shared source, e.g. a `frontier.Frontier`, so processes drawing from the
+    same source never hand out the same ID. IDs left in a block when the process ends leave a gap.
+
+    Parameters:
+        take_block (callable): Returns a range of fresh IDs, e.g. `functools.partial(frontier.allocate, 'item_id', 1000)`.
+    """
+
+    def __init__(self, take_block):
+        super().__init__()
+        self.take_block = take_block
+        self.block = iter(())
+
+    def next(self) -> int:
+        with self.lock:
+            id = next(self.block, None)
+            if id is None:
+                self.block = iter(self.take_block())
+                id = next(self.block)
+            self.next_id = max(self.next_id, id + 1)
+        return id
+
+    def reserve(self, count: int) -> list:
+        """
+        Reserves `count` IDs through `next`, so they may span two blocks and are not always contiguous.
+        """
+        return [self.next() for _ in range(count)]
+
+
+def seed_from_table(path: str, col: str) -> int:
+    """
+    Finds the first free ID of a table by reading only its ID column.
+
+    Parameters:
+        path (str): Path of the table's base file, its segments are read as well.
+        col (str): Name of the ID column.
+
+    Returns:
+        int: One more than the largest ID in the table, 1 if the table is missing or empty.
+    """
+    if not storage.table_exists(path):
+        return 1
+    ids = storage.read_table(path, columns=[col])[col]
+    return 1 if ids.empty else int(ids.max()) + 1
+
+def load_allocators(path: str, seeds: dict) -> dict:
+    """
+    Loads the ID allocators from the state file. Allocators missing from the file are seeded once
+    from their table so later restarts do not rescan the data.
+
+    Parameters:
+        path (str): Path of the JSON state file.
+        seeds (dict): Maps each ID column to the path of the table it is seeded from, e.g. {'item_id': ITEMS_PATH}.
+
+    Returns:
+        dict: Maps each ID column in `seeds` to its `IdAllocator`.
+    """
+    state = {}
+    if os.path.exists(path):
+        with open(path, 'r') as file:
+            state = json.load(file)
+
+    allocators = {}
+    for col, table_path in seeds.items():
+        next_id = state[col] if col in state else seed_from_table(table_path, col)
+        allocators[col] = IdAllocator(next_id)
+    return allocators
+
+def save_allocators(path: str, allocators: dict):
+    """
+    Writes the next free ID of every allocator to the state file. The file is replaced atomically.
+
+    Parameters:
+        path (str): Path of the JSON state file.
+        allocators (dict): Maps each ID column to its `IdAllocator`.
+    """
+    state = {col: allocator.next_id for col, allocator in allocators.items()}
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(state, file)
+    os.replace(tmp_path, path)
@@ -0,0 +1,297 @@
+import time
+from dataclasses import dataclass, field
+from bs4 import BeautifulSoup, Tag
+import parsers
+import units
+
+#option values that are generic weight conversions rather than item specific measures
+EXCLUDED_MEASURES = ('100 g', '1 g', '1 ounce = 28.3495 g', '1 pound = 453.592 g', '1 kg = 1000 g', 'custom g', 'custom oz')
+
+
+@dataclass
+class ItemRecord:
+    """
+    Everything the scraper keeps from one item page.
+
+    Attributes:
+        name (str): The item name.
+        brand (str): The brand, '' if the name has none.
+        NLEA_val (str): The value of the NLEA serving size.
+        NLEA_unit (str): The unit of the NLEA serving size.
+        ammount (str): The mass of the NLEA serving.
+        ammount_unit (str): The unit of `ammount`.
+        upc (str): The UPC digits, '' if the page has none.
+        ingredients (str): The ingredients, each followed by two spaces.
+        measures (list): The item specific measures as (value, unit, ammount, ammount unit) tuples.
+        nutrients (dict): Nutrient lines by category, 'Calories' first, in the layout `insert_nutrients` takes:
+                          {'Calories': ['Calories', 'kcal', amount, 'J', ''], category: [[name, alt, amount, unit, dv], ...]}
+    """
+    name: str = ''
+    brand: str = ''
+    NLEA_val: str = None
+    NLEA_unit: str = None
+    ammount: str = None
+    ammount_unit: str = None
+    upc: str = ''
+    ingredients: str = ''
+    measures: list = field(default_factory=list)
+    nutrients: dict = field(default_factory=dict)
+
+
+def extract_item(bs: BeautifulSoup) -> ItemRecord:
+    """
+    Extracts an item record from a parsed item page in a single pass over the document. Every tag is visited
+    once, the regions the scraper reads are handed to their handler and nothing outside them is searched again.
+
+    Parameters:
+        bs (BeautifulSoup): The parsed item page, whole or built with `parsers.ITEM_PAGE`.
+
+    Returns:
+        ItemRecord: The extracted record.
+
+    Raises:
+        ValueError:
+            - If the item name, the NLEA serving, the measure options or the calorie amount are missing.
+            - If a nutrient table has no category.
+            - If `bs` is None, e.g. the page could not be fetched.
+    """
+    if bs is None:
+        raise ValueError("No page source to extract")
+
+    state = {'record': ItemRecord(), 'calories': None, 'options': 0, 'groups': {}}
+    walk(bs, state)
+
+    record = state['record']
+    if not record.name:
+        raise ValueError("Can't Locate Name of Item", False)
+    if not state['options']:
+        raise ValueError("Mesures total option failed")
+    if record.NLEA_val is None:
+        raise ValueError("NLEA information not found on the page.")
+    if state['calories'] is None:
+        raise ValueError("Could Not Access Calorie Ammount")
+
+    record.nutrients = {'Calories': ['Calories', 'kcal', state['calories'], 'J', '']}
+    record.nutrients.update(state['groups'])
+    return record
+
+def extract_html(html: str, backend: str = None, partial: bool = True) -> ItemRecord:
+    """
+    Parses an item page and extracts its record. Takes and returns plain picklable values so it can run
+    in a parser worker process.
+
+    Parameters:
+        html (str): The page source, None if the page could not be fetched.
+        backend (str): The tree builder, see `parsers.parse`.
+        partial (bool): Only build the regions in `parsers.ITEM_PAGE`.
+
+    Returns:
+        ItemRecord: The extracted record.
+
+    Raises:
+        ValueError: If `html` is None or the page is missing a required region, see `extract_item`.
+    """
+    if html is None:
+        raise ValueError("No page source to extract")
+    return extract_item(parsers.parse(html, backend, parsers.ITEM_PAGE if partial else None))
+
+def extract_html_timed(html: str, backend: str = None, partial: bool = True) -> tuple[ItemRecord, float, float]:
+    """
+    `extract_html` that also returns how long parsing and extracting took, so a parser process can report
+    its timings back with the record.
+
+    Returns:
+        tuple[ItemRecord, float, float]: The record and the seconds spent parsing and extracting.
+
+    Raises:
+        ValueError: See `extract_html`.
+    """
+    if html is None:
+        raise ValueError("No page source to extract")
+    start = time.perf_counter()
+    bs = parsers.parse(html, backend, parsers.ITEM_PAGE if partial else None)
+    parsed = time.perf_counter()
+    record = extract_item(bs)
+    return record, parsed - start, time.perf_counter() - parsed
+
+def walk(tag: Tag, state: dict):
+    """
+    Visits the children of `tag`, handing each region to its handler and descending into everything else.
+    """
+    for child in tag.children:
+        if not isinstance(child, Tag):
+            continue
+        handler = region_handler(child)
+        if handler:
+            handler(child, state)
+        else:
+            walk(child, state)
+
+def region_handler(tag: Tag):
+    """
+    Returns the handler of the region `tag` starts, None if it is not one the scraper reads.
+    """
+    name = tag.name
+    if name == 'option':
+        return read_option
+    if name == 'div' and tag.get('class') == ['upc-digit']:
+        return read_upc_digit
+    if name == 'table':
+        classes = tag.get('class')
+        if classes == ['wide', 'results']:
+            return read_ingredients
+        if classes == ['center', 'wide', 'cellpadding3', 'nutrient', 'results']:
+            return read_nutrient_table
+    if name == 'h1' and tag.get('id') == 'food-name':
+        return read_name
+    if name == 'td' and tag.get('id') == 'calories':
+        return read_calories
+    return None
+
+def read_name(tag: Tag, state: dict):
+    record = state['record']
+    if record.name:
+        return
+    record.name, record.brand = split_name(tag.get_text())
+
+def read_option(tag: Tag, state: dict):
+    """
+    Reads a measure option. The selected one is the NLEA serving, the others are kept as measures unless excluded.
+    """
+    record = state['record']
+    state['options'] += 1
+    value = tag.get('value')
+    if tag.get('selected') == 'selected' and record.NLEA_val is None:
+        record.NLEA_val, record.NLEA_unit, record.ammount, record.ammount_unit = units.split_unit_value_and_ammount(value)
+    if value not in EXCLUDED_MEASURES:
+        record.measures.append(units.split_unit_value_and_ammount(value))
+
+def read_upc_digit(tag: Tag, state: dict):
+    state['record'].upc += tag.get_text()
+
+def read_ingredients(tag: Tag, state: dict):
+    """
+    Reads the ingredient table, only the first one on the page is used.
+    """
+    record = state['record']
+    if state.get('ingredients_read'):
+        return
+    state['ingredients_read'] = True
+    for td in tag.find_all('td', {'class': 'left'}):
+        text = td.get_text()
+        if text:
+            record.ingredients += text + '  '
+
+def read_calories(tag: Tag, state: dict):
+    if state['calories'] is None:
+        state['calories'] = tag.get_text()
+
+def read_nutrient_table(tag: Tag, state: dict):
+    """
+    Reads a nutrient table into its category. Tables of the same category are merged.
+
+    Notes:
+        - A table with a nutrient missing its amount contributes no lines.
+    """
+    category = None
+    lines = []
+    for tr in tag.find_all('tr'):
+        row = read_nutrient_row(tr)
+        if row is None:
+            continue
+        if 'category' in row:
+            if category is None:
+                category = row['category']
+            continue
+        if row['ammount'] == '':
+            lines = []
+            break
+        ammount, unit = units.clean_ammount(row['ammount'])
+        lines.append([row['name'], row['alt'], ammount, unit, row['dv']])
+
+    if category is None:
+        raise ValueError("Failed to Get Category")
+    state['groups'].setdefault(category, []).extend(lines)
+
+def read_nutrient_row(tr: Tag) -> dict:
+    """
+    Reads a nutrient table row by walking its tags once.
+
+    Returns:
+        dict: {'category': str} for a header row, {'name', 'alt', 'ammount', 'dv'} for a nutrient row,
+              None for rows without a nutrient.
+
+    Raises:
+        ValueError: If a nutrient row has no amount cell.
+    """
+    row = {'name': None, 'left': None, 'alt': None, 'ammount': None, 'dv': None}
+    header = None
+    skip = False
+    for tag in tr.find_all(True):
+        name = tag.name
+        attrs = tag.attrs
+        classes = attrs.get('class') or []
+        if name == 'th':
+            if header is None and attrs.get('colspan') == '3':
+                header = tag.get_text()
+            skip = True
+        elif name == 'td':
+            if attrs.get('colspan') == '3':
+                skip = True
+            elif 'left' in classes and row['left'] is None:
+                row['left'] = tag.get_text()
+            elif 'right' in classes and row['ammount'] is None:
+                row['ammount'] = tag.get_text()
+        elif name == 'a':
+            if 'tooltip' in classes and row['name'] is None:
+                row['name'] = attrs.get('data-tooltip')
+            if attrs.get('target') == '_blank' and row['dv'] is None:
+                row['dv'] = tag.get_text()
+        elif name == 'span' and 'gray' in classes and row['alt'] is None:
+            row['alt'] = tag.get_text()
+
+    if header is not None:
+        return {'category': header}
+    if skip:
+        return None
+    if row['name'] is None:
+        row['name'] = row['left']
+    if row['name'] is None:
+        return None
+    if row['ammount'] is None:
+        raise ValueError("Failed to get Nutrient Ammount")
+    if row['alt'] is None:
+        row['alt'] = ''
+    if row['dv'] is None:
+        row['dv'] = ''
+    return row
+
+def split_name(text: str)->tuple[str, str]:
+    """
+    Splits the full name of an item, as on its page heading or its listing link, into its name and brand.
+
+    Returns:
+        tuple[str, str]: The name and the brand, '' if the text names no brand.
+    """
+    if ' by ' in text:
+        return split_brand(text)
+    return text, ''
+
+def split_brand(name: str)->tuple[str, str]:
+    """
+    Splits a name string into brand and item components if the name includes the word 'by'.
+
+    Parameters:
+        name (str): A string representing the name to be checked and split.
+
+    Returns:
+        tuple[str, str]:
+            - A tuple `(brand, item)` if the name contains the word 'by', where:
+                - `brand` is the part before 'by'.
+                - `item` is the part after 'by'.
+            - A tuple `(name, None)` if the name does not contain the word 'by'.
+    """
+
+    rtnValue = name.split(' by ')
+
+    return rtnValue[0], rtnValue[1]
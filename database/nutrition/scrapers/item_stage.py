@@ -0,0 +1,95 @@
+import row_buffer
+
+
+class StagedRegistry:
+    """
+    Lookup registry of one item's stage. Names already in the shared registry resolve to their IDs, new names get
+    the IDs the shared registry reserves for them but are only added to it on commit.
+
+    Parameters:
+        registry (registries.LookupRegistry): The shared registry.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.new = {}
+
+    def get_id(self, name: str) -> int:
+        id = self.registry.ids.get(name)
+        if id is None:
+            id = self.new.get(name)
+        if id is None:
+            id = self.registry.reserve(name, len(self.new))
+            self.new[name] = id
+        return id
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.registry or name in self.new
+
+    def commit(self):
+        for name, id in self.new.items():
+            self.registry.restore(id, name)
+
+
+class StagedIndex:
+    """
+    Duplicate index of one item's stage. Checks see the shared index and the keys staged so far, keys are only
+    added to the shared index on commit.
+
+    Parameters:
+        index (dedup_index.DedupIndex): The shared index.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.added = []
+
+    def contains_item(self, name: str, brand: str) -> bool:
+        return self.index.contains_item(name, brand) or any(name == n and brand == b for n, b, _ in self.added)
+
+    def contains_upc(self, upc: str) -> bool:
+        return self.index.contains_upc(upc) or (bool(upc) and any(upc == u for _, _, u in self.added))
+
+    def add(self, name: str, brand: str, upc: str = ''):
+        self.added.append((name, brand, upc))
+
+    def commit(self):
+        for name, brand, upc in self.added:
+            self.index.add(name, brand, upc)
+
+
+class ItemStage:
+    """
+    Staging area of one item page. Every row of the item, the lookup entries and the index keys it creates go to
+    small local tables, merged into the shared tables in one step by `commit`. An item that fails part way is
+    dropped with the stage, so the shared tables are never copied or filtered.
+
+    Parameters:
+        tables (dict): The shared tables, see `nut_scrape.load_tables`.
+        buffers (tuple): Names of the `row_buffer.RowBuffer` tables.
+        lookups (tuple): Names of the `registries.LookupRegistry` tables.
+
+    Notes:
+        - `tables` holds the staged tables under the same names, so it can be passed to `nut_scrape.process_item`.
+        - Row IDs come from the shared allocators, a dropped item leaves a gap. Lookup IDs are only taken on commit,
+          so only one stage of the same tables may be open at a time, e.g. under the session lock.
+    """
+
+    def __init__(self, tables: dict, buffers: tuple, lookups: tuple):
+        self.shared = tables
+        self.buffers = buffers
+        self.lookups = lookups
+        self.tables = {name: row_buffer.RowBuffer(tables[name].columns, tables[name].ids) for name in buffers}
+        self.tables.update({name: StagedRegistry(tables[name]) for name in lookups})
+        self.tables['item_index'] = StagedIndex(tables['item_index'])
+
+    def commit(self):
+        """
+        Adds the staged rows, lookup entries and index keys to the shared tables.
+        """
+        for name in self.lookups:
+            self.tables[name].commit()
+        for name in self.buffers:
+            if not self.tables[name].empty:
+                self.shared[name].extend(self.tables[name].data)
+        self.tables['item_index'].commit()
@@ -0,0 +1,127 @@
+import json
+import os
+
+
+class Journal:
+    """
+    Write-ahead journal of scraped items. Every fully scraped item is appended as one JSON line holding
+    its rows, the lookup entries it created and its position in the crawl, and is fsynced before the crawl
+    moves on. After a crash the journal is replayed on top of the last written tables.
+
+    Parameters:
+        path (str): Path of the journal file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'a')
+        self.count = 0
+
+    def append(self, record: dict):
+        """
+        Appends a record and forces it to disk.
+
+        Parameters:
+            record (dict): A JSON serializable record, see `build_record`.
+        """
+        self.file.write(json.dumps(record, default=str) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.count += 1
+
+    def replay(self) -> list:
+        """
+        Reads every complete record in the journal.
+
+        Returns:
+            list: The records in the order they were appended. A torn last line left by a crash is skipped.
+        """
+        records = []
+        with open(self.path, 'r') as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+        return records
+
+    def reset(self):
+        """
+        Empties the journal, called once its records have been written to the tables.
+        """
+        self.file.close()
+        self.file = open(self.path, 'w')
+        self.count = 0
+
+    def close(self):
+        self.file.close()
+
+
+def take_marks(tables: dict, buffers: tuple, lookups: tuple) -> dict:
+    """
+    Records the size of every table so the rows added by one item can be found afterwards.
+
+    Parameters:
+        tables (dict): The tables keyed by name.
+        buffers (tuple): Names of the `row_buffer.RowBuffer` tables.
+        lookups (tuple): Names of the `registries.LookupRegistry` tables.
+
+    Returns:
+        dict: The number of rows or entries of every table.
+    """
+    return {name: len(tables[name]) for name in buffers + lookups}
+
+def build_record(tables: dict, marks: dict, buffers: tuple, lookups: tuple, position: list) -> dict:
+    """
+    Builds the journal record of an item from everything added to the tables since `marks`.
+
+    Parameters:
+        tables (dict): The tables keyed by name.
+        marks (dict): Sizes from `take_marks` taken before the item was processed.
+        buffers (tuple): Names of the `row_buffer.RowBuffer` tables.
+        lookups (tuple): Names of the `registries.LookupRegistry` tables.
+        position (list): Where the item sits in the crawl, [letter, page, index on the page], None for an item
+                         added out of crawl order.
+
+    Returns:
+        dict: The record, a position only record if nothing was added.
+    """
+    record = {'position': position}
+    rows = {name: tables[name].rows_since(marks[name]) for name in buffers if len(tables[name]) > marks[name]}
+    entries = {name: tables[name].entries_since(marks[name]) for name in lookups if len(tables[name]) > marks[name]}
+    if rows:
+        record['rows'] = rows
+    if entries:
+        record['lookups'] = entries
+    return record
+
+def apply_record(record: dict, tables: dict, written: dict = None) -> dict:
+    """
+    Replays a journal record onto the tables.
+
+    Parameters:
+        record (dict): A record from `Journal.replay`.
+        tables (dict): The tables keyed by name.
+        written (dict): Maps a table to the highest row ID already on disk. Rows up to it were written by a
+                        checkpoint that crashed before it emptied the journal, they are skipped.
+
+    Returns:
+        dict: The skipped rows, column-wise per table.
+    """
+    written = written or {}
+    skipped = {}
+    for name, entries in record.get('lookups', {}).items():
+        for id, lookup_name in entries:
+            tables[name].restore(id, lookup_name)
+    for name, columns in record.get('rows', {}).items():
+        if name in written:
+            ids = columns[tables[name].columns[0]]
+            keep = [i for i, id in enumerate(ids) if id > written[name]]
+            if len(keep) < len(ids):
+                skip = [i for i, id in enumerate(ids) if id <= written[name]]
+                skipped[name] = {col: [values[i] for i in skip] for col, values in columns.items()}
+                columns = {col: [values[i] for i in keep] for col, values in columns.items()}
+            if not keep:
+                continue
+        tables[name].extend(columns)
+    return skipped
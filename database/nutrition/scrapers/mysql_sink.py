@@ -0,0 +1,299 @@
+import json
+import os
+import pandas as pd
+
+try:
+    from mysql.connector import errors, pooling
+except ImportError:
+    errors = None
+    pooling = None
+
+# Writes the scraped tables straight into the fms schema of database/SQL_Scripts/CreateScripts.
+# The connection comes from the same environment variables as the app backend, DBHOST and DBPORT default to a
+# local server, so a throwaway container works as a target:
+#
+#   docker run -d --name fms-db -p 3306:3306 -e MARIADB_ROOT_PASSWORD=root mariadb:11
+#   cat database/SQL_Scripts/CreateScripts/0[0-7]-*.sql | mysql -h 127.0.0.1 -u root -proot
+#   DBUSER=root DBPASS=root python nut_scrape.py --sink mysql
+
+POOL_SIZE = 4
+#rows per executemany call, the connector sends each call as one multi row INSERT
+BATCH_ROWS = 2000
+
+#scraper table -> (schema table, [(scraper column, schema column, converter)]), in foreign key order
+SCHEMA_TABLES = {
+    'unit_lu': ('unit_lu', [('unit_id', 'unit_id', 'int'), ('name', 'name', 'str')]),
+    'nutrient_lu': ('nutrient_lu', [('nutrient_id', 'nutrient_id', 'int'), ('name', 'name', 'str')]),
+    'nutrient_category_lu': ('nutrient_cat_lu', [('cat_id', 'cat_id', 'int'), ('name', 'name', 'str')]),
+    'items': ('item', [('item_id', 'item_id', 'int'), ('name', 'name', 'str'), ('brand', 'brand', 'str'),
+                       ('NLEA_unit', 'NLEA_unit', 'int'), ('NLEA_val', 'NLEA_val', 'float'), ('ammount', 'ammount', 'float'),
+                       ('ammount_unit', 'ammount_unit', 'int'), ('upc', 'upc', 'str'), ('ingredient_list', 'ingrdient_list', 'str')]),
+    'nutrient_junc': ('nutrition_junc', [('nut_junc_id', 'nut_junc_id', 'int'), ('item_id', 'item_id', 'int'),
+                                         ('nutrient_id', 'nutrient_id', 'int'), ('alt_id', 'alt_id', 'int'), ('cat_id', 'cat_id', 'int'),
+                                         ('ammount', 'ammount', 'float'), ('unit_id', 'unit_id', 'int'), ('dv', 'dv', 'str')]),
+    'conversion_junc': ('conversion_junc', [('conversion_id', 'conversion_id', 'int'), ('item_id', 'item_id', 'int'),
+                                            ('unit_id', 'unit_id', 'int'), ('unit_amt', 'unit_amt', 'float'),
+                                            ('ammount', 'ammount', 'float'), ('amt_unit', 'amt_unit', 'int')]),
+}
+
+
+def connection_config() -> dict:
+    """
+    Builds the connection settings from DBHOST, DBPORT, DBUSER, DBPASS and DBNAME.
+    """
+    return {'host': os.environ.get('DBHOST', '127.0.0.1'), 'port': int(os.environ.get('DBPORT', '3306')),
+            'user': os.environ.get('DBUSER', 'fmsUser'), 'password': os.environ.get('DBPASS', ''),
+            'database': os.environ.get('DBNAME', 'fms')}
+
+def insert_statement(name: str) -> str:
+    """
+    The INSERT of a scraper table. A row whose ID is already in the database is left as it is, so rows
+    replayed from the journal after a crash can be written again.
+    """
+    table, columns = SCHEMA_TABLES[name]
+    names = [schema_col for _, schema_col, _ in columns]
+    key = names[0]
+    return ('INSERT INTO ' + table + ' (' + ', '.join('`' + col + '`' for col in names) + ') VALUES ('
+            + ', '.join(['%s'] * len(names)) + ') ON DUPLICATE KEY UPDATE `' + key + '` = `' + key + '`')
+
+def to_float(value) -> float:
+    """
+    Converts a scraped amount to a number. Fractions like '1/2' are divided out.
+
+    Raises:
+        ValueError: If the value is not a number, e.g. '<1'.
+    """
+    if value is None or value is pd.NA or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        top, bottom = str(value).split('/')
+        return float(top) / float(bottom)
+    except (ValueError, ZeroDivisionError):
+        raise ValueError('Not a number: ' + repr(value)) from None
+
+def to_int(value) -> int:
+    if value is None or value is pd.NA or value == '':
+        return None
+    return int(value)
+
+def to_str(value) -> str:
+    if value is None or value is pd.NA:
+        return None
+    return str(value)
+
+CONVERTERS = {'int': to_int, 'float': to_float, 'str': to_str}
+
+def table_rows(name: str, data, invalid: list = None) -> list:
+    """
+    Converts the rows of a scraper table to parameter tuples of its INSERT.
+
+    Parameters:
+        name (str): The scraper table, a key of `SCHEMA_TABLES`.
+        data: The rows, a pd.DataFrame or a dict mapping each column to its list of values.
+        invalid (list): If given, a (row number, scraper column, value) tuple is appended for every value that can
+                        not be converted. Such values are sent as NULL.
+
+    Returns:
+        list: One tuple per row, in the column order of `insert_statement`.
+    """
+    table, columns = SCHEMA_TABLES[name]
+    values = []
+    for col, _, kind in columns:
+        converter = CONVERTERS[kind]
+        converted = []
+        for number, value in enumerate(data[col]):
+            try:
+                converted.append(converter(value))
+            except ValueError:
+                converted.append(None)
+                if invalid is not None:
+                    invalid.append((number, col, value))
+        values.append(converted)
+    return list(zip(*values))
+
+
+def data_errors() -> tuple:
+    """
+    The connector errors caused by the rows themselves, e.g. a name too long for its column in strict mode or a
+    missing foreign key, rather than by the server or the connection.
+    """
+    return (errors.DataError, errors.IntegrityError)
+
+
+class MySQLSink:
+    """
+    Writes the scraper tables into MySQL or MariaDB through a connection pool.
+
+    Parameters:
+        config (dict): Connection settings, `connection_config()` if None.
+        pool_size (int): Connections kept in the pool.
+        batch_rows (int): Rows per executemany call.
+        quarantine_path (str): File the rows the database rejects and the values sent as NULL because they are not
+                               numbers are appended to, one JSON line each. None only prints them.
+
+    Raises:
+        ImportError: If mysql-connector-python is not installed.
+    """
+
+    def __init__(self, config: dict = None, pool_size: int = POOL_SIZE, batch_rows: int = BATCH_ROWS, quarantine_path: str = None):
+        if pooling is None:
+            raise ImportError('The MySQL sink needs mysql-connector-python')
+        self.pool = pooling.MySQLConnectionPool(pool_name='scrape_sink', pool_size=pool_size, **(config or connection_config()))
+        self.batch_rows = batch_rows
+        self.quarantine_path = quarantine_path
+
+    def write(self, tables: dict) -> dict:
+        """
+        Writes a batch of rows in one transaction, lookups first so every foreign key already exists. If a row is
+        rejected the batch is written again row by row, leaving out and quarantining every rejected row, see
+        `quarantine`, so one bad row never holds back the rest. Values that are not numbers, e.g. an amount of '<1',
+        are sent as NULL and logged, see `convert`.
+
+        Parameters:
+            tables (dict): Maps a scraper table, a key of `SCHEMA_TABLES`, to its new rows as a pd.DataFrame or
+                           a dict of column lists. Lookup tables may be given whole, rows already written are skipped.
+
+        Returns:
+            dict: The rows written per scraper table.
+
+        Raises:
+            mysql.connector.Error: If the transaction fails for any other reason, e.g. a lost connection, it is
+                                   rolled back and nothing is written.
+        """
+        rows = self.convert(tables)
+        connection = self.pool.get_connection()
+        try:
+            try:
+                return self.transaction(connection, rows, self.send_batches)
+            except data_errors():
+                return self.transaction(connection, rows, self.send_rows)
+        finally:
+            #returns the connection to the pool
+            connection.close()
+
+    def convert(self, tables: dict) -> dict:
+        """
+        Converts every table to the parameter tuples of its INSERT, see `table_rows`, logging each value that is sent
+        as NULL because it is not a number, see `log_invalid`.
+
+        Returns:
+            dict: Maps each scraper table of `tables` to its rows, in foreign key order.
+        """
+        converted = {}
+        for name in SCHEMA_TABLES:
+            if name not in tables:
+                continue
+            invalid = []
+            converted[name] = table_rows(name, tables[name], invalid)
+            for number, col, value in invalid:
+                self.log_invalid(name, converted[name][number], col, value)
+        return converted
+
+    def transaction(self, connection, rows: dict, send) -> dict:
+        """
+        Sends the rows of every table with `send` in one transaction.
+        """
+        cursor = None
+        sent = {}
+        try:
+            connection.start_transaction()
+            cursor = connection.cursor()
+            for name, batch in rows.items():
+                sent[name] = send(cursor, name, batch)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+        return sent
+
+    def send_batches(self, cursor, name: str, rows: list) -> int:
+        statement = insert_statement(name)
+        for start in range(0, len(rows), self.batch_rows):
+            cursor.executemany(statement, rows[start:start + self.batch_rows])
+        return len(rows)
+
+    def send_rows(self, cursor, name: str, rows: list) -> int:
+        """
+        Sends the rows one at a time, quarantining the rows the database rejects. A rejected statement does not
+        end the transaction, the rows before and after it are kept.
+        """
+        statement = insert_statement(name)
+        sent = 0
+        for row in rows:
+            try:
+                cursor.execute(statement, row)
+                sent += 1
+            except data_errors() as e:
+                self.quarantine(name, row, e)
+        return sent
+
+    def query(self, statement: str) -> list:
+        """
+        Runs a SELECT on a pooled connection.
+
+        Returns:
+            list: The rows as tuples.
+        """
+        connection = self.pool.get_connection()
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute(statement)
+            return cursor.fetchall()
+        finally:
+            if cursor is not None:
+                cursor.close()
+            connection.close()
+
+    def max_ids(self, names: list) -> dict:
+        """
+        The highest row ID in the database of each scraper table in `names`, tables without rows are left out.
+        """
+        written = {}
+        for name in names:
+            table, columns = SCHEMA_TABLES[name]
+            highest = self.query('SELECT MAX(`' + columns[0][1] + '`) FROM ' + table)[0][0]
+            if highest is not None:
+                written[name] = int(highest)
+        return written
+
+    def read_items(self) -> pd.DataFrame:
+        """
+        The name, brand and UPC of every item in the database, NULLs as empty strings.
+        """
+        rows = self.query('SELECT `name`, `brand`, `upc` FROM ' + SCHEMA_TABLES['items'][0])
+        return pd.DataFrame(rows, columns=['name', 'brand', 'upc']).fillna('')
+
+    def quarantine(self, name: str, row: tuple, e: Exception):
+        """
+        Prints a rejected row and appends it with its error to `quarantine_path`. Junction rows of a quarantined
+        item are rejected by their foreign key and quarantined with it.
+        """
+        print('Quarantined a row of', name + ':', e)
+        self.append_entry(name, row, {'error': str(e)})
+
+    def log_invalid(self, name: str, row: tuple, column: str, value):
+        """
+        Prints a value sent as NULL because it is not a number and appends it with its row to `quarantine_path`,
+        marked as kept so it is told apart from the rejected rows.
+        """
+        print('Sent', repr(value), 'as NULL in', name + '.' + column + ', it is not a number')
+        self.append_entry(name, row, {'error': 'Not a number: ' + repr(value), 'column': column, 'value': value, 'kept': True})
+
+    def append_entry(self, name: str, row: tuple, details: dict):
+        """
+        Appends a row of a scraper table as a JSON line to `quarantine_path`, with `details` merged in.
+        """
+        if self.quarantine_path is None:
+            return
+        table, columns = SCHEMA_TABLES[name]
+        entry = {'table': name, 'row': dict(zip([col for col, _, _ in columns], row)), **details}
+        with open(self.quarantine_path, 'a') as file:
+            file.write(json.dumps(entry, default=str) + '\n')
@@ -0,0 +1,55 @@
+import argparse
+import os
+import pandas as pd
+import storage
+import units
+
+DATA_PATH = '/home/bg-labs/bg_labs/fms/database/nutrition/data/'
+#unit ID columns of every table that references unit_lu, keyed by table file name
+UNIT_COLUMNS = {'items': ['NLEA_unit', 'ammount_unit'], 'conversion_junc': ['unit_id', 'amt_unit'], 'nutrient_junk': ['unit_id']}
+
+# Re-normalizes the unit names of unit_lu with the batch parser of `units`, e.g. "cup (aprx)" becomes "cup".
+# Units that end up with the same name are merged into the one with the lowest ID and every table referencing
+# them is pointed at it. Run it with the scraper stopped and its journal empty, the tables are rewritten in place.
+parser = argparse.ArgumentParser(description='Re-normalizes the unit names of the nutrition tables')
+parser.add_argument('--data', default=DATA_PATH, help='directory holding the tables')
+parser.add_argument('--backend', choices=sorted(storage.EXTENSIONS), default=storage.BACKEND, help='backend the tables are stored in')
+parser.add_argument('--dry-run', action='store_true', help='print the renamed and merged units without writing')
+args = parser.parse_args()
+storage.set_backend(args.backend)
+
+unit_lu_path = os.path.join(args.data, 'unit_lu.csv')
+unit_lu = storage.read_table(unit_lu_path)
+cleaned = units.clean_unit_measures(unit_lu['name'])
+#an empty unit is grams, as in `nut_scrape.get_unit_id`
+names = cleaned['unit'].mask(cleaned['unit'] == '', 'g').fillna(unit_lu['name'])
+
+keep = unit_lu['unit_id'].groupby(names).transform('min').fillna(unit_lu['unit_id'])
+remap = {old: new for old, new in zip(unit_lu['unit_id'], keep) if old != new}
+renamed = unit_lu[(names != unit_lu['name']) & (unit_lu['unit_id'] == keep)]
+for (_, row), name in zip(renamed.iterrows(), names[renamed.index]):
+    print('Renaming unit', row['unit_id'], repr(row['name']), '->', repr(name))
+for old, new in remap.items():
+    print('Merging unit', old, repr(unit_lu.loc[unit_lu['unit_id'] == old, 'name'].iloc[0]), 'into', new)
+print(len(renamed), 'units renamed,', len(remap), 'merged,', int((cleaned['alt'] != '').sum()), 'had alternate units')
+
+if args.dry_run:
+    raise SystemExit(0)
+
+for table, columns in UNIT_COLUMNS.items():
+    path = os.path.join(args.data, table + '.csv')
+    if not storage.table_exists(path):
+        print('Skipping', table, 'no table found')
+        continue
+    df = storage.read_table(path)
+    changed = 0
+    for column in columns:
+        merged = df[column].isin(remap.keys())
+        changed += int(merged.sum())
+        df[column] = df[column].replace(remap)
+    storage.replace_table(path, df)
+    print('Updated', changed, 'unit references in', table)
+
+unit_lu = pd.DataFrame({'unit_id': unit_lu['unit_id'], 'name': names})[unit_lu['unit_id'] == keep]
+storage.replace_table(unit_lu_path, unit_lu.reset_index(drop=True))
+print('Wrote', len(unit_lu), 'units')
@@ -1,15 +1,36 @@
 import pandas as pd
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.firefox.service import Service
-from selenium.webdriver.firefox.options import Options
-from webdriver_manager.firefox import GeckoDriverManager
-import re
+from bs4 import BeautifulSoup, SoupStrainer
 import os
+import sys
+#the database directory, home of the scraper_common package shared by both scrapers
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
 import logging_helper
-from collections import deque
+import fetchers
+from scraper_common import browser_pool
+import async_fetch
+import registries
+import row_buffer
+import id_allocators
+import dedup_index
+import storage
+import parsers
+import item_extract
+import journal
+import item_stage
+from scraper_common import page_cache
+from scraper_common import metrics
+import retry
+from scraper_common import frontier
+import mysql_sink
 import threading
 import traceback
+import argparse
+import asyncio
+import collections
+import functools
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 
 #Some config data 
@@ -18,6 +39,61 @@ FOODS_START_MOD =
 BRANDS_START_MOD = 
 SITE_END = '.html'
 PAGE_COUNTER = 'page_'
+FETCH_MODE = 'http'
+#Firefox instances shared by every worker for pages that need a browser, restarted after BROWSER_MAX_PAGES pages or
+#once one uses more than BROWSER_MAX_RSS_MB of memory, see `browser_pool.DriverPool`
+BROWSERS = 2
+BROWSER_MAX_PAGES = 200
+BROWSER_MAX_RSS_MB = 1500
+BROWSER_POOL = None
+WORKERS = 1
+MAX_REQUESTS_PER_SECOND = 4
+ASYNC_CONCURRENCY = 200
+STORAGE_BACKEND = 'csv'
+#where the item and junction rows go: 'files' for the tables in the data directory, 'mysql' for the fms database
+#through `mysql_sink`, 'both' for both. The lookup tables and ID state are always written to files for restarts
+SINK = 'files'
+MYSQL_SINK = None
+#rows written to the table files but not yet to the database, sent again with the next write, see `write_data`
+SINK_PENDING = None
+PARSER_BACKEND = parsers.DEFAULT_BACKEND
+#only build the parts of each page the extractors read
+PARTIAL_PARSE = True
+#parser worker processes, 0 parses on the fetching thread
+PARSE_PROCESSES = 0
+#most fetched pages waiting for the parsers and the writer
+PARSE_QUEUE_DEPTH = 256
+#listing pages each worker fetches ahead of its item pages, 0 fetches a listing page once the one before is done
+LISTING_PREFETCH_DEPTH = 2
+#keep a compressed copy of every fetched page in PAGE_CACHE_PATH so the tables can be rebuilt with --reparse
+CACHE_PAGES = True
+#serve every page from the page cache instead of the network, set by --reparse
+REPARSE = False
+#seconds between rewrites of METRICS_PATH
+METRICS_INTERVAL = 15
+#fetches tried again after a transient error, waiting RETRY_BASE_DELAY seconds doubling up to RETRY_MAX_DELAY between tries
+FETCH_RETRIES = 3
+RETRY_BASE_DELAY = 1
+RETRY_MAX_DELAY = 60
+#failed fetches in a row that pause every fetch to a host for BREAKER_COOLDOWN seconds, 0 turns the breaker off
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30
+#shared crawl frontier for crawling with several processes, see `crawl_frontier`, None crawls the restart file's letters alone
+FRONTIER_PATH = None
+#seconds a worker waits before asking an empty frontier again while other workers may still queue pages
+FRONTIER_POLL_SECONDS = 1
+#row IDs taken from the frontier at a time per table
+FRONTIER_ID_BLOCK = 1000
+#seconds a worker holds a leased page before it is handed to another worker, above the slowest fetch with its retries
+FRONTIER_LEASE_SECONDS = 600
+#leases of a page whose handling raised before it is dead-lettered and marked done instead of released again
+FRONTIER_MAX_ATTEMPTS = 3
+#listing directories the crawl walks, 'foods' at FOODS_START_MOD and 'brands' at BRANDS_START_MOD. Listing links of
+#items already scraped are skipped by their name and brand, so a directory walked after another mostly costs listing pages
+LISTING_DIRECTORIES = ('foods',)
+#first line of every restart file `write_restart_progress` writes. A restart file without it is the legacy single line
+#"letter page" file, which resumes that letter and crawls every letter after it
+RESTART_VERSION_LINE = '#restart v2'
 LETTER_LIST = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'M', 
                'N', 'O', 'P', 'Q', 'R', 'S', 'T', 'U', 'V', 'W', 'Y', 'X', 'Z']
 
@@ -28,11 +104,54 @@ NUTLU_PATH = '/home/bg-labs/bg_labs/fms/database/nutrition/data/nutrient_lu.csv'
 NUTCAT_PATH = '/home/bg-labs/bg_labs/fms/database/nutrition/data/nutrient_category_lu.csv'
 NUTJUNC_PATH = '/home/bg-labs/bg_labs/fms/database/nutrition/data/nutrient_junk.csv'
 RESTART_PATH = '/home/bg-labs/bg_labs/fms/database/nutrition/data/restart.txt'
+BRANDS_RESTART_PATH = '/home/bg-labs/bg_labs/fms/database/nutrition/data/restart_brands.txt'
+IDS_PATH = '/home/bg-labs/bg_labs/fms/database/nutrition/data/next_ids.json'
+ITEM_INDEX_PATH = '/home/bg-labs/bg_labs/fms/database/nutrition/data/item_keys.bin'
+JOURNAL_PATH = '/home/bg-labs/bg_labs/fms/database/nutrition/data/journal.jsonl'
+PAGE_CACHE_PATH = '/home/bg-labs/bg_labs/fms/database/nutrition/data/page_cache'
+METRICS_PATH = '/home/bg-labs/bg_labs/fms/database/nutrition/data/metrics.prom'
+DEAD_LETTER_PATH = '/home/bg-labs/bg_labs/fms/database/nutrition/data/dead_letters.jsonl'
+SINK_QUARANTINE_PATH = '/home/bg-labs/bg_labs/fms/database/nutrition/data/sink_quarantine.jsonl'
+
+ITEMS_COLUMNS = ['item_id', 'name', 'brand', 'NLEA_unit', 'NLEA_val', 'ammount', 'ammount_unit', 'upc', 'ingredient_list']
+CONVJUNC_COLUMNS = ['conversion_id', 'item_id', 'unit_id', 'unit_amt', 'ammount', 'amt_unit']
+NUTJUNC_COLUMNS = ['nut_junc_id', 'item_id', 'nutrient_id', 'alt_id', 'cat_id', 'ammount', 'unit_id', 'dv']
+BUFFER_TABLES = ('items', 'conversion_junc', 'nutrient_junc')
+LOOKUP_TABLES = ('unit_lu', 'nutrient_lu', 'nutrient_category_lu')
+
+#journaled items between two writes of the tables
+JOURNAL_CHECKPOINT_ITEMS = 500
+#checkpoints failed in a row before the crawl is stopped, after each failure the next try waits for twice the items
+CHECKPOINT_MAX_FAILURES = 5
+
+#the metrics written to METRICS_PATH while a crawl runs, see `metrics.start`
+METRIC_HELP = {
+    'fetch_seconds': ('histogram', 'Time to fetch a page, by page kind.'),
+    'parse_seconds': ('histogram', 'Time to parse a page into a tree, by page kind.'),
+    'extract_seconds': ('histogram', 'Time to extract the record of a parsed item page.'),
+    'lock_wait_seconds': ('histogram', 'Time spent waiting for the session lock before adding an item.'),
+    'listing_wait_seconds': ('histogram', 'Time a worker waited for its next listing page.'),
+    'insert_seconds': ('histogram', 'Time to add an item to the tables and lookup registries.'),
+    'write_seconds': ('histogram', 'Time to write the tables and restart file at a checkpoint.'),
+    'items_total': ('counter', 'Items added to the tables.'),
+    'items_skipped_total': ('counter', 'Listing links skipped without a fetch, their item already being in the tables.'),
+    'pages_total': ('counter', 'Listing pages finished.'),
+    'letters_finished_total': ('counter', 'Letters crawled to the end.'),
+    'errors_total': ('counter', 'Errors by kind.'),
+    'retries_total': ('counter', 'Fetches tried again after a transient error.'),
+    'breaker_open_total': ('counter', 'Times a host was paused after a burst of failed fetches, by host.'),
+    'browser_restarts_total': ('counter', 'Browsers restarted, by reason: pages, memory or error.'),
+    'dead_letters_total': ('counter', 'Pages written to the dead letter file, by page kind.'),
+    'current_page': ('gauge', 'Listing page each unfinished letter is on.'),
+    'per_second': ('gauge', 'Items added per second since the last write of the metrics file.'),
+}
 
 
 
 #shared event to manage stopping the script
 stop_event = threading.Event()
+#guards BROWSER_POOL while the workers build their fetchers
+browser_pool_lock = threading.Lock()
 
 def stop_listener():
     """
@@ -45,387 +164,280 @@ def stop_listener():
     print("Stopping the Nutrition Gather...Please be patient while we clean up you will be notified when it is safe to close")
     stop_event.set()
 
-def get_page_source(driver: webdriver, url: str)->BeautifulSoup:
+def get_page_source(fetcher, url: str, regions: SoupStrainer = None)->BeautifulSoup:
     """
-    Retrieves the page source of a given URL using a Selenium WebDriver and parses it into a BeautifulSoup object.
+    Retrieves the page source of a given URL using the fetch backend and parses it into a BeautifulSoup object.
 
     Parameters:
-        driver (webdriver): An instance of Selenium's WebDriver used to interact with the web browser.
+        fetcher: A fetcher from `fetchers.build_fetcher` exposing `fetch(url) -> str`.
         url (str): The URL of the webpage to retrieve.
+        regions (SoupStrainer): The parts of the page to build, e.g. `parsers.ITEM_PAGE`. Ignored unless `PARTIAL_PARSE` is set.
 
     Returns:
         BeautifulSoup: A BeautifulSoup object representing the parsed HTML content of the webpage.
 
     Raises:
-        Exception: If the URL cannot be reached, an error message is logged, and the function returns None.
+        retry.FetchFailed: If the URL cannot be reached, after the retries of the fetcher if it has any.
 
     Side Effects:
         - Logs an error message if the URL cannot be accessed using the `logging_helper.add_to_log` function.
         - Prints an error message to the console.
     """
     
+    global PARSER_BACKEND, PARTIAL_PARSE
+
+    kind = page_kind(regions)
     try:
-        driver.get(url)
-        bs = BeautifulSoup(driver.page_source, 'html.parser')
+        with metrics.timer('fetch_seconds', kind=kind):
+            html = fetcher.fetch(url)
+        with metrics.timer('parse_seconds', kind=kind):
+            bs = parsers.parse(html, PARSER_BACKEND, regions if PARTIAL_PARSE else None)
         return bs
-    except:
+    except Exception as e:
         error = "Can't Reach URL"
         print(error + ':', url)
         logging_helper.add_to_log(error, url, False)
+        metrics.count('errors_total', kind=error)
+        raise retry.fetch_failed(url, e)
         
-def get_table_links(bs: BeautifulSoup)->list:
+async def get_page_source_async(fetcher, url: str, regions: SoupStrainer = None)->BeautifulSoup:
     """
-    Extracts all links (<a> elements) with the class 'table_item_name' from a second-level table.
+    Async version of `get_page_source` for fetchers from `async_fetch`.
 
     Parameters:
-        bs (BeautifulSoup): A BeautifulSoup object containing the parsed HTML content.
+        fetcher (async_fetch.AsyncHttpFetcher): The async fetch backend.
+        url (str): The URL of the webpage to retrieve.
+        regions (SoupStrainer): The parts of the page to build, see `get_page_source`.
 
     Returns:
-        list: A list of <a> elements with the class 'table_item_name'.
+        BeautifulSoup: The parsed page.
 
     Raises:
-        ValueError: If no matching elements are found in the table.
+        retry.FetchFailed: If the URL can't be reached.
     """
+    global PARSER_BACKEND, PARTIAL_PARSE
 
-    items = bs.find_all('a', {'class': 'table_item_name'})
+    kind = page_kind(regions)
+    try:
+        with metrics.timer('fetch_seconds', kind=kind):
+            html = await fetcher.fetch(url)
+        with metrics.timer('parse_seconds', kind=kind):
+            return parsers.parse(html, PARSER_BACKEND, regions if PARTIAL_PARSE else None)
+    except Exception as e:
+        error = "Can't Reach URL"
+        print(error + ':', url)
+        logging_helper.add_to_log(error, url, False)
+        metrics.count('errors_total', kind=error)
+        raise retry.fetch_failed(url, e)
 
-    if not items:
-        raise ValueError("Can't get items from 2nd level table")
-    
-    return items
+def page_kind(regions: SoupStrainer)->str:
+    """
+    Label of a page in the metrics, 'listing' for listing pages and 'item' for everything else.
+    """
+    return 'listing' if regions is parsers.LISTING_PAGE else 'item'
 
-def get_item_name(bs: BeautifulSoup)->str:
+def fetch_html(fetcher, url: str)->str:
     """
-    Extracts the item name from an item page.
+    Retrieves the page source of a given URL without parsing it, for the parse pipeline.
 
     Parameters:
-        bs (BeautifulSoup): A BeautifulSoup object representing the parsed HTML content of the item page.
+        fetcher: A fetcher from `fetchers.build_fetcher` exposing `fetch(url) -> str`.
+        url (str): The URL of the webpage to retrieve.
 
     Returns:
-        str: The name of the item as a string.
+        str: The page source.
 
     Raises:
-        ValueError: If the item name cannot be located in the HTML content.
+        retry.FetchFailed: If the URL can't be reached.
     """
+    try:
+        with metrics.timer('fetch_seconds', kind='item'):
+            return fetcher.fetch(url)
+    except Exception as e:
+        error = "Can't Reach URL"
+        print(error + ':', url)
+        logging_helper.add_to_log(error, url, False)
+        metrics.count('errors_total', kind=error)
+        raise retry.fetch_failed(url, e)
 
-    name = bs.find('h1', {'id': 'food-name'}).get_text()
-
-    if not name:
-        raise ValueError("Can't Locate Name of Item", False)
-    
-    return name
-
-def split_brand(name: str)->tuple[str, str]:
+async def fetch_html_async(fetcher, url: str)->str:
     """
-    Splits a name string into brand and item components if the name includes the word 'by'.
-
-    Parameters:
-        name (str): A string representing the name to be checked and split.
-
-    Returns:
-        tuple[str, str]: 
-            - A tuple `(brand, item)` if the name contains the word 'by', where:
-                - `brand` is the part before 'by'.
-                - `item` is the part after 'by'.
-            - A tuple `(name, None)` if the name does not contain the word 'by'.
+    Async version of `fetch_html` for fetchers from `async_fetch`.
     """
+    try:
+        with metrics.timer('fetch_seconds', kind='item'):
+            return await fetcher.fetch(url)
+    except Exception as e:
+        error = "Can't Reach URL"
+        print(error + ':', url)
+        logging_helper.add_to_log(error, url, False)
+        metrics.count('errors_total', kind=error)
+        raise retry.fetch_failed(url, e)
 
-    rtnValue = name.split(' by ') 
-
-    return rtnValue[0], rtnValue[1]
-
-def gather_item_info(bs: BeautifulSoup, items: pd.DataFrame, unit_lu: pd.DataFrame)->tuple[int, pd.DataFrame, pd.DataFrame]:
+def get_listing_url(letter: str, page_num: int)->str:
     """
-    Gathers and processes information about an item from a BeautifulSoup object, updates the provided dataframes, 
-    and returns the updated data and item ID.
+    Builds the URL of a page of the foods listing or the brand directory for a letter.
 
     Parameters:
-        bs (BeautifulSoup): A BeautifulSoup object containing the parsed HTML of the item's page.
-        items (pd.DataFrame): A Pandas DataFrame containing the current dataset of items.
-        unit_lu (pd.DataFrame): A Pandas DataFrame serving as a lookup table for units.
+        letter (str): The letter being crawled, prefixed with 'brands/' for the brand directory, see `crawl_keys`.
+        page_num (int): The page of that letter.
 
     Returns:
-        tuple[int, pd.DataFrame, pd.DataFrame]: 
-            - `cur_item_id` (int): The unique ID of the newly added item.
-            - `items` (pd.DataFrame): The updated items DataFrame with the new item added.
-            - `unit_lu` (pd.DataFrame): The updated unit lookup DataFrame with new units added, if applicable.
-
-    Raises:
-        ValueError: 
-            - If the item name is already in dataset.
-            - If the function fails to retrieve `cur_item_id`.
-
-    Notes:
-        -The Items DataFrame needs to contain columns corresponding to the keys in `new_row`
+        str: The full URL of the listing page.
     """
+    global BASE_WEBSITE, FOODS_START_MOD, BRANDS_START_MOD, SITE_END, PAGE_COUNTER
 
-    new_row = {'item_id': None, 'NLEA_unit': None, 'NLEA_val': None, 'ammount': None, 'ammount_unit': None, 'upc': None, 'ingredient_list': None}
-    name = get_item_name(bs)
-    if ' by ' in name:
-        new_row['name'], new_row['brand'] = split_brand(name)
-    else:
-        new_row['name'] = name
-        new_row['brand'] = ''
-
-
-    row_values = items[(items['name'] == new_row['name']) & (items['brand'] == new_row['brand'])]
-    if not row_values.empty:
-        raise ValueError("We have Duplicate Row, [" + new_row['name'] + new_row['brand']+"]", False)
-    
-    new_row['NLEA_val'],  unit, new_row['ammount'], amt_unit = get_NLEA_info(bs)
-
-    new_row['NLEA_unit'], unit_lu = get_unit_id(unit, unit_lu)
-    new_row['ammount_unit'], unit_lu = get_unit_id(amt_unit, unit_lu)
-
-    new_row['ingredient_list'] = get_ingredient(bs)
-    new_row['upc'] = get_UPC(bs)
+    directory, letter = split_key(letter)
+    start_mod = BRANDS_START_MOD if directory == 'brands' else FOODS_START_MOD
+    return BASE_WEBSITE+start_mod+letter+'_'+PAGE_COUNTER+str(page_num)+SITE_END
 
+def crawl_keys(directory: str)->list:
+    """
+    The keys the letters of a listing directory go by in the progress, the restart file and the journal: the
+    letters of `LETTER_LIST` for 'foods', the letters prefixed with 'brands/' for 'brands'.
+    """
+    global LETTER_LIST
 
+    if directory == 'foods':
+        return list(LETTER_LIST)
+    return [directory + '/' + letter for letter in LETTER_LIST]
 
-    cur_item_id, items = get_item_id(new_row, items)
+def split_key(key: str)->tuple[str, str]:
+    """
+    Splits a key from `crawl_keys` into its listing directory and letter.
+    """
+    directory, _, letter = key.rpartition('/')
+    return directory or 'foods', letter
 
-    if not cur_item_id:
-        ValueError("Failed to get cur_item_id", False)
+def restart_path(directory: str)->str:
+    """
+    The restart file of a listing directory.
+    """
+    global RESTART_PATH, BRANDS_RESTART_PATH
 
-    return cur_item_id, items, unit_lu
+    return BRANDS_RESTART_PATH if directory == 'brands' else RESTART_PATH
 
-def get_NLEA_info(bs: BeautifulSoup) -> tuple[str, float, float]:
+def get_table_links(bs: BeautifulSoup)->list:
     """
-    Extracts the NLEA serving unit, unit value, and mass from an item's HTML page.
+    Extracts all links (<a> elements) with the class 'table_item_name' from a second-level table.
 
     Parameters:
-        bs (BeautifulSoup): A BeautifulSoup object representing the parsed HTML content of the item's page.
+        bs (BeautifulSoup): A BeautifulSoup object containing the parsed HTML content.
 
     Returns:
-        tuple[str, float, float]: A tuple containing:
-            - NLEA serving unit (str): The unit of the NLEA serving.
-            - Unit value (float): The numeric value associated with the unit.
-            - Mass (float): The mass or amount corresponding to the serving size.
+        list: A list of <a> elements with the class 'table_item_name'.
 
     Raises:
-        ValueError: If the required NLEA information cannot be located or parsed.
-
-    Notes:
-        - This function relies on the `split_unit_value_and_ammount` helper function to parse the extracted `value`.
-        - Ensure that the HTML structure includes an `<option>` tag with the `selected="selected"` attribute and a `value` attribute.
+        ValueError: If no matching elements are found in the table.
     """
-    NLEA_info = bs.find('option', selected="selected")
-    if NLEA_info:
-        NLEA_info = NLEA_info.get('value')
-        return split_unit_value_and_ammount(NLEA_info)
-    raise ValueError("NLEA information not found on the page.")
 
-def split_unit_value_and_ammount(NLEA_info: str)->tuple[float, str, str, float, str]:
+    items = bs.find_all('a', {'class': 'table_item_name'})
+
+    if not items:
+        raise ValueError("Can't get items from 2nd level table")
+    
+    return items
+
+def gather_item_info(record: item_extract.ItemRecord, items: row_buffer.RowBuffer, unit_lu: registries.LookupRegistry,
+                     item_index: dedup_index.DedupIndex)->tuple[int, row_buffer.RowBuffer, registries.LookupRegistry]:
     """
-    Parses a string containing NLEA information and extracts the value, unit, alternate unit, amount, and amount unit.
+    Adds the item of an extracted item page to the items buffer and returns its ID.
 
     Parameters:
-        NLEA_info (str): A string containing NLEA information in the format 
-                         "<value> <unit> = <amount> <amount unit>".
+        record (item_extract.ItemRecord): The item page extracted by `item_extract.extract_item`.
+        items (row_buffer.RowBuffer): The buffer holding the current dataset of items.
+        unit_lu (registries.LookupRegistry): The lookup registry for units.
+        item_index (dedup_index.DedupIndex): The (name, brand) and UPC keys of every item already scraped.
 
     Returns:
-        tuple[float, str, str, float, str]:
-            - Value (float): The numeric value of the NLEA serving size.
-            - Unit (str): The primary unit of the NLEA serving size.
-            - Alternate unit (str): An alternate or cleaned version of the unit.
-            - Amount (float): The numeric amount associated with the serving size.
-            - Amount unit (str): The unit of the amount.
+        tuple[int, row_buffer.RowBuffer, registries.LookupRegistry]: 
+            - `cur_item_id` (int): The unique ID of the newly added item.
+            - `items` (row_buffer.RowBuffer): The items buffer with the new item added.
+            - `unit_lu` (registries.LookupRegistry): The unit lookup registry with new units added, if applicable.
 
     Raises:
-        ValueError: If the input string does not conform to the expected format.
-    """
-    
-    val = None
-    unit = None
-    ammount = None
-    for i, char in enumerate(NLEA_info):
-        #check if val is set and search for first space
-        if val == None:
-            if char == ' ':
-                val = NLEA_info[0:i]
-                unitStartIndex = i+1
-                continue
-            else:
-                continue
-        if char == '=':
-            unit = NLEA_info[unitStartIndex: i-1]
-            ammount = NLEA_info[i+2:]
-            break
-
-    ammount, amt_unit = clean_ammount(ammount)
-    return val.strip(), unit, ammount, amt_unit
+        ValueError: 
+            - If the item name and brand or the UPC is already in dataset.
+            - If the function fails to retrieve `cur_item_id`.
 
-def clean_unit_measure(unit: str)->tuple[str, str]:
+    Notes:
+        -The Items buffer needs to contain columns corresponding to the keys in `new_row`
     """
-    Cleans and standardizes a unit string by removing additional information, such as text in parentheses `(info)` 
-    and the word "aprx". Extracts alternate units, if present, from the parentheses.
 
-    Parameters:
-        unit (str): A string representing the unit, which may include additional information or alternate units 
-                    in parentheses and the word "aprx".
+    new_row = {'item_id': None, 'name': record.name, 'brand': record.brand, 'NLEA_unit': None, 'NLEA_val': record.NLEA_val,
+               'ammount': record.ammount, 'ammount_unit': None, 'upc': record.upc, 'ingredient_list': record.ingredients}
 
-    Returns:
-        tuple[str, str]:
-            - Cleaned unit (str): The standardized unit string with extraneous information removed.
-            - Alternate unit (str): A string of alternate units extracted from the parentheses, separated by '/' 
-              if multiple are found.
-    """
-    alt = ""
-    pattern = r'\((.*?)\)'
-    matches = re.findall(pattern, unit)
+    if item_index.contains_item(new_row['name'], new_row['brand']):
+        raise ValueError("We have Duplicate Row, [" + new_row['name'] + new_row['brand']+"]", False)
 
-    if len(matches) > 1:
-        for match in matches:
-            alt += match + '/'
-    elif len(matches) > 0:
-        alt = matches[0]
-    unit = unit.replace('aprx', '').strip()
-    unit = unit.replace('approximate', '').strip()
-    unit = re.sub(pattern, '', unit).strip()
-    return unit, alt
+    if item_index.contains_upc(new_row['upc']):
+        raise ValueError("We have Duplicate UPC, [" + new_row['upc'] + "]", False)
 
-def clean_ammount(ammount: str)->tuple[float, str]:
-    """
-    Cleans and parses an amount string, extracting the numeric value and its unit.
+    new_row['NLEA_unit'], unit_lu = get_unit_id(record.NLEA_unit, unit_lu)
+    new_row['ammount_unit'], unit_lu = get_unit_id(record.ammount_unit, unit_lu)
 
-    Parameters:
-        ammount (str): A string representing the amount, which typically contains a numeric value followed by a unit 
-                       (e.g., "100 g" or "2.5 kg").
+    cur_item_id, items = get_item_id(new_row, items)
+    item_index.add(new_row['name'], new_row['brand'], new_row['upc'])
 
-    Returns:
-        tuple[float, str]:
-            - Numeric value (float): The extracted numeric value of the amount.
-            - Unit (str): The unit associated with the amount (e.g., "g", "kg").
+    if not cur_item_id:
+        ValueError("Failed to get cur_item_id", False)
 
-        Returns an empty tuple ('', '') if the input string does not match the expected format.
+    return cur_item_id, items, unit_lu
 
-    """
-    
-    pattern = r'(\d+(?:\.\d+)?)\s*(\w+)' 
-    match = re.match(pattern, ammount)
-    if match:
-        ammount, unit = match.groups()
-    else:
-        return '', ''
-    return ammount, unit
-    
-def get_unit_id(unit:str, unit_lu: pd.DataFrame)->tuple[int, pd.DataFrame]:
+def get_unit_id(unit:str, unit_lu: registries.LookupRegistry)->tuple[int, registries.LookupRegistry]:
     """     
-    Processes a unit string and returns its corresponding ID. If the unit is not found in the lookup table, 
-    it adds the unit to the table with a new unique ID.
+    Processes a unit string and returns its corresponding ID. If the unit is not found in the lookup registry, 
+    it adds the unit with a new unique ID.
 
     Parameters:
         unit (str): The unit string to be processed.
-        unit_lu (pd.DataFrame): A Pandas DataFrame representing the unit lookup table with the following structure:
-            - 'id': A unique identifier for each unit (int).
+        unit_lu (registries.LookupRegistry): The unit lookup registry, exported as:
+            - 'unit_id': A unique identifier for each unit (int).
             - 'name': The name of the unit (str).
 
     Returns:
-        tuple[int, pd.DataFrame]:
+        tuple[int, registries.LookupRegistry]:
             - ID (int): The unique identifier for the unit.
-            - Updated unit_lu (pd.DataFrame): The updated unit lookup table with the unit added if it was not already present.
+            - unit_lu (registries.LookupRegistry): The unit lookup registry with the unit added if it was not already present.
 
-    Raises:
-        ValueError: If the input unit is an empty string.
+    Notes:
+        - An empty unit is treated as grams.
     """
 
     if unit == '':
         unit = 'g'
-    
-    if unit in unit_lu['name'].values:
-        return int(unit_lu.loc[unit_lu['name'] == unit, 'unit_id'].values[0]), unit_lu
-
-    next_id = 1 if unit_lu.empty else int(unit_lu['unit_id'].max() + 1)
-
-    new_row = {'unit_id': next_id, 'name': unit}
-    unit_lu.loc[len(unit_lu)] = new_row
-
-    return next_id, unit_lu
-
-def get_UPC(bs: BeautifulSoup)->str:
-    """
-    Extracts the UPC (Universal Product Code) from a BeautifulSoup object.
-
-    Parameters:
-        bs (BeautifulSoup): A BeautifulSoup object containing the HTML content of the page.
-
-    Returns:
-        str: The concatenated UPC code as a string. Returns an empty string if no UPC digits are found.
-
-    """
-    rtnVal = ''
-    codes = bs.find_all('div', {'class': 'upc-digit'})
-    if not codes:
-        return rtnVal
-    
-    for code in codes:
-        if code.get_text():
-            rtnVal += code.get_text()
-    return rtnVal
-
-def get_ingredient(bs:BeautifulSoup)->str:
-    """
-    Extracts the list of ingredients from a BeautifulSoup object.
-
-    Parameters:
-        bs (BeautifulSoup): A BeautifulSoup object containing the HTML content of the page.
-
-    Returns:
-        str: A string of ingredients, separated by double spaces. Returns an empty string if no ingredients are found.
 
-    Notes:
-        - The function searches for a `<table>` element with the class `wide results`.
-        - It retrieves all `<td>` elements with the class `left` within the table.
-        - Each ingredient's text is concatenated with double spaces in the final string.
-    """
-    ing_list = ''
-    table = bs.find('table', {'class': 'wide results'})
-    if table:
-        ingredients = table.find_all('td', {'class': 'left'})
-    else:
-        return ''
-    for ing_item in ingredients:
-        text = str(ing_item.get_text())
-        if(text):
-            ing_list += text + '  '
-    
-    return ing_list
+    return unit_lu.get_id(unit), unit_lu
 
-def get_item_id(row: dict, items: pd.DataFrame):
+def get_item_id(row: dict, items: row_buffer.RowBuffer):
     """
-    Inserts a new item into the items DataFrame and returns the ID of the newly added item.
+    Inserts a new item into the items buffer and returns the ID of the newly added item.
 
     Parameters:
-        row (dict): A dictionary containing item data to be added to the DataFrame.
-        items (pd.DataFrame): A Pandas DataFrame representing the items table. 
-                              It is expected to have an 'id' column.
+        row (dict): A dictionary containing item data to be added to the buffer.
+        items (row_buffer.RowBuffer): The buffer holding the items table. 
+                              It is expected to have an 'item_id' column and an ID allocator.
 
     Returns:
-        tuple[int, pd.DataFrame]: 
+        tuple[int, row_buffer.RowBuffer]: 
             - The unique ID assigned to the newly added item (int).
-            - The updated items DataFrame with the new row appended.
-
-    Notes:
-        - If the DataFrame is empty, the new item's ID is set to 1.
-        - Otherwise, the ID is set to the current maximum ID + 1.
+            - The items buffer with the new row appended.
     """
     
     # Assign an ID to the new row
-    row['item_id'] = 1 if items.empty else int(items['item_id'].max()) + 1
-    row_num = len(items)
-    items.loc[row_num] = row
+    row['item_id'] = items.ids.next()
+    items.append(row)
     
     return row['item_id'], items
 
-def get_other_measures(bs: BeautifulSoup, item_id: int, conversion_junc: pd.DataFrame, unit_lu: pd.DataFrame)->tuple[pd.DataFrame, pd.DataFrame]:
+def get_other_measures(record: item_extract.ItemRecord, item_id: int, conversion_junc: row_buffer.RowBuffer, unit_lu: registries.LookupRegistry)->tuple[row_buffer.RowBuffer, registries.LookupRegistry]:
     """
-    Extracts additional conversion measures from a BeautifulSoup object and updates the conversion junction
-    and unit lookup DataFrames.
+    Adds the conversion measures of an extracted item page to the conversion junction buffer and unit lookup registry.
 
     Parameters:
-        bs (BeautifulSoup): A BeautifulSoup object containing the HTML content with measure options.
+        record (item_extract.ItemRecord): The item page extracted by `item_extract.extract_item`.
         item_id (int): The ID of the item associated with the conversion measures.
-        conversion_junc (pd.DataFrame): A Pandas DataFrame representing the conversion junction table.
+        conversion_junc (row_buffer.RowBuffer): The buffer holding the conversion junction table.
                                         - 'id': 
                                         - 'item_id'
                                         - 'unit_id'
@@ -433,32 +445,19 @@ def get_other_measures(bs: BeautifulSoup, item_id: int, conversion_junc: pd.Data
                                         - 'value'
                                         - 'ammount'
                                         - 'ammount_unit'
-        unit_lu (pd.DataFrame): A Pandas DataFrame representing the unit lookup table. 
+        unit_lu (registries.LookupRegistry): The unit lookup registry.
                                 - 'id': Unique identifier for each unit.
                                 - 'name': Name of the unit.
 
     Returns:
-        tuple[pd.DataFrame, pd.DataFrame]:
-            - Updated conversion_junc (pd.DataFrame): The conversion junction table with new rows added.
-            - Updated unit_lu (pd.DataFrame): The unit lookup table with any new units added.
+        tuple[row_buffer.RowBuffer, registries.LookupRegistry]:
+            - Updated conversion_junc (row_buffer.RowBuffer): The conversion junction buffer with new rows added.
+            - unit_lu (registries.LookupRegistry): The unit lookup registry with any new units added.
 
     """
-    excluded_vals = ['100 g', '1 g', '1 ounce = 28.3495 g', '1 pound = 453.592 g', '1 kg = 1000 g', 'custom g', 'custom oz']
-
     new_row = {'conversion_id': None, 'item_id': None, 'unit_id': None, 'unit_alt': None, 'value': None, 'unit_amt': None, 'amt_unit': None}
 
-    measures = bs.find_all('option')
-
-    if not measures:
-        raise ValueError("Mesures total option failed")
-
-    for measure in measures:
-        if not measure:
-            raise ValueError("Individual measure NONE")
-        value = measure.get('value') 
-        if value in excluded_vals:
-            continue
-        val, unit, ammount, amt_unit = split_unit_value_and_ammount(value)
+    for val, unit, ammount, amt_unit in record.measures:
         new_row['item_id'] = item_id
         new_row['unit_id'], unit_lu = get_unit_id(unit, unit_lu)
         new_row['unit_amt'] = val
@@ -468,162 +467,39 @@ def get_other_measures(bs: BeautifulSoup, item_id: int, conversion_junc: pd.Data
     
     return conversion_junc, unit_lu
 
-def add_to_conv_junc(data: dict, conversion_junc: pd.DataFrame)->pd.DataFrame:
+def add_to_conv_junc(data: dict, conversion_junc: row_buffer.RowBuffer)->row_buffer.RowBuffer:
     """
-    Adds a new row to the conversion junction DataFrame.
+    Adds a new row to the conversion junction buffer.
 
     Parameters:
-        data (dict): A dictionary containing the data for the new row. The `id` field will be automatically assigned.
-        df (pd.DataFrame): The conversion junction DataFrame to which the new row will be added.
-                        It is assumed to have an 'id' column for unique identification.
+        data (dict): A dictionary containing the data for the new row. The `conversion_id` field will be automatically assigned.
+        conversion_junc (row_buffer.RowBuffer): The conversion junction buffer to which the new row will be added.
+                        It is assumed to have a 'conversion_id' column and an ID allocator.
 
     Returns:
-        pd.DataFrame: The updated DataFrame with the new row appended.
+        row_buffer.RowBuffer: The buffer with the new row appended.
     """
 
-    data['conversion_id'] = 1 if conversion_junc.empty else conversion_junc['conversion_id'].max() + 1
-    row_num = len(conversion_junc)
-    conversion_junc.loc[row_num] = data
+    data['conversion_id'] = conversion_junc.ids.next()
+    conversion_junc.append(data)
     print("Added Conv_junc data")
 
     return conversion_junc
 
-def get_nutrients(bs: BeautifulSoup)->dict:
-    """
-    Extracts nutrient information from a BeautifulSoup object and organizes it into a dictionary.
-
-    Parameters:
-        bs (BeautifulSoup): A BeautifulSoup object representing the HTML content of the page.
-
-    Returns:
-        dict: A dictionary of nutrient values in the format:
-            {
-                'category_name': [
-                    [nutrient_name (str), alt_name (str), amount (float), unit_measure (str), daily_value (str)]
-                ],
-                'Calories': ['Calories', 'kcal', amount (float), 'J', '']
-            }
-
-    Raises:
-        ValueError: 
-            - If calorie amount cannot be accessed.
-            - If a nutrient category cannot be retrieved.
-    """
-    nuts = {}
-
-    nut_tables = bs.find_all('table', {'class': 'center wide cellpadding3 nutrient results'})
-
-    cal_ammount = bs.find('td', {'id': 'calories'})
-
-    if not cal_ammount:
-        ValueError("Could Not Access Calorie Ammount")
-    
-    cal_ammount = cal_ammount.get_text()
-
-    nuts['Calories'] = ['Calories', 'kcal', cal_ammount, 'J', '']
-
-    if nut_tables:
-        for nut_group in nut_tables:
-            category = get_nutrient_category(nut_group)
-            if not category:
-                ValueError("Failed to get Nutrient Category")
-            if category not in nuts.keys():
-                line = parse_nutrient_table(nut_group)
-                if line:
-                    nuts[category] = line
-                else:
-                    nuts[category] = []
-            else:
-                nuts[category] += parse_nutrient_table(nut_group)
-
-    return nuts
-
-def get_nutrient_category(bs:BeautifulSoup):
-    """
-    Extracts the nutrient category from the provided BeautifulSoup object.
-
-    Parameters:
-        bs (BeautifulSoup): A BeautifulSoup object representing the HTML content of the page.
-
-    Returns:
-        str: The name of the nutrient category if found.
-
-    Raises:
-        ValueError: If the category cannot be located in the HTML content.
-    """
-    cat = bs.find('th', {'colspan': '3'})
-    if cat:
-        return cat.get_text()
-    return ValueError("Failed to Get Category")
-
-def parse_nutrient_table(bs: BeautifulSoup):
-    """
-    Parses a nutrient table from the provided BeautifulSoup object and extracts nutrient information.
-
-    Parameters:
-        bs (BeautifulSoup): A BeautifulSoup object representing the HTML content of the nutrient table.
-
-    Returns:
-        list: A list of lists, where each inner list contains the following nutrient details:
-            [name (str), alternate name (str), amount (float), unit (str), daily value (str)].
-
-    Raises:
-        ValueError: If nutrient name or amount cannot be retrieved.
-    """
-    rtnVal = []
-    table_tr = bs.find_all('tr')
-    if table_tr:
-        for tr in table_tr:
-            if tr.find('td', {'colspan': '3'}):
-                continue
-            if tr.find('th'):
-                continue
-
-            name = tr.find('a', {'class': 'tooltip'})
-            if not name:
-                name = tr.find('td', {'class': 'left'})
-                if name:
-                    name = name.get_text()
-                else:
-                    continue
-            else:
-                name = name.get('data-tooltip')
-            alt = tr.find('span', {'class': 'gray'})
-            if not alt:
-                alt = ''
-            else:
-                alt = alt.get_text()
-            ammount = tr.find('td', {'class': 'right'})
-            if not ammount:
-                ValueError("Failed to get Nutrient Ammount")
-            ammount = ammount.get_text()
-            if ammount == '':
-                return None
-            dv = tr.find('a', {'target': '_blank'})
-            if not dv:
-                dv = ''
-            else:
-                dv = dv.get_text()
-            ammount, unit = clean_ammount(ammount)
-            line_list = [name, alt, ammount, unit, dv]
-            rtnVal.append(line_list)
-    
-    return rtnVal
-
-def insert_nutrients(nutrient_lu: pd.DataFrame, nutrient_category_lu: pd.DataFrame, nutrient_junc: pd.DataFrame, 
-                     unit_lu: pd.DataFrame, nuts: dict, item:int)->tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+def insert_nutrients(nutrient_lu: registries.LookupRegistry, nutrient_category_lu: registries.LookupRegistry, nutrient_junc: row_buffer.RowBuffer, 
+                     unit_lu: registries.LookupRegistry, nuts: dict, item:int)->tuple[registries.LookupRegistry, registries.LookupRegistry, row_buffer.RowBuffer, registries.LookupRegistry]:
     """
     Inserts nutrient data into multiple lookup and junction tables, updating the nutrient, nutrient category, 
     nutrient junction, and unit lookup DataFrames.
 
     Parameters:
-        nutrient_lu (pd.DataFrame): A Pandas DataFrame representing the nutrient lookup table. 
+        nutrient_lu (registries.LookupRegistry): The nutrient lookup registry. 
                                     - 'id'
                                     - 'name'
-        nutrient_category_lu (pd.DataFrame): A Pandas DataFrame representing the nutrient category lookup table. 
+        nutrient_category_lu (registries.LookupRegistry): The nutrient category lookup registry. 
                                             - 'id'
                                             - 'name'
-        nutrient_junc (pd.DataFrame): A Pandas DataFrame representing the nutrient junction table. 
+        nutrient_junc (row_buffer.RowBuffer): The buffer holding the nutrient junction table. 
                                     - 'id':
                                     - 'item_id':
                                     - 'nutrient_id':
@@ -632,7 +508,7 @@ def insert_nutrients(nutrient_lu: pd.DataFrame, nutrient_category_lu: pd.DataFra
                                     - 'ammount'
                                     - 'unit'
                                     - 'dv'
-        unit_lu (pd.DataFrame): A Pandas DataFrame representing the unit lookup table. 
+        unit_lu (registries.LookupRegistry): The unit lookup registry. 
                                 - 'id'
                                 - 'name'
         nuts (dict): A dictionary where keys are nutrient categories and values are lists of nutrient data.
@@ -641,11 +517,11 @@ def insert_nutrients(nutrient_lu: pd.DataFrame, nutrient_category_lu: pd.DataFra
         item (int): The ID of the item associated with the nutrients being inserted.
 
     Returns:
-        tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-            - Updated nutrient_lu (pd.DataFrame): Nutrient lookup table with any new nutrients added.
-            - Updated nutrient_category_lu (pd.DataFrame): Nutrient category lookup table with any new categories added.
-            - Updated nutrient_junc (pd.DataFrame): Nutrient junction table with the new rows added.
-            - Updated unit_lu (pd.DataFrame): Unit lookup table with any new units added.
+        tuple[registries.LookupRegistry, registries.LookupRegistry, row_buffer.RowBuffer, registries.LookupRegistry]:
+            - nutrient_lu (registries.LookupRegistry): Nutrient lookup registry with any new nutrients added.
+            - nutrient_category_lu (registries.LookupRegistry): Nutrient category lookup registry with any new categories added.
+            - Updated nutrient_junc (row_buffer.RowBuffer): Nutrient junction buffer with the new rows added.
+            - unit_lu (registries.LookupRegistry): Unit lookup registry with any new units added.
     """
 
     keys = nuts.keys()
@@ -653,20 +529,19 @@ def insert_nutrients(nutrient_lu: pd.DataFrame, nutrient_category_lu: pd.DataFra
     for key in keys:
         cat_id, nutrient_category_lu = get_nutrient_category_table_id(nutrient_category_lu, key)
         if key == 'Calories':
-            row_id = 1 if nutrient_junc.empty else int(nutrient_junc['nut_junc_id'].max() + 1)
+            row_id = nutrient_junc.ids.next()
             new_row, nutrient_lu, unit_lu = create_nutrient_junk_row(nuts[key], cat_id, item, row_id, nutrient_lu, unit_lu)
-            nutrient_junc.loc[len(nutrient_junc)] = new_row
+            nutrient_junc.append(new_row)
             continue
         data = nuts[key]
         for d in data:
-            row_id = 1 if nutrient_junc.empty else int(nutrient_junc['nut_junc_id'].max() + 1)
+            row_id = nutrient_junc.ids.next()
             new_row, nutrient_lu, unit_lu = create_nutrient_junk_row(d, cat_id, item, row_id, nutrient_lu, unit_lu)
-            row_num = len(nutrient_junc)
-            nutrient_junc.loc[row_num] = new_row
+            nutrient_junc.append(new_row)
 
     return nutrient_lu, nutrient_category_lu, nutrient_junc, unit_lu        
 
-def create_nutrient_junk_row(data:list, cat:int, item:int, row_id: int, nutrient_lu:pd.DataFrame, unit_lu:pd.DataFrame)->tuple[dict, pd.DataFrame, pd.DataFrame]:
+def create_nutrient_junk_row(data:list, cat:int, item:int, row_id: int, nutrient_lu:registries.LookupRegistry, unit_lu:registries.LookupRegistry)->tuple[dict, registries.LookupRegistry, registries.LookupRegistry]:
     """
     Creates a row for a nutrient junction table based on the provided data and updates the relevant lookup tables.
 
@@ -675,15 +550,15 @@ def create_nutrient_junk_row(data:list, cat:int, item:int, row_id: int, nutrient
         cat (int): The ID of the nutrient category to which this nutrient belongs.
         item (int): The ID of the item associated with this nutrient.
         row_id (int): The unique identifier for the row being created.
-        nutrient_lu (pd.DataFrame):
+        nutrient_lu (registries.LookupRegistry):
             - 'id'
             - 'name'
-        unit_lu (pd.DataFrame):
+        unit_lu (registries.LookupRegistry):
             - 'id'
             - 'name'
 
     Returns:
-        tuple[dict, pd.DataFrame, pd.DataFrame]:
+        tuple[dict, registries.LookupRegistry, registries.LookupRegistry]:
             - dict: A dictionary representing the created nutrient junction row with the following keys:
                 - 'id'
                 - 'item_id'
@@ -693,8 +568,8 @@ def create_nutrient_junk_row(data:list, cat:int, item:int, row_id: int, nutrient
                 - 'ammount':
                 - 'unit':
                 - 'dv':
-            - Updated nutrient_lu (pd.DataFrame): The nutrient lookup table with new nutrients added, if applicable.
-            - Updated unit_lu (pd.DataFrame): The unit lookup table with new units added, if applicable.
+            - nutrient_lu (registries.LookupRegistry): The nutrient lookup registry with new nutrients added, if applicable.
+            - unit_lu (registries.LookupRegistry): The unit lookup registry with new units added, if applicable.
 
     """
     nut_junk = {'nut_junc_id': row_id, 'item_id': item, 'nutrient_id': None, 'alt_id': None, 'cat_id': cat,  'ammount': None, 'unit_id': None, 'dv': None}
@@ -708,325 +583,1619 @@ def create_nutrient_junk_row(data:list, cat:int, item:int, row_id: int, nutrient
     nut_junk['dv'] = data[4]
     return nut_junk, nutrient_lu, unit_lu
     
-def get_nutrient_category_table_id(nutrient_category_lu: pd.DataFrame, cat: str)->tuple[int, pd.DataFrame]:
+def get_nutrient_category_table_id(nutrient_category_lu: registries.LookupRegistry, cat: str)->tuple[int, registries.LookupRegistry]:
     """
-    Retrieves the ID of a nutrient category from a lookup DataFrame. If the category does not exist, it adds the category 
-    to the DataFrame with a new ID.
+    Retrieves the ID of a nutrient category from the lookup registry. If the category does not exist, it adds the category 
+    with a new ID.
 
     Parameters:
-        nutrient_category_lu (pd.DataFrame): A Pandas DataFrame representing the nutrient category lookup table. 
-                                            - 'id'
+        nutrient_category_lu (registries.LookupRegistry): The nutrient category lookup registry, exported as:
+                                            - 'cat_id'
                                             - 'name'
         cat (str): The name of the nutrient category to retrieve or add.
 
     Returns:
-        tuple[int, pd.DataFrame]:
+        tuple[int, registries.LookupRegistry]:
             - ID (int): The unique ID of the nutrient category.
-            - Updated nutrient_category_lu (pd.DataFrame): The updated nutrient category lookup DataFrame 
+            - nutrient_category_lu (registries.LookupRegistry): The nutrient category lookup registry 
             with the category added, if necessary.
     """
-    if cat in nutrient_category_lu['name'].values:
-        return int(nutrient_category_lu.loc[nutrient_category_lu['name'] == cat, 'cat_id'].values[0]), nutrient_category_lu
-    
-    next_id = 1 if nutrient_category_lu.empty else int(nutrient_category_lu['cat_id'].max()) + 1
 
-    new_row = {'cat_id': next_id, 'name': cat}
-    row_num = len(nutrient_category_lu)
-    nutrient_category_lu.loc[row_num] = new_row
+    return nutrient_category_lu.get_id(cat), nutrient_category_lu
 
-    return next_id, nutrient_category_lu
-
-def get_nutrient_id(nutrient_lu: pd.DataFrame, nut:str)->tuple[int, pd.DataFrame]:
+def get_nutrient_id(nutrient_lu: registries.LookupRegistry, nut:str)->tuple[int, registries.LookupRegistry]:
     """
-    Retrieves the ID of a nutrient from a lookup DataFrame. If the nutrient does not exist, it adds the nutrient
-    to the DataFrame with a new ID.
+    Retrieves the ID of a nutrient from the lookup registry. If the nutrient does not exist, it adds the nutrient
+    with a new ID.
 
     Parameters:
-        nutrient_lu (pd.DataFrame): A Pandas DataFrame representing the nutrient lookup table. 
-                                    - 'id'
-                                    - 'name
+        nutrient_lu (registries.LookupRegistry): The nutrient lookup registry, exported as:
+                                    - 'nutrient_id'
+                                    - 'name'
         nut (str): The name of the nutrient to retrieve or add.
 
     Returns:
-        tuple[int, pd.DataFrame]: 
-            - ID (int): The unique ID of the nutrient. Returns an empty string if `nut` is an empty string.
-            - Updated nutrient_lu (pd.DataFrame): The updated nutrient lookup DataFrame with the nutrient added, if necessary.
+        tuple[int, registries.LookupRegistry]: 
+            - ID (int): The unique ID of the nutrient.
+            - nutrient_lu (registries.LookupRegistry): The nutrient lookup registry with the nutrient added, if necessary.
+
+    Raises:
+        ValueError: If `nut` is an empty string.
     """
 
     if nut == '':
         raise ValueError('Nutrient_lu get id passed an empty nutrient')
 
-    if nut in nutrient_lu['name'].values:
-        return int(nutrient_lu.loc[nutrient_lu['name'] == nut, 'nutrient_id'].values[0]), nutrient_lu
-    
-    next_id = 1 if nutrient_lu.empty else int(nutrient_lu['nutrient_id'].max() + 1)
-
-    new_row = {'nutrient_id': next_id, 'name': nut}
-    row_num = len(nutrient_lu)
-    nutrient_lu.loc[row_num] = new_row
+    return nutrient_lu.get_id(nut), nutrient_lu
 
-    return next_id, nutrient_lu
+def write_data(items:row_buffer.RowBuffer, unit_lu: registries.LookupRegistry, conversion_junc: row_buffer.RowBuffer,
+               nutrient_lu:registries.LookupRegistry, nutrient_category_lu:registries.LookupRegistry, nutrient_junc:row_buffer.RowBuffer):
+    """
+    Appends the rows scraped since the last write to the item and junction tables and saves the lookup tables.
+    The cost is proportional to the new rows, rows already on disk are never re-read or rewritten.
 
-def rollback_item(item_id: int, items:pd.DataFrame, conversion_junc: pd.DataFrame, nutrient_junc:pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    """"""
-    if item_id == None:
-        return items, conversion_junc, nutrient_junc
-    
-    items = items[items['id'] != item_id]
-    conversion_junc = conversion_junc[conversion_junc['item_id'] != item_id]
-    nutrient_junc = nutrient_junc[nutrient_junc['item_id'] != item_id]
+    Parameters:
+        items (row_buffer.RowBuffer): The buffer of item data to be saved.
+        unit_lu (registries.LookupRegistry): The unit lookup registry to be saved.
+        conversion_junc (row_buffer.RowBuffer): The buffer of unit conversion data to be saved.
+        nutrient_lu (registries.LookupRegistry): The nutrient lookup registry to be saved.
+        nutrient_category_lu (registries.LookupRegistry): The nutrient category lookup registry to be saved.
+        nutrient_junc (row_buffer.RowBuffer): The buffer of nutrient junction data to be saved.
 
-    return items, conversion_junc, nutrient_junc
+    Outputs:
+        - Appends the buffered rows as a new segment of each table through `storage.append_rows` and empties the buffers.
+        - Rewrites the lookup tables, which are small, through `storage.write_atomic`.
+        - With `SINK` set to 'mysql' or 'both' the lookups and the buffered rows are then written to the database in
+          one transaction. Rows the database rejects are left out and quarantined in `SINK_QUARANTINE_PATH`, see
+          `mysql_sink.MySQLSink.write`.
+        - The table files are appended to first, they are what a restart goes on from. If the database write fails
+          its rows are kept in `SINK_PENDING` and sent with the next write, with `SINK` set to 'mysql' the buffers
+          are kept instead.
 
-def write_data(items:pd.DataFrame, unit_lu: pd.DataFrame, conversion_junc: pd.DataFrame,
-               nutrient_lu:pd.DataFrame, nutrient_category_lu:pd.DataFrame, nutrient_junc:pd.DataFrame):
+    Notes:
+        - With `SINK` set to 'mysql' the item and junction table files are not written, a restart reads the IDs
+          already written and rebuilds a lost item index from the database instead, see `written_ids` and
+          `load_item_index`.
     """
-    Writes multiple Pandas DataFrames to CSV files and prints their shapes and first few rows for inspection.
 
-    Parameters:
-        items (pd.DataFrame): A DataFrame containing item data to be saved.
-        unit_lu (pd.DataFrame): A DataFrame containing unit lookup data to be saved.
-        conversion_junc (pd.DataFrame): A DataFrame containing unit conversion data to be saved.
-        nutrient_lu (pd.DataFrame): A DataFrame containing nutrient lookup data to be saved.
-        nutrient_category_lu (pd.DataFrame): A DataFrame containing nutrient category data to be saved.
-        nutrient_junc (pd.DataFrame): A DataFrame containing nutrient junction data to be saved.
+    global ITEMS_PATH, UNITLU_PATH, NUTLU_PATH, NUTJUNC_PATH, CONVJUNC_PATH, NUTCAT_PATH, IDS_PATH, SINK, SINK_PENDING
 
-    Outputs:
-        - Saves each DataFrame as a CSV file in the specified directory.
+    #saved before the tables so a crash in between leaves gaps rather than reused IDs
+    id_allocators.save_allocators(IDS_PATH, {'item_id': items.ids, 'conversion_id': conversion_junc.ids, 'nut_junc_id': nutrient_junc.ids})
+
+    #lookups first so no junction row on disk points at a missing lookup ID
+    storage.write_atomic(UNITLU_PATH, unit_lu.to_frame())
+
+    storage.write_atomic(NUTLU_PATH, nutrient_lu.to_frame())
+
+    storage.write_atomic(NUTCAT_PATH, nutrient_category_lu.to_frame())
+
+    frames = {'items': items.to_frame(), 'conversion_junc': conversion_junc.to_frame(), 'nutrient_junc': nutrient_junc.to_frame()}
+    buffers = ((ITEMS_PATH, 'items', items), (CONVJUNC_PATH, 'conversion_junc', conversion_junc),
+               (NUTJUNC_PATH, 'nutrient_junc', nutrient_junc))
+    if SINK != 'mysql':
+        for path, name, buffer in buffers:
+            storage.append_rows(path, frames[name])
+            buffer.clear()
+
+    sink = open_sink()
+    if sink is None:
+        return
+    if SINK_PENDING is not None:
+        frames = {name: pd.concat([SINK_PENDING[name], frames[name]], ignore_index=True) for name in frames}
+    try:
+        sink.write({'unit_lu': unit_lu.to_frame(), 'nutrient_lu': nutrient_lu.to_frame(),
+                    'nutrient_category_lu': nutrient_category_lu.to_frame(), **frames})
+    except Exception:
+        if SINK != 'mysql':
+            SINK_PENDING = frames
+        raise
+    SINK_PENDING = None
+    for path, name, buffer in buffers:
+        buffer.clear()
+
+def open_sink()->mysql_sink.MySQLSink:
     """
+    Returns the database sink, connecting on first use, or None when `SINK` only writes files.
+    """
+    global SINK, MYSQL_SINK, SINK_QUARANTINE_PATH
+
+    if SINK == 'files':
+        return None
+    if MYSQL_SINK is None:
+        MYSQL_SINK = mysql_sink.MySQLSink(quarantine_path=SINK_QUARANTINE_PATH)
+    return MYSQL_SINK
 
-    global ITEMS_PATH, UNITLU_PATH, NUTLU_PATH, NUTJUNC_PATH, CONVJUNC_PATH, NUTCAT_PATH
+def write_restart_progress(progress: dict):
+    """
+    Writes the page every unfinished letter has reached to the restart file of its listing directory, a
+    `RESTART_VERSION_LINE` followed by one "letter page" line per letter.
 
-    if os.path.exists(ITEMS_PATH):
-        items_1 = pd.read_csv(ITEMS_PATH)
+    Parameters:
+        progress (dict): Maps the key of each unfinished letter, see `crawl_keys`, to the page it should resume from.
 
-    if os.path.exists(CONVJUNC_PATH):
-        conversion_junc_1 = pd.read_csv(CONVJUNC_PATH)
-    
-    if os.path.exists(NUTJUNC_PATH):
-        nutrient_junc_1 = pd.read_csv(NUTJUNC_PATH)
-    
-    items_total = pd.DataFrame(pd.concat([items_1.iloc[:-20], items], ignore_index=True))
-    conv_total = pd.DataFrame(pd.concat([conversion_junc_1.iloc[:-20], conversion_junc], ignore_index=True))
-    nutrient_total = pd.DataFrame(pd.concat([nutrient_junc_1.iloc[:-20], nutrient_junc], ignore_index=True))
+    Notes:
+        - Lines are written in `LETTER_LIST` order. Only the letters listed are crawled on a restart, a file holding
+          one letter resumes that letter alone.
+        - The restart file of a directory outside `LISTING_DIRECTORIES` is only written if one of its letters is
+          in the progress, e.g. after `retry_failed`, so a crawl of the brand directory leaves the foods restart alone.
+    """
+    global LISTING_DIRECTORIES, RESTART_VERSION_LINE
 
-    items_total.to_csv(ITEMS_PATH, index=False)
+    for directory in ('foods', 'brands'):
+        keys = [key for key in crawl_keys(directory) if key in progress]
+        if directory not in LISTING_DIRECTORIES and not keys:
+            continue
+        lines = [RESTART_VERSION_LINE] + [split_key(key)[1] + ' ' + str(progress[key]) for key in keys]
+        with open(restart_path(directory), 'w') as file:
+            file.write('\n'.join(lines))
 
-    unit_lu.to_csv(UNITLU_PATH, index=False)
+    logging_helper.write_to_file()
 
-    conv_total.to_csv(CONVJUNC_PATH, index=False)
+def parse_restart(restart: str)->tuple[dict, bool]:
+    """
+    Parses the contents of the restart file.
 
-    nutrient_lu.to_csv(NUTLU_PATH, index=False)
+    Parameters:
+        restart (str): The text of the restart file, an optional `RESTART_VERSION_LINE` and one "letter page" pair per line.
 
-    nutrient_category_lu.to_csv(NUTCAT_PATH, index=False)
+    Returns:
+        tuple: A tuple containing the following:
+            - dict: Maps each letter found in the file to the page it should resume from, in file order.
+            - bool: Whether the file is in the legacy format, without a `RESTART_VERSION_LINE`.
+    """
+    global RESTART_VERSION_LINE
 
-    nutrient_total.to_csv(NUTJUNC_PATH, index=False)
+    lines = [line.strip() for line in restart.splitlines() if line.strip()]
+    legacy = not lines or lines[0] != RESTART_VERSION_LINE
+    progress = {}
+    for line in lines[0 if legacy else 1:]:
+        letter, page = line.split(' ')
+        progress[letter] = int(page)
+    return progress, legacy
 
-def write_restart_data(current_letter, current_page):
+def build_progress(restart: str, directory: str = 'foods')->dict:
     """
-    Writes the current state of the script (current letter and page number) to a restart file for resuming execution later.
+    Works out which letters are left to crawl and the page each one resumes from.
 
     Parameters:
-        current_letter (str): The current letter being processed.
-        current_page (int): The current page number being processed.
+        restart (str): The text of the restart file.
+        directory (str): The listing directory of the restart file.
 
     Returns:
-        None
+        dict: Maps the key of each letter left to crawl, see `crawl_keys`, to its starting page, in `LETTER_LIST` order.
 
     Notes:
-        - The function writes the `current_letter` and `current_page` to a file named `restart.txt` in the specified directory.
-        - The file is overwritten each time this function is called.
+        - A restart file written by `write_restart_progress` only crawls the letters listed.
+        - A legacy restart file, one line without `RESTART_VERSION_LINE`, resumes that letter and crawls every letter after it.
+        - An empty restart file, or one without letters, starts the crawl over with every letter.
     """
-    global RESTART_PATH
+    global LETTER_LIST
 
-    with open(RESTART_PATH, 'w') as file:
-        file.write(current_letter + ' ' + str(current_page))
+    progress, legacy = parse_restart(restart)
+    if legacy and len(progress) == 1:
+        letter, page = next(iter(progress.items()))
+        progress = {l: 1 for l in LETTER_LIST[LETTER_LIST.index(letter):]}
+        progress[letter] = page
+    elif not progress:
+        progress = {l: 1 for l in LETTER_LIST}
 
-    logging_helper.write_to_file()
+    return {key: progress[l] for key, l in zip(crawl_keys(directory), LETTER_LIST) if l in progress}
+
+def read_restart(path: str)->str:
+    """
+    Reads a restart file, '' if it does not exist.
+    """
+    if not os.path.exists(path):
+        return ''
+    with open(path, 'r') as file:
+        return file.read().strip()
 
 def load_data_for_restart():
     """
-    Loads data from multiple CSV files and initializes DataFrames for restarting the script. 
-    If a file does not exist, an empty DataFrame with predefined columns is created.
+    Loads the lookup tables and ID state and initializes the tables for restarting the script. 
+    If a file does not exist, an empty table is created.
 
     Returns:
         tuple: A tuple containing the following:
-            - items (pd.DataFrame)
-            - unit_lu (pd.DataFrame)
-            - conversion_junc (pd.DataFrame)
-            - nutrient_lu (pd.DataFrame)
-            - nutrient_category_lu (pd.DataFrame)
-            - nutrient_junc (pd.DataFrame)
+            - items (row_buffer.RowBuffer)
+            - unit_lu (registries.LookupRegistry)
+            - conversion_junc (row_buffer.RowBuffer)
+            - nutrient_lu (registries.LookupRegistry)
+            - nutrient_category_lu (registries.LookupRegistry)
+            - nutrient_junc (row_buffer.RowBuffer)
             - restart (str)
 
     Notes:
-        - Each CSV file is checked for existence using `os.path.exists()`.
-        - If a file exists, it is loaded using `pd.read_csv()`.
-        - If a file does not exist, an empty DataFrame is initialized with predefined columns.
+        - items, conversion_junc and nutrient_junc start as empty `row_buffer.RowBuffer` objects, `write_data` only
+          appends new rows so the rows already on disk are not loaded. Duplicates are caught by the item index.
+        - The item, conversion and nutrient junction IDs come from `id_allocators`, seeded from `IDS_PATH`
+          so the tables are only scanned for IDs the first time.
+        - The lookup tables are loaded into `registries.LookupRegistry` objects instead of DataFrames.
+        - `STORAGE_BACKEND` selects the file format, 'csv' or 'parquet', of every table read here and written by `write_data`.
         - The `RESTART_PATH` file is read as a plain text file to retrieve the last processed state.
     """
-    global ITEMS_PATH, UNITLU_PATH, NUTLU_PATH, NUTJUNC_PATH, CONVJUNC_PATH, NUTCAT_PATH, RESTART_PATH
+    global ITEMS_PATH, UNITLU_PATH, NUTLU_PATH, NUTJUNC_PATH, CONVJUNC_PATH, NUTCAT_PATH, RESTART_PATH, IDS_PATH, STORAGE_BACKEND
 
-    if os.path.exists(ITEMS_PATH):
-        items_full = pd.read_csv(ITEMS_PATH)
-        items = pd.DataFrame(items_full.tail(20))
-    else:
-        items = pd.DataFrame(columns=['item_id', 'name', 'brand', 'NLEA_unit', 'NLEA_val', 'ammount', 'ammount_unit', 'upc', 'ingredient_list'])
+    storage.set_backend(STORAGE_BACKEND)
 
+    ids = id_allocators.load_allocators(IDS_PATH, {'item_id': ITEMS_PATH, 'conversion_id': CONVJUNC_PATH, 'nut_junc_id': NUTJUNC_PATH})
 
-    if os.path.exists(UNITLU_PATH):
-        unit_lu = pd.read_csv(UNITLU_PATH)
-    else:
-        unit_lu = pd.DataFrame(columns = ['unit_id', 'name'])
+    items = row_buffer.RowBuffer(ITEMS_COLUMNS, ids['item_id'])
 
-    if os.path.exists(CONVJUNC_PATH):
-        conversion_junc_full = pd.read_csv(CONVJUNC_PATH)
-        conversion_junc = pd.DataFrame(conversion_junc_full.tail(20))
-    else:
-        conversion_junc = pd.DataFrame(columns = ['conversion_id', 'item_id', 'unit_id', 'unit_amt', 'ammount', 'amt_unit'])
+    unit_lu = registries.LookupRegistry.from_table(UNITLU_PATH, 'unit_id')
+
+    conversion_junc = row_buffer.RowBuffer(CONVJUNC_COLUMNS, ids['conversion_id'])
     
-    if os.path.exists(NUTLU_PATH):
-        nutrient_lu = pd.read_csv(NUTLU_PATH)
-    else:
-        nutrient_lu = pd.DataFrame(columns = ['nutrient_id', 'name'])
+    nutrient_lu = registries.LookupRegistry.from_table(NUTLU_PATH, 'nutrient_id')
 
-    if os.path.exists(NUTCAT_PATH):
-        nutrient_category_lu = pd.read_csv(NUTCAT_PATH)
-    else:
-        nutrient_category_lu = pd.DataFrame(columns = ['cat_id', 'name'])
+    nutrient_category_lu = registries.LookupRegistry.from_table(NUTCAT_PATH, 'cat_id')
     
-    if os.path.exists(NUTJUNC_PATH):
-        nutrient_junc_full = pd.read_csv(NUTJUNC_PATH)
-        nutrient_junc = pd.DataFrame(nutrient_junc_full.tail(20))
-    else:
-        nutrient_junc = pd.DataFrame(columns = ['nut_junc_id', 'item_id', 'nutrient_id', 'alt_id', 'cat_id', 'ammount', 'unit_id', 'dv'])
+    nutrient_junc = row_buffer.RowBuffer(NUTJUNC_COLUMNS, ids['nut_junc_id'])
 
-    if os.path.exists(RESTART_PATH):
-        with open(RESTART_PATH, 'r') as file:
-            restart = file.readline()
-    else:
-        restart = ''
+    restart = read_restart(RESTART_PATH)
     
 
     return items, unit_lu, conversion_junc, nutrient_lu, nutrient_category_lu, nutrient_junc, restart
- 
 
-def main():
+def load_item_index()->dedup_index.DedupIndex:
+    """
+    Loads the (name, brand) and UPC index of every item scraped so far, building it from `ITEMS_PATH` on first use,
+    or from the item table of the database with `SINK` set to 'mysql', which writes no table files.
 
-    global BASE_WEBSITE, FOODS_START_MOD, BRANDS_START_MOD, SITE_END, LETTER_LIST, PAGE_COUNTER
+    Returns:
+        dedup_index.DedupIndex: The loaded index.
+    """
+    global ITEM_INDEX_PATH, ITEMS_PATH, SINK
 
-    listener_thread = threading.Thread(target=stop_listener, daemon=True)
-    listener_thread.start()
-    options = Options()
-    options.add_argument("--headless")
-    service = Service(executable_path='/snap/bin/geckodriver')
+    if SINK == 'mysql' and not os.path.exists(ITEM_INDEX_PATH):
+        return dedup_index.DedupIndex.build(ITEM_INDEX_PATH, open_sink().read_items())
+    return dedup_index.DedupIndex.load(ITEM_INDEX_PATH, ITEMS_PATH)
 
-    driver = webdriver.Firefox(service=service, options=options)
+def load_tables()->tuple[dict, str]:
+    """
+    Loads the tables for a crawl session.
 
-    #load the data
+    Returns:
+        tuple[dict, str]:
+            - tables (dict): The tables keyed by 'items', 'unit_lu', 'conversion_junc', 'nutrient_lu',
+                             'nutrient_category_lu', 'nutrient_junc' and 'item_index'.
+            - restart (str): The text of the restart file.
+    """
     items, unit_lu, conversion_junc, nutrient_lu, nutrient_category_lu, nutrient_junc, restart = load_data_for_restart()
-    print('Length items:\t', len(items), '\n')
-    print('Length unit_lu:\t', len(unit_lu), '\n')
-    print('Length conv:\t', len(conversion_junc), '\n')
-    print('Length Nut_cat:\t', len(nutrient_category_lu), '\n')
-    print('Length nutrient jun:\t', len(nutrient_junc), '\n')
-    print('Length nutrient_lu:\t', len(nutrient_lu), '\n')
-
-    #clean save place data
-    if len(restart) > 0:
-        split_restart = restart.split(' ')
-        restart_letter, restart_page = split_restart[0], int(split_restart[1])
-        need_restart = True
-        index = LETTER_LIST.index(restart_letter)
-        letter_list = LETTER_LIST[index:]
-    else:
-        letter_list = LETTER_LIST
-        need_restart = False
+    tables = {'items': items, 'unit_lu': unit_lu, 'conversion_junc': conversion_junc, 'nutrient_lu': nutrient_lu,
+              'nutrient_category_lu': nutrient_category_lu, 'nutrient_junc': nutrient_junc, 'item_index': load_item_index()}
+    return tables, restart
+
+def write_tables(tables: dict):
+    """
+    Writes the rows buffered in `tables` and the item index keys that go with them.
 
-    #Loop Through the letters remaining
-    for letter in letter_list:
-        if stop_event.is_set():
-            write_data(items, unit_lu, conversion_junc, nutrient_lu, nutrient_category_lu, nutrient_junc)
-            write_restart_data(letter, next_page_num)
-            print("Data Has been Written, we are all set for now Exit")
-            exit()
+    Parameters:
+        tables (dict): The tables, see `load_tables`.
+    """
+    write_data(tables['items'], tables['unit_lu'], tables['conversion_junc'], tables['nutrient_lu'],
+               tables['nutrient_category_lu'], tables['nutrient_junc'])
+    tables['item_index'].flush()
 
-        try:
-            #sets the starting page inforamtion if needs restart
-            if need_restart:
-                next_page_num = restart_page
-                need_restart = False
-            else:
-                next_page_num = 1
-            
+def written_ids()->dict:
+    """
+    The highest row ID in the files of the item and junction tables. Rows are appended in ID order, so only the
+    last file of each table is read. With `SINK` set to 'mysql' the IDs are read from the database, as no table
+    files are written.
+
+    Returns:
+        dict: Maps 'items', 'conversion_junc' and 'nutrient_junc' to their highest ID, tables without rows are left out.
+    """
+    global ITEMS_PATH, CONVJUNC_PATH, NUTJUNC_PATH, ITEMS_COLUMNS, CONVJUNC_COLUMNS, NUTJUNC_COLUMNS, SINK
+
+    if SINK == 'mysql':
+        return open_sink().max_ids(['items', 'conversion_junc', 'nutrient_junc'])
+    written = {}
+    for name, path, columns in (('items', ITEMS_PATH, ITEMS_COLUMNS), ('conversion_junc', CONVJUNC_PATH, CONVJUNC_COLUMNS),
+                                ('nutrient_junc', NUTJUNC_PATH, NUTJUNC_COLUMNS)):
+        paths = storage.table_paths(path)
+        if not paths:
+            continue
+        ids = storage.read_file(paths[-1], storage.BACKEND, [columns[0]])[columns[0]].dropna()
+        if len(ids):
+            written[name] = int(ids.max())
+    return written
 
-            #Build the path and get the beautiful soup object
-            url = BASE_WEBSITE+FOODS_START_MOD+letter+'_'+PAGE_COUNTER+str(next_page_num)+SITE_END
-            bs = get_page_source(driver, url)
+def replay_journal(item_journal: journal.Journal, tables: dict)->tuple[dict, set]:
+    """
+    Replays the items journaled since the tables were last written.
 
-            #Links from current page
-            #if no links are found we continue to the next letter.
-            current_page_items = deque(get_table_links(bs))
+    Parameters:
+        item_journal (journal.Journal): The journal of the crashed session.
+        tables (dict): The freshly loaded tables, updated in place.
 
-            #loop through the items on the current page
-            while current_page_items:
-                if stop_event.is_set():
-                    write_data(items, unit_lu, conversion_junc, nutrient_lu, nutrient_category_lu, nutrient_junc)
-                    write_restart_data(letter, next_page_num)
-                    print("Data Has been Written, we are all set for now Exit")
-                    exit()
-
-
-                item = deque.popleft(current_page_items)
-                try:
-                    url = BASE_WEBSITE + item.get('href')
-                    bs = get_page_source(driver, url)
-
-                    cur_item_id, items, unit_lu = gather_item_info(bs, items, unit_lu)
-
-                    conversion_junc, unit_lu = get_other_measures(bs, cur_item_id, conversion_junc, unit_lu)
-
-                    #handles the nutrient details.
-                    nuts = get_nutrients(bs)
-                    nutrient_lu, nutrient_category_lu, nutrient_junc, unit_lu = insert_nutrients(nutrient_lu, nutrient_category_lu, nutrient_junc, unit_lu, nuts, cur_item_id)
-                    
-                    cur_item_id = None
-                    #if on last item try to get the next page and if no exception raised will add more links to the deque
-                    if len(current_page_items) == 0:
-                        next_page_num += 1
-                        print("We are Still Working\nCurrent Letter:\t", letter, "\nCurrent Page:\t", str(next_page_num))
-                        url = BASE_WEBSITE+FOODS_START_MOD+letter+'_'+PAGE_COUNTER+str(next_page_num)+SITE_END
-                        bs = get_page_source(driver, url)
-                        current_page_items.extend(deque(get_table_links(bs)))
-                        
-                except Exception as e:
-                    tb = traceback.extract_tb(e.__traceback__)
-                    print('Error:', str(e) + ' ' + str(tb[-1].name), url, e.__traceback__.tb_lineno)
-                    logging_helper.add_to_log(str(e) + ' ' + str(tb[-1].name), url, e.__traceback__.tb_lineno)
-                    if len(e.args) == 1:
-                        print('Rolling Back Item')
-                        items, conversion_junc, nutrient_junc = rollback_item(cur_item_id, items, conversion_junc, nutrient_junc)
-                    if len(current_page_items) == 0:
-                        next_page_num += 1
-                        print("We are Still Working\nCurrent Letter:\t", letter, "\nCurrent Page:\t", str(next_page_num))
-                        url = BASE_WEBSITE+FOODS_START_MOD+letter+'_'+PAGE_COUNTER+str(next_page_num)+SITE_END
-                        bs = get_page_source(driver, url)
-                        current_page_items.extend(deque(get_table_links(bs)))
-                    continue
+    Returns:
+        tuple[dict, set]:
+            - positions (dict): Maps each letter to its last journaled [page, index on the page].
+            - finished (set): The letters journaled as finished.
 
-        except Exception as e:
-            tb = traceback.extract_tb(e.__traceback__)
-            print('Error:', str(e) + ' ' + str(tb[-1].name), url, e.__traceback__.tb_lineno)
-            logging_helper.add_to_log(str(e) + ' ' + str(tb[-1].name),url, e.__traceback__.tb_lineno)
+    Notes:
+        - Rows whose IDs are already written are not buffered again, see `written_ids`, so replaying the journal
+          of a checkpoint that failed part way never writes a row twice. With `SINK` set to 'both' they are still
+          sent to the database with the next write, see `SINK_PENDING`.
+    """
+    global BUFFER_TABLES, SINK, SINK_PENDING
+
+    positions = {}
+    finished = set()
+    records = item_journal.replay()
+    #a checkpoint that crashed after appending some tables left their rows in the journal as well
+    written = written_ids() if records else {}
+    unsent = {name: [] for name in BUFFER_TABLES}
+    for record in records:
+        for name, columns in journal.apply_record(record, tables, written).items():
+            unsent[name].append(pd.DataFrame(columns, columns=tables[name].columns))
+
+        rows = record.get('rows', {})
+        for name in BUFFER_TABLES:
+            if name in rows:
+                id_col = tables[name].columns[0]
+                tables[name].ids.advance_past(max(rows[name][id_col]))
+        if 'items' in rows:
+            for name, brand, upc in zip(rows['items']['name'], rows['items']['brand'], rows['items']['upc']):
+                tables['item_index'].add(name, brand, upc)
+
+        #items retried out of crawl order have no position
+        if record['position'] is None:
             continue
+        letter, page, index = record['position']
+        positions[letter] = [page, index]
+        if record.get('finished'):
+            finished.add(letter)
+
+    if SINK == 'both' and any(unsent.values()):
+        #the database may have missed them, writing them again is harmless
+        SINK_PENDING = {name: pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=tables[name].columns)
+                        for name, frames in unsent.items()}
+    return positions, finished
+
+def start_session()->dict:
+    """
+    Loads the tables, replays the journal and works out where every letter resumes.
 
-    
-    write_data(items, unit_lu, conversion_junc, nutrient_lu, nutrient_category_lu, nutrient_junc)
-    write_restart_data(letter, next_page_num)
-    print("WE HAVE FINISHED!!!!!!")
-    stop_event.set()
-    driver.quit()
-
+    Returns:
+        dict: The crawl session, holding:
+            - 'tables' (dict): The tables, see `load_tables`.
+            - 'lock' (threading.Lock): Guards the tables and the journal between workers.
+            - 'journal' (journal.Journal): The item journal.
+            - 'progress' (dict): Maps each unfinished letter to its current page.
+            - 'done' (dict): Maps a letter to the index of the last item handled on its current page.
+            - 'pipeline' (dict): The parse pipeline, None until `start_pipeline` is called.
+            - 'dead_letters' (retry.DeadLetters): The pages that failed to fetch, see `dead_letter`.
+            - 'listed' (set): Item keys of the links listed so far, see `listed_hrefs`.
+            - 'checkpoint_failures' (int): Checkpoints failed in a row, see `record_item`.
 
-if __name__ == '__main__':
-    main()
+    Notes:
+        - The journal is newer than the restart file, so its positions win over the pages in the restart file.
+        - The progress holds the letters of every directory in `LISTING_DIRECTORIES`, foods letters first.
+    """
+    global JOURNAL_PATH, DEAD_LETTER_PATH, BRANDS_RESTART_PATH, LISTING_DIRECTORIES
+
+    tables, restart = load_tables()
+    item_journal = journal.Journal(JOURNAL_PATH)
+    positions, finished = replay_journal(item_journal, tables)
+
+    progress = {}
+    for directory in ('foods', 'brands'):
+        if directory in LISTING_DIRECTORIES:
+            progress.update(build_progress(restart if directory == 'foods' else read_restart(BRANDS_RESTART_PATH), directory))
+    done = {}
+    for letter, (page, index) in positions.items():
+        if letter in finished:
+            progress.pop(letter, None)
+        elif letter in progress:
+            progress[letter] = page
+            done[letter] = index
+
+    if positions:
+        print('Replayed journal, resuming at', {l: progress[l] for l in done})
+
+    return {'tables': tables, 'lock': threading.Lock(), 'journal': item_journal, 'progress': progress, 'done': done, 'pipeline': None,
+            'dead_letters': retry.DeadLetters(DEAD_LETTER_PATH), 'listed': set(), 'checkpoint_failures': 0}
+
+def checkpoint(session: dict):
+    """
+    Writes the tables and the restart file and starts a fresh journal. Must be called holding the session lock.
+
+    Parameters:
+        session (dict): The crawl session, see `start_session`.
+
+    Notes:
+        - The position of every letter part way through a page is journaled again so the resume stays exact.
+    """
+    with metrics.timer('write_seconds'):
+        write_tables(session['tables'])
+        write_restart_progress(session['progress'])
+    session['journal'].reset()
+    for letter, index in session['done'].items():
+        if letter in session['progress'] and index >= 0:
+            session['journal'].append({'position': [letter, session['progress'][letter], index]})
+
+def record_item(session: dict, marks: dict, letter: str, page_num: int, item_num: int, resume: bool = True):
+    """
+    Journals what an item added to the tables and moves the letter past it. Must be called holding the session lock.
+
+    Parameters:
+        session (dict): The crawl session, see `start_session`.
+        marks (dict): Table sizes from `journal.take_marks` taken before the item was processed.
+        letter (str): The letter being crawled.
+        page_num (int): The listing page of the item.
+        item_num (int): The index of the item on the listing page.
+        resume (bool): Moves the letter past the item, False for an item retried out of crawl order, which is
+                       journaled without a position.
+
+    Notes:
+        - A failed checkpoint is tried again once twice as many items are journaled. After `CHECKPOINT_MAX_FAILURES`
+          failures in a row the crawl is stopped, every item stays in the journal for the next run.
+    """
+    global BUFFER_TABLES, LOOKUP_TABLES, JOURNAL_CHECKPOINT_ITEMS, CHECKPOINT_MAX_FAILURES
+
+    record = journal.build_record(session['tables'], marks, BUFFER_TABLES, LOOKUP_TABLES, [letter, page_num, item_num] if resume else None)
+    if resume:
+        session['journal'].append(record)
+        session['done'][letter] = item_num
+    elif 'rows' in record or 'lookups' in record:
+        session['journal'].append(record)
+
+    if session['journal'].count >= JOURNAL_CHECKPOINT_ITEMS * 2 ** session['checkpoint_failures']:
+        try:
+            checkpoint(session)
+            session['checkpoint_failures'] = 0
+        except Exception as e:
+            #the rows stay buffered and journaled, the write is tried again once twice as many items are journaled
+            log_item_error(e, 'checkpoint')
+            session['checkpoint_failures'] += 1
+            if session['checkpoint_failures'] >= CHECKPOINT_MAX_FAILURES:
+                error = 'Stopping the crawl, the tables could not be written ' + str(session['checkpoint_failures']) + ' times in a row: ' + str(e)
+                print(error)
+                logging_helper.add_to_log(error, 'checkpoint', False)
+                stop_event.set()
+
+def finish_letter(session: dict, letter: str, page_num: int):
+    """
+    Marks a letter as finished in the progress and the journal.
+
+    Parameters:
+        session (dict): The crawl session, see `start_session`.
+        letter (str): The finished letter.
+        page_num (int): The first page without items.
+    """
+    with session['lock']:
+        session['progress'].pop(letter, None)
+        session['done'].pop(letter, None)
+        session['journal'].append({'position': [letter, page_num, -1], 'finished': True})
+    metrics.remove_gauge('current_page', letter=letter)
+    metrics.count('letters_finished_total')
+
+def next_page(session: dict, letter: str, page_num: int):
+    """
+    Moves a letter on to the page after `page_num`.
+    """
+    with session['lock']:
+        session['progress'][letter] = page_num + 1
+        session['done'][letter] = -1
+    metrics.count('pages_total')
+    metrics.set_gauge('current_page', page_num + 1, letter=letter)
+
+def end_session(session: dict):
+    """
+    Writes everything scraped in the session, saves the progress of every unfinished letter and empties the journal.
+    The browsers of the crawl are quit.
+
+    Parameters:
+        session (dict): The crawl session, see `start_session`.
+
+    Raises:
+        Exception: Any error of the last checkpoint, e.g. after `record_item` stopped the crawl. The journal still
+                   holds every item, the next run replays it.
+    """
+    with session['lock']:
+        try:
+            checkpoint(session)
+        finally:
+            session['journal'].close()
+            close_browser_pool()
+
+    if stop_event.is_set():
+        print("Data Has been Written, we are all set for now Exit")
+    else:
+        print("WE HAVE FINISHED!!!!!!")
+        stop_event.set()
+
+def log_item_error(e: Exception, url: str):
+    """
+    Prints and logs an error raised while handling an item page.
+    """
+    tb = traceback.extract_tb(e.__traceback__)
+    print('Error:', str(e) + ' ' + str(tb[-1].name), url, e.__traceback__.tb_lineno)
+    logging_helper.add_to_log(str(e) + ' ' + str(tb[-1].name), url, e.__traceback__.tb_lineno)
+    metrics.count('errors_total', kind=metrics.error_kind(e))
+
+def handle_item(session: dict, extract, url: str, letter: str, page_num: int, item_num: int, resume: bool = True):
+    """
+    Adds an extracted item page to the tables and journals it, errors are printed and logged.
+
+    Parameters:
+        session (dict): The crawl session, see `start_session`.
+        extract (callable): Returns the item's `item_extract.ItemRecord` or raises, e.g. the `result` of a parser future.
+        url (str): The URL of the item page.
+        letter (str): The letter being crawled.
+        page_num (int): The listing page of the item.
+        item_num (int): The index of the item on the listing page.
+        resume (bool): See `record_item`.
+
+    Notes:
+        - The record is extracted before the session lock is taken, so parsing never blocks the other workers.
+        - An item page that could not be fetched is added to the dead letter file, see `dead_letter`.
+        - The item is added through an `item_stage.ItemStage`, an item failing part way leaves no rows, lookup
+          entries or index keys behind.
+    """
+    global BUFFER_TABLES, LOOKUP_TABLES
+
+    try:
+        record = extract()
+    except Exception as e:
+        log_item_error(e, url)
+        if isinstance(e, retry.FetchFailed):
+            dead_letter(session, e, 'item', letter, page_num, item_num)
+        record = None
+
+    waiting = time.perf_counter()
+    with session['lock']:
+        metrics.observe('lock_wait_seconds', time.perf_counter() - waiting)
+        marks = journal.take_marks(session['tables'], BUFFER_TABLES, LOOKUP_TABLES)
+        if record is not None:
+            stage = item_stage.ItemStage(session['tables'], BUFFER_TABLES, LOOKUP_TABLES)
+            try:
+                with metrics.timer('insert_seconds'):
+                    process_item(record, stage.tables)
+                    claim_item(session['tables']['item_index'], record, url)
+                    stage.commit()
+                metrics.count('items_total')
+            except Exception as e:
+                #nothing of a failed item reaches the shared tables, its stage is dropped
+                log_item_error(e, url)
+        record_item(session, marks, letter, page_num, item_num, resume)
+
+def claim_item(item_index: dedup_index.DedupIndex, record: item_extract.ItemRecord, url: str):
+    """
+    Claims an item for its page in the index shared with the other processes crawling a frontier, see
+    `dedup_index.DedupIndex.claim`, so an item listed under two URLs is only added by one process.
+
+    Raises:
+        ValueError: If another page already claimed the item's (name, brand) or UPC.
+    """
+    if not item_index.claim([(dedup_index.item_keys(record.name, record.brand, record.upc), url)])[0]:
+        raise ValueError("We have Duplicate Item from another page, [" + record.name + record.brand + "]", False)
+
+def dead_letter(session: dict, e: retry.FetchFailed, kind: str, letter: str, page_num: int, item_num: int = None):
+    """
+    Adds a page that could not be fetched to the dead letter file so `retry_failed` can try it again.
+    Pages that failed with a final error, e.g. a 404, are only logged.
+
+    Parameters:
+        session (dict): The crawl session, see `start_session`.
+        e (retry.FetchFailed): The failure.
+        kind (str): 'item' or 'listing'.
+        letter (str): The letter of the page.
+        page_num (int): The listing page, of the item for an item page.
+        item_num (int): The index of the item on its listing page, None for a listing page.
+    """
+    if not e.retryable:
+        return
+    session['dead_letters'].add({'kind': kind, 'url': e.url, 'letter': letter, 'page': page_num, 'item': item_num,
+                                 'attempts': e.attempts, 'error': str(e.cause)})
+    metrics.count('dead_letters_total', kind=kind)
+
+def process_item(record: item_extract.ItemRecord, tables: dict)->int:
+    """
+    Adds an extracted item page to the tables.
+
+    Parameters:
+        record (item_extract.ItemRecord): The item page extracted by `item_extract`.
+        tables (dict): The tables keyed by 'items', 'unit_lu', 'conversion_junc', 'nutrient_lu',
+                       'nutrient_category_lu', 'nutrient_junc' and 'item_index'. Updated in place,
+                       usually the `tables` of an `item_stage.ItemStage`.
+
+    Returns:
+        int: The ID given to the new item.
+    """
+    cur_item_id, tables['items'], tables['unit_lu'] = gather_item_info(record, tables['items'], tables['unit_lu'], tables['item_index'])
+
+    tables['conversion_junc'], tables['unit_lu'] = get_other_measures(record, cur_item_id, tables['conversion_junc'], tables['unit_lu'])
+
+    tables['nutrient_lu'], tables['nutrient_category_lu'], tables['nutrient_junc'], tables['unit_lu'] = insert_nutrients(
+        tables['nutrient_lu'], tables['nutrient_category_lu'], tables['nutrient_junc'], tables['unit_lu'], record.nutrients, cur_item_id)
+
+    return cur_item_id
+
+def start_pipeline(session: dict, processes: int, depth: int):
+    """
+    Starts the parse pipeline of a session. Fetched pages are parsed by a pool of `processes` worker processes
+    while one writer thread applies the records and the page progress to the tables in the order they were fetched.
+
+    Parameters:
+        session (dict): The crawl session, see `start_session`. Gets a 'pipeline' entry.
+        processes (int): Number of parser worker processes.
+        depth (int): Most fetched pages waiting for the writer, fetching blocks once the queue is full.
+    """
+    pipeline = {'pool': ProcessPoolExecutor(max_workers=processes), 'queue': queue.Queue(maxsize=depth)}
+    pipeline['writer'] = threading.Thread(target=run_writer, args=(pipeline['queue'],))
+    pipeline['writer'].start()
+    session['pipeline'] = pipeline
+
+def stop_pipeline(session: dict):
+    """
+    Lets the writer finish every queued update and shuts the parser processes down.
+    """
+    pipeline = session.get('pipeline')
+    if pipeline is None:
+        return
+    pipeline['queue'].put(None)
+    pipeline['writer'].join()
+    pipeline['pool'].shutdown()
+    session['pipeline'] = None
+
+def run_writer(updates: queue.Queue):
+    """
+    Writer thread of the parse pipeline. Runs the queued table updates one at a time until it gets None.
+    """
+    while True:
+        update = updates.get()
+        if update is None:
+            return
+        func, args = update
+        try:
+            func(*args)
+        except Exception as e:
+            log_item_error(e, 'writer')
+
+def dispatch(session: dict, func, *args):
+    """
+    Runs a table update, e.g. `handle_item` or `next_page`. With the parse pipeline on it is queued for the writer
+    instead, so the updates of a letter are applied in crawl order after the pages before them.
+    """
+    pipeline = session.get('pipeline')
+    if pipeline is None:
+        func(*args)
+    else:
+        pipeline['queue'].put((func, args))
+
+def submit_item(session: dict, fetcher, url: str):
+    """
+    Fetches an item page and starts extracting it, on a parser process when the parse pipeline is on.
+
+    Parameters:
+        session (dict): The crawl session, see `start_session`.
+        fetcher: The fetcher of the calling worker.
+        url (str): The URL of the item page.
+
+    Returns:
+        callable: Returns the page's `item_extract.ItemRecord` or raises, see `handle_item`.
+    """
+    global PARSER_BACKEND, PARTIAL_PARSE
+
+    pipeline = session.get('pipeline')
+    try:
+        if pipeline is None:
+            return functools.partial(extract_timed, get_page_source(fetcher, url, parsers.ITEM_PAGE))
+        html = fetch_html(fetcher, url)
+    except retry.FetchFailed as e:
+        return functools.partial(retry.reraise, e)
+    return functools.partial(unpack_timed, pipeline['pool'].submit(item_extract.extract_html_timed, html, PARSER_BACKEND, PARTIAL_PARSE).result)
+
+def extract_timed(bs: BeautifulSoup)->item_extract.ItemRecord:
+    """
+    `item_extract.extract_item` recording its time in the metrics.
+    """
+    with metrics.timer('extract_seconds'):
+        return item_extract.extract_item(bs)
+
+def unpack_timed(result)->item_extract.ItemRecord:
+    """
+    Waits for an `item_extract.extract_html_timed` run on a parser process and records its timings in the metrics.
+
+    Parameters:
+        result (callable): Returns the (record, parse seconds, extract seconds) of the run or raises.
+    """
+    record, parse_seconds, extract_seconds = result()
+    metrics.observe('parse_seconds', parse_seconds, kind='item')
+    metrics.observe('extract_seconds', extract_seconds)
+    return record
+
+def listed_hrefs(session: dict, links: list)->list:
+    """
+    The hrefs of the item links of a listing page, None for an item already in the item index or listed before in
+    the session, by the name and brand in its link text, so its page is fetched once at most. The hrefs keep the
+    positions of the links, so resuming part way through a page is not affected by what was skipped.
+
+    Parameters:
+        session (dict): The crawl session, see `start_session`.
+        links (list): The <a> elements from `get_table_links`.
+
+    Notes:
+        - An item is claimed by the first listing page naming it, so one listed by the foods listing and the brand
+          directory at once is only fetched by one of them. While crawling a frontier the claim is made in the
+          frontier, so an item is only fetched by one of the processes, see `dedup_index.DedupIndex.claim`.
+        - Items missed here, e.g. one whose link text differs from its page heading, are still caught as
+          duplicates once fetched, by (name, brand) or UPC, see `claim_item`.
+    """
+    global BASE_WEBSITE
+
+    index = session['tables']['item_index']
+    hrefs = []
+    with session['lock']:
+        unclaimed = []
+        for link in links:
+            name, brand = item_extract.split_name(link.get_text())
+            key = dedup_index.item_key(name, brand)
+            if key in session['listed'] or index.contains_item(name, brand):
+                hrefs.append(None)
+                metrics.count('items_skipped_total')
+            else:
+                session['listed'].add(key)
+                if link.get('href') is not None:
+                    unclaimed.append((len(hrefs), key))
+                hrefs.append(link.get('href'))
+        claimed = index.claim([([key], BASE_WEBSITE + hrefs[position]) for position, key in unclaimed])
+        for (position, key), free in zip(unclaimed, claimed):
+            if not free:
+                hrefs[position] = None
+                metrics.count('items_skipped_total')
+    return hrefs
+
+def fetch_listing(session: dict, fetcher, letter: str, page_num: int)->list:
+    """
+    Fetches a listing page and returns the hrefs of its items, see `listed_hrefs`, None if it has no items, which
+    ends the letter. A listing page that could not be fetched ends the letter as well, it is added to the dead
+    letter file so `retry_failed` can go on from it.
+    """
+    try:
+        return listed_hrefs(session, get_table_links(get_page_source(fetcher, get_listing_url(letter, page_num), parsers.LISTING_PAGE)))
+    except retry.FetchFailed as e:
+        dead_letter(session, e, 'listing', letter, page_num)
+        return None
+    except Exception:
+        return None
+
+def prefetch_listings(letters: list, session: dict, progress: dict, fetcher, pages: queue.Queue, slots: threading.Semaphore, done: threading.Event):
+    """
+    Prefetch thread of a crawl worker. Fetches the listing pages of every letter in the shard in crawl order and
+    queues them as (letter, page, hrefs), moving on to the next letter as soon as a page without items is found.
+
+    Parameters:
+        letters (list): The letters owned by the worker.
+        session (dict): The crawl session, see `start_session`.
+        progress (dict): Maps each letter to the page it resumes at.
+        fetcher: The fetcher of the worker, shared with it.
+        pages (queue.Queue): The queue read by `listing_pages`.
+        slots (threading.Semaphore): Taken before each fetch and given back by `listing_pages` once the worker
+                                     takes the page, so no more pages are fetched ahead than it was created with.
+        done (threading.Event): Set when the worker no longer reads the queue.
+    """
+    for letter in letters:
+        page_num = progress[letter]
+        while True:
+            while not slots.acquire(timeout=0.1):
+                if done.is_set() or stop_event.is_set():
+                    return
+            hrefs = fetch_listing(session, fetcher, letter, page_num)
+            pages.put((letter, page_num, hrefs))
+            if hrefs is None:
+                break
+            page_num += 1
+
+def listing_pages(letters: list, session: dict, fetcher, depth: int):
+    """
+    Yields the listing pages of a worker's letters in crawl order as (letter, page, hrefs), hrefs being None for
+    the first page without items.
+
+    Parameters:
+        letters (list): The letters owned by the worker.
+        session (dict): The crawl session, see `start_session`.
+        fetcher: The worker's fetcher. With `depth` above 0 it is shared with a prefetch thread, which fetches the
+                 next `depth` pages while the worker handles the items of the page it was given, one of them
+                 possibly still in flight. With `depth` 0 each page is fetched when it is asked for.
+        depth (int): Listing pages fetched ahead.
+
+    Notes:
+        - The fetcher stack is safe to share, the rate limiter, circuit breaker, page cache and browser pool lock
+          their own state and the HTTP session pools its connections.
+    """
+    if depth <= 0:
+        for letter in letters:
+            page_num = session['progress'][letter]
+            while True:
+                hrefs = fetch_listing(session, fetcher, letter, page_num)
+                yield letter, page_num, hrefs
+                if hrefs is None:
+                    break
+                page_num += 1
+        return
+
+    pages = queue.Queue()
+    slots = threading.Semaphore(depth)
+    done = threading.Event()
+    thread = threading.Thread(target=prefetch_listings, args=(list(letters), session, dict(session['progress']), fetcher, pages, slots, done), daemon=True)
+    thread.start()
+    try:
+        remaining = len(letters)
+        while remaining:
+            try:
+                page = pages.get(timeout=0.1)
+            except queue.Empty:
+                #the prefetch thread only stops early when the crawl is stopped
+                if not thread.is_alive() and pages.empty():
+                    return
+                continue
+            slots.release()
+            if page[2] is None:
+                remaining -= 1
+            yield page
+    finally:
+        done.set()
+        thread.join()
+
+def crawl_letter_shard(worker_num: int, letters: list, session: dict, fetcher):
+    """
+    Worker body of the crawl. Walks every page of each letter in its shard with its own fetcher.
+
+    Parameters:
+        worker_num (int): Number of the worker, only used in progress messages.
+        letters (list): The letters owned by this worker.
+        session (dict): The crawl session shared by all workers, see `start_session`.
+        fetcher: The fetcher owned by this worker.
+
+    Notes:
+        - Pages are fetched and parsed outside of the session lock, only the table updates are serialized.
+        - With the parse pipeline on, table updates are handed to the writer through `dispatch`.
+        - Items already handled on the resume page, according to the journal, are skipped.
+        - With `LISTING_PREFETCH_DEPTH` above 0 the listing pages are fetched that many pages ahead by a prefetch
+          thread sharing `fetcher`, so the worker goes straight from the last item of a page to the first item of
+          the next one.
+    """
+    global BASE_WEBSITE, LISTING_PREFETCH_DEPTH
+
+    pages = listing_pages(letters, session, fetcher, LISTING_PREFETCH_DEPTH)
+    try:
+        current = None
+        while not stop_event.is_set():
+            waiting = time.perf_counter()
+            page = next(pages, None)
+            metrics.observe('listing_wait_seconds', time.perf_counter() - waiting)
+            if page is None:
+                return
+            letter, page_num, hrefs = page
+
+            if letter != current:
+                current = letter
+                last_done = session['done'].get(letter, -1)
+                metrics.set_gauge('current_page', page_num, letter=letter)
+
+            if hrefs is None:
+                #no links on the page means the letter is finished
+                print('Worker', worker_num, 'finished letter', letter, 'at page', page_num)
+                dispatch(session, finish_letter, session, letter, page_num)
+                continue
+
+            for item_num, href in enumerate(hrefs):
+                if stop_event.is_set():
+                    return
+                if item_num <= last_done or href is None:
+                    continue
+                url = BASE_WEBSITE + href
+                dispatch(session, handle_item, session, submit_item(session, fetcher, url), url, letter, page_num, item_num)
+
+            dispatch(session, next_page, session, letter, page_num)
+            last_done = -1
+            print("We are Still Working\nWorker:\t", worker_num, "\nCurrent Letter:\t", letter, "\nCurrent Page:\t", str(page_num + 1))
+    finally:
+        pages.close()
+        fetcher.close()
+
+async def submit_item_async(session: dict, fetcher, url: str):
+    """
+    Async version of `submit_item`. With the parse pipeline on the page is extracted on a parser process
+    and awaited, so the event loop keeps fetching meanwhile.
+
+    Returns:
+        callable: Returns the page's `item_extract.ItemRecord` or raises, see `handle_item`.
+    """
+    global PARSER_BACKEND, PARTIAL_PARSE
+
+    pipeline = session.get('pipeline')
+    try:
+        if pipeline is None:
+            return functools.partial(extract_timed, await get_page_source_async(fetcher, url, parsers.ITEM_PAGE))
+        html = await fetch_html_async(fetcher, url)
+    except retry.FetchFailed as e:
+        return functools.partial(retry.reraise, e)
+    future = asyncio.get_running_loop().run_in_executor(pipeline['pool'], item_extract.extract_html_timed, html, PARSER_BACKEND, PARTIAL_PARSE)
+    await asyncio.wait([future])
+    return functools.partial(unpack_timed, future.result)
+
+async def crawl_letter_async(fetcher, letter: str, session: dict):
+    """
+    Crawls every page of a letter on the event loop. The item pages of a listing page are fetched
+    concurrently while the next `LISTING_PREFETCH_DEPTH` listing pages, at least one, are fetched ahead.
+
+    Parameters:
+        fetcher (async_fetch.AsyncHttpFetcher): The shared async fetch backend.
+        letter (str): The letter to crawl.
+        session (dict): The crawl session, see `start_session`.
+
+    Notes:
+        - Table updates run on the event loop thread so the session lock is never contended.
+        - Pages fetched ahead past the end of the letter are cancelled once the end is found.
+    """
+    global BASE_WEBSITE, LISTING_PREFETCH_DEPTH
+
+    page_num = session['progress'][letter]
+    metrics.set_gauge('current_page', page_num, letter=letter)
+    ahead = max(1, LISTING_PREFETCH_DEPTH)
+    listings = collections.deque(asyncio.create_task(get_page_source_async(fetcher, get_listing_url(letter, page_num + i), parsers.LISTING_PAGE))
+                                 for i in range(ahead))
+
+    try:
+        while not stop_event.is_set():
+            try:
+                waiting = time.perf_counter()
+                listing = await listings.popleft()
+                metrics.observe('listing_wait_seconds', time.perf_counter() - waiting)
+                page_items = get_table_links(listing)
+            except Exception as e:
+                #no links on the page means the letter is finished, a page that failed to fetch is kept for retry_failed
+                if isinstance(e, retry.FetchFailed):
+                    dead_letter(session, e, 'listing', letter, page_num)
+                print('Finished letter', letter, 'at page', page_num)
+                finish_letter(session, letter, page_num)
+                return
+
+            listings.append(asyncio.create_task(get_page_source_async(fetcher, get_listing_url(letter, page_num + ahead), parsers.LISTING_PAGE)))
+
+            first_item = session['done'].get(letter, -1) + 1
+            items = [(item_num, BASE_WEBSITE + href) for item_num, href in enumerate(listed_hrefs(session, page_items))
+                     if item_num >= first_item and href is not None]
+            extracts = await asyncio.gather(*(submit_item_async(session, fetcher, url) for _, url in items))
+
+            for (item_num, url), extract in zip(items, extracts):
+                handle_item(session, extract, url, letter, page_num, item_num)
+
+            next_page(session, letter, page_num)
+            page_num += 1
+            print("We are Still Working\nCurrent Letter:\t", letter, "\nCurrent Page:\t", str(page_num))
+    finally:
+        for listing in listings:
+            listing.cancel()
+
+async def crawl_async(session: dict, concurrency: int, max_per_second: float):
+    """
+    Crawls all unfinished letters at once over a single async HTTP session.
+
+    Parameters:
+        session (dict): The crawl session, see `start_session`.
+        concurrency (int): Most requests in flight at once.
+        max_per_second (float): Requests per second allowed across the whole crawl.
+    """
+    global FETCH_MODE, FETCH_RETRIES, RETRY_BASE_DELAY, RETRY_MAX_DELAY, BROWSERS
+
+    fallback = fetchers.SeleniumFetcher(open_browser_pool()) if FETCH_MODE == 'http' else None
+    cache = open_page_cache()
+    async with async_fetch.AsyncHttpFetcher(concurrency=concurrency, rate=max_per_second, fallback=fallback,
+                                            fallback_workers=BROWSERS) as fetcher:
+        fetcher = retry.AsyncRetryingFetcher(fetcher, open_breaker(), FETCH_RETRIES, RETRY_BASE_DELAY, RETRY_MAX_DELAY)
+        if cache is not None:
+            fetcher = page_cache.AsyncCachingFetcher(fetcher, cache)
+        await asyncio.gather(*(crawl_letter_async(fetcher, letter, session) for letter in list(session['progress'])))
+
+def run_async(concurrency: int, max_per_second: float):
+    """
+    Runs the asyncio crawl engine. Network waits overlap on one thread, bounded by `concurrency`
+    requests in flight and `max_per_second` requests per second.
+
+    Parameters:
+        concurrency (int): Most requests in flight at once.
+        max_per_second (float): Requests per second allowed across the whole crawl.
+    """
+    listener_thread = threading.Thread(target=stop_listener, daemon=True)
+    listener_thread.start()
+
+    global PARSE_PROCESSES
+
+    session = start_session()
+    start_metrics()
+    if PARSE_PROCESSES > 0:
+        #the event loop applies the records itself, the pool only needs to hold what is in flight
+        session['pipeline'] = {'pool': ProcessPoolExecutor(max_workers=PARSE_PROCESSES)}
+    try:
+        asyncio.run(crawl_async(session, concurrency, max_per_second))
+    finally:
+        if session.get('pipeline'):
+            session['pipeline']['pool'].shutdown()
+            session['pipeline'] = None
+    end_session(session)
+    stop_metrics()
+
+def start_metrics():
+    """
+    Starts collecting the crawl metrics and rewriting `METRICS_PATH` every `METRICS_INTERVAL` seconds.
+    """
+    global METRICS_PATH, METRICS_INTERVAL, METRIC_HELP
+
+    metrics.start(METRICS_PATH, METRICS_INTERVAL, 'nut_scrape', METRIC_HELP, 'items_total')
+
+def stop_metrics():
+    """
+    Writes the final metrics and prints the run summary.
+    """
+    metrics.stop()
+    print(metrics.summary())
+
+def open_page_cache()->page_cache.PageCache:
+    """
+    Opens the page cache at `PAGE_CACHE_PATH`, None when pages are not cached.
+    """
+    global PAGE_CACHE_PATH, CACHE_PAGES, REPARSE
+
+    if not (CACHE_PAGES or REPARSE):
+        return None
+    return page_cache.PageCache(PAGE_CACHE_PATH)
+
+def open_browser_pool()->browser_pool.DriverPool:
+    """
+    Returns the browsers shared by every fetcher of the crawl, the pool is made on the first call. No browser is
+    started until a page needs one.
+    """
+    global BROWSER_POOL, BROWSERS, BROWSER_MAX_PAGES, BROWSER_MAX_RSS_MB
+
+    with browser_pool_lock:
+        if BROWSER_POOL is None:
+            BROWSER_POOL = browser_pool.DriverPool(BROWSERS, max_pages=BROWSER_MAX_PAGES, max_rss_mb=BROWSER_MAX_RSS_MB)
+        return BROWSER_POOL
+
+def close_browser_pool():
+    """
+    Quits the browsers of the crawl, if any were started.
+    """
+    global BROWSER_POOL
+
+    with browser_pool_lock:
+        pool, BROWSER_POOL = BROWSER_POOL, None
+    if pool is not None:
+        pool.close()
+
+def build_worker_fetcher(cache: page_cache.PageCache):
+    """
+    Builds the fetcher of one crawl worker: the network fetcher of `FETCH_MODE`, storing what it fetches in `cache`
+    if given, or a fetcher reading only from `cache` when re-parsing.
+    """
+    global FETCH_MODE, REPARSE
+
+    if REPARSE:
+        return page_cache.CacheFetcher(cache)
+    fetcher = fetchers.build_fetcher(FETCH_MODE, open_browser_pool())
+    if cache is not None:
+        fetcher = page_cache.CachingFetcher(fetcher, cache)
+    return fetcher
+
+def open_breaker()->retry.CircuitBreaker:
+    """
+    Builds the circuit breaker shared by every fetcher of a crawl.
+    """
+    global BREAKER_THRESHOLD, BREAKER_COOLDOWN
+
+    return retry.CircuitBreaker(BREAKER_THRESHOLD, BREAKER_COOLDOWN)
+
+def build_crawl_fetcher(cache: page_cache.PageCache, limiter: fetchers.RateLimiter, breaker: retry.CircuitBreaker):
+    """
+    Builds a worker fetcher, see `build_worker_fetcher`, behind the shared rate limit, retrying transient errors
+    with backoff and the shared circuit breaker.
+    """
+    global FETCH_RETRIES, RETRY_BASE_DELAY, RETRY_MAX_DELAY
+
+    fetcher = fetchers.RateLimitedFetcher(build_worker_fetcher(cache), limiter)
+    return retry.RetryingFetcher(fetcher, breaker, FETCH_RETRIES, RETRY_BASE_DELAY, RETRY_MAX_DELAY)
+
+def crawl_letters(session: dict, letters: list, workers: int, max_per_second: float):
+    """
+    Crawls `letters` with `workers` threads, each owning a shard of the letters and its own fetcher, and waits
+    for them to finish.
+
+    Parameters:
+        session (dict): The crawl session, see `start_session`. Every letter must be in its progress.
+        letters (list): The letters to crawl, dealt out round robin.
+        workers (int): Number of worker threads.
+        max_per_second (float): Requests per second allowed across all workers, 0 or less for no limit.
+    """
+    global REPARSE
+
+    limiter = fetchers.RateLimiter(0 if REPARSE else max_per_second)
+    breaker = open_breaker()
+    cache = open_page_cache()
+
+    threads = []
+    for worker_num in range(min(workers, len(letters))):
+        fetcher = build_crawl_fetcher(cache, limiter, breaker)
+        thread = threading.Thread(target=crawl_letter_shard, args=(worker_num, letters[worker_num::workers], session, fetcher))
+        thread.start()
+        threads.append(thread)
+
+    for thread in threads:
+        thread.join()
+
+def attach_frontier(session: dict, path: str)->frontier.Frontier:
+    """
+    Opens the shared frontier and switches the session's IDs over to it, so processes writing their own tables
+    never hand out the same ID. Row IDs are taken from it in blocks of `FRONTIER_ID_BLOCK` and new lookup names
+    get the ID it has for them, after the session's own lookup entries were added to it. Items are claimed in it as
+    well, after the session's item index was added to it, so no two processes scrape the same item.
+
+    Parameters:
+        session (dict): The crawl session, see `start_session`. Its progress is emptied, the frontier keeps track
+                        of the pages instead.
+        path (str): Path of the frontier database.
+
+    Returns:
+        frontier.Frontier: The opened frontier.
+
+    Raises:
+        ValueError: If a lookup entry of the session has another ID in the frontier.
+    """
+    global BUFFER_TABLES, LOOKUP_TABLES, FRONTIER_ID_BLOCK, FRONTIER_LEASE_SECONDS
+
+    shared = frontier.Frontier(path, FRONTIER_LEASE_SECONDS)
+    tables = session['tables']
+    for name in LOOKUP_TABLES:
+        shared.seed_lookup(name, tables[name].entries_since(0))
+        tables[name].shared = functools.partial(shared.intern, name)
+    for name in BUFFER_TABLES:
+        id_col = tables[name].columns[0]
+        tables[name].ids = id_allocators.BlockAllocator(functools.partial(shared.allocate, id_col, FRONTIER_ID_BLOCK, tables[name].ids.next_id))
+    shared.seed_claims(tables['item_index'].keys)
+    tables['item_index'].shared = shared.claim
+
+    session['progress'].clear()
+    session['done'].clear()
+    return shared
+
+def seed_frontier(shared: frontier.Frontier):
+    """
+    Queues the first listing page of every letter of the `LISTING_DIRECTORIES`, pages queued before are left as they are.
+    """
+    global LISTING_DIRECTORIES
+
+    shared.add([listing_task(key, 1) for directory in LISTING_DIRECTORIES for key in crawl_keys(directory)])
+
+def listing_task(letter: str, page_num: int)->tuple:
+    """
+    The frontier task of a listing page. Item pages go first, so a worker only fetches a new listing page once
+    no item page is waiting.
+    """
+    return (get_listing_url(letter, page_num), 'listing', {'letter': letter, 'page': page_num}, 0)
+
+def crawl_frontier_worker(worker_num: int, session: dict, shared: frontier.Frontier, fetcher):
+    """
+    Worker body of a frontier crawl. Leases one page at a time until every page of the frontier is done: a listing
+    page queues its item pages and the next listing page of its letter, an item page is added to the tables.
+
+    Parameters:
+        worker_num (int): Number of the worker, only used in progress messages and its lease owner name.
+        session (dict): The crawl session, see `attach_frontier`.
+        shared (frontier.Frontier): The frontier.
+        fetcher: The fetcher owned by this worker.
+
+    Notes:
+        - A page is only acknowledged once handled, an item page after it is journaled, so pages leased by a
+          process that crashed are handed out again once their lease runs out.
+        - Pages that fail to fetch go to the dead letter file of this process as in `main`.
+        - A page leased as the crawl stops is released at once so another worker can take it without waiting for
+          the lease to run out. A page whose handling raised is logged and released as well, see `fail_leased_task`,
+          and the worker goes on with the next page.
+    """
+    global FRONTIER_POLL_SECONDS
+
+    owner = frontier.owner_name(worker_num)
+    try:
+        while not stop_event.is_set():
+            tasks = shared.lease(owner)
+            if not tasks:
+                if shared.finished():
+                    return
+                #other workers may still queue pages
+                stop_event.wait(FRONTIER_POLL_SECONDS)
+                continue
+            task = tasks[0]
+            if stop_event.is_set():
+                shared.release(task.id, owner)
+                return
+            try:
+                handle_leased_task(worker_num, session, shared, owner, task, fetcher)
+            except Exception as e:
+                fail_leased_task(session, shared, owner, task, e)
+            except BaseException:
+                #handed to another worker now rather than once the lease runs out
+                shared.release(task.id, owner)
+                raise
+    finally:
+        fetcher.close()
+
+def handle_leased_task(worker_num: int, session: dict, shared: frontier.Frontier, owner: str, task: frontier.Task, fetcher):
+    """
+    Handles a page leased from the frontier: an item page is added to the tables, a listing page queues its item
+    pages and the next listing page of its letter.
+    """
+    global BASE_WEBSITE
+
+    letter, page_num = task.data['letter'], task.data['page']
+    if task.kind == 'item':
+        dispatch(session, handle_leased_item, session, shared, owner, task, submit_item(session, fetcher, task.url))
+        return
+
+    hrefs = fetch_listing(session, fetcher, letter, page_num)
+    found = []
+    if hrefs is None:
+        print('Worker', worker_num, 'finished letter', letter, 'at page', page_num)
+        metrics.count('letters_finished_total')
+    else:
+        found = [(BASE_WEBSITE + href, 'item', {'letter': letter, 'page': page_num, 'item': item_num}, 1)
+                 for item_num, href in enumerate(hrefs) if href is not None]
+        found.append(listing_task(letter, page_num + 1))
+        metrics.count('pages_total')
+    shared.ack(task.id, owner, found)
+
+def handle_leased_item(session: dict, shared: frontier.Frontier, owner: str, task: frontier.Task, extract):
+    """
+    `handle_item` for an item page leased from the frontier, acknowledged once the item is journaled. Handed to
+    `fail_leased_task` if it could not be journaled.
+    """
+    try:
+        handle_item(session, extract, task.url, task.data['letter'], task.data['page'], task.data['item'], False)
+    except Exception as e:
+        fail_leased_task(session, shared, owner, task, e)
+        return
+    except BaseException:
+        shared.release(task.id, owner)
+        raise
+    if not shared.ack(task.id, owner):
+        print('Lease of', task.url, 'ran out before the item was added, another worker may add it again')
+
+def fail_leased_task(session: dict, shared: frontier.Frontier, owner: str, task: frontier.Task, e: Exception):
+    """
+    Logs a leased page whose handling raised and releases it, so any worker can try it again at once. After
+    `FRONTIER_MAX_ATTEMPTS` leases it is added to the dead letter file and marked done instead, so a page that
+    always fails does not hold up the end of the crawl.
+
+    Parameters:
+        session (dict): The crawl session, see `attach_frontier`.
+        shared (frontier.Frontier): The frontier.
+        owner (str): The worker holding the lease.
+        task (frontier.Task): The page.
+        e (Exception): The error raised.
+    """
+    global FRONTIER_MAX_ATTEMPTS
+
+    log_item_error(e, task.url)
+    if task.attempts < FRONTIER_MAX_ATTEMPTS:
+        shared.release(task.id, owner)
+        return
+    session['dead_letters'].add({'kind': task.kind, 'url': task.url, 'letter': task.data['letter'], 'page': task.data['page'],
+                                 'item': task.data.get('item'), 'attempts': task.attempts, 'error': str(e)})
+    metrics.count('dead_letters_total', kind=task.kind)
+    shared.ack(task.id, owner)
+
+def crawl_frontier(session: dict, shared: frontier.Frontier, workers: int, max_per_second: float):
+    """
+    Crawls the pages of a shared frontier with `workers` threads until every page is done or the crawl is stopped.
+    Any number of processes can crawl the same frontier at once, each writing its own tables, see `main`.
+
+    Parameters:
+        session (dict): The crawl session, see `attach_frontier`.
+        shared (frontier.Frontier): The frontier.
+        workers (int): Number of worker threads.
+        max_per_second (float): Requests per second allowed across the workers of this process, 0 or less for no limit.
+
+    Notes:
+        - Listing pages are not prefetched, the workers of every process share them.
+    """
+    limiter = fetchers.RateLimiter(max_per_second)
+    breaker = open_breaker()
+    cache = open_page_cache()
+
+    threads = []
+    for worker_num in range(workers):
+        thread = threading.Thread(target=crawl_frontier_worker, args=(worker_num, session, shared, build_crawl_fetcher(cache, limiter, breaker)))
+        thread.start()
+        threads.append(thread)
+
+    for thread in threads:
+        thread.join()
+    print('Frontier:', shared.counts())
+
+def use_data_dir(data_dir: str):
+    """
+    Points every table, the restart file, the journal, the ID files and the metrics at `data_dir`, keeping their
+    file names. The page cache stays where it is.
+
+    Parameters:
+        data_dir (str): The directory to write to, created if missing.
+    """
+    global ITEMS_PATH, UNITLU_PATH, CONVJUNC_PATH, NUTLU_PATH, NUTCAT_PATH, NUTJUNC_PATH
+    global RESTART_PATH, BRANDS_RESTART_PATH, IDS_PATH, ITEM_INDEX_PATH, JOURNAL_PATH, DEAD_LETTER_PATH, METRICS_PATH
+    global SINK_QUARANTINE_PATH
+
+    os.makedirs(data_dir, exist_ok=True)
+    def move(path):
+        return os.path.join(data_dir, os.path.basename(path))
+
+    ITEMS_PATH, UNITLU_PATH, CONVJUNC_PATH = move(ITEMS_PATH), move(UNITLU_PATH), move(CONVJUNC_PATH)
+    NUTLU_PATH, NUTCAT_PATH, NUTJUNC_PATH = move(NUTLU_PATH), move(NUTCAT_PATH), move(NUTJUNC_PATH)
+    RESTART_PATH, IDS_PATH, ITEM_INDEX_PATH, JOURNAL_PATH = move(RESTART_PATH), move(IDS_PATH), move(ITEM_INDEX_PATH), move(JOURNAL_PATH)
+    BRANDS_RESTART_PATH, DEAD_LETTER_PATH, METRICS_PATH = move(BRANDS_RESTART_PATH), move(DEAD_LETTER_PATH), move(METRICS_PATH)
+    SINK_QUARANTINE_PATH = move(SINK_QUARANTINE_PATH)
+
+def merge_data_dirs(data_dirs: list):
+    """
+    Merges the data directories of the processes that crawled a frontier into the tables at the current paths, see
+    `use_data_dir`. The frontier handed every process its own blocks of row IDs and the same lookup IDs, so the rows
+    are kept as they are, only their order is restored. The item index, the ID file and the dead letter file are
+    rebuilt to match.
+
+    Parameters:
+        data_dirs (list): The data directories of the processes, none of them the current one.
+
+    Raises:
+        ValueError:
+            - If a data directory is the current one.
+            - If a data directory still has journaled items, restart its process to write them first.
+            - If a row ID is in more than one data directory, or a lookup ID or name has two meanings.
+    """
+    global ITEMS_PATH, UNITLU_PATH, CONVJUNC_PATH, NUTLU_PATH, NUTCAT_PATH, NUTJUNC_PATH, IDS_PATH, ITEM_INDEX_PATH
+    global JOURNAL_PATH, DEAD_LETTER_PATH, STORAGE_BACKEND, ITEMS_COLUMNS, CONVJUNC_COLUMNS, NUTJUNC_COLUMNS
+
+    storage.set_backend(STORAGE_BACKEND)
+    def moved(data_dir, path):
+        return os.path.join(data_dir, os.path.basename(path))
+
+    for data_dir in data_dirs:
+        if os.path.realpath(moved(data_dir, ITEMS_PATH)) == os.path.realpath(ITEMS_PATH):
+            raise ValueError("Can't merge a data directory into itself: " + data_dir)
+        journal_path = moved(data_dir, JOURNAL_PATH)
+        if os.path.exists(journal_path) and journal.Journal(journal_path).replay():
+            raise ValueError("Data directory has journaled items not yet written: " + data_dir)
+
+    next_ids = {}
+    for path, columns in ((ITEMS_PATH, ITEMS_COLUMNS), (CONVJUNC_PATH, CONVJUNC_COLUMNS), (NUTJUNC_PATH, NUTJUNC_COLUMNS)):
+        frames = [storage.read_table(moved(data_dir, path)) for data_dir in data_dirs if storage.table_exists(moved(data_dir, path))]
+        table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+        id_col = columns[0]
+        repeated = table[id_col][table[id_col].duplicated()]
+        if len(repeated):
+            raise ValueError("Row ID in more than one data directory: [" + id_col + ' ' + str(repeated.iloc[0]) + "]")
+        table = table.sort_values(id_col, kind='stable')
+        storage.replace_table(path, table)
+        next_ids[id_col] = id_allocators.IdAllocator(int(table[id_col].max()) + 1 if len(table) else 1)
+        if path == ITEMS_PATH:
+            items = table
+
+    for path, id_col in ((UNITLU_PATH, 'unit_id'), (NUTLU_PATH, 'nutrient_id'), (NUTCAT_PATH, 'cat_id')):
+        frames = [registries.LookupRegistry.from_table(moved(data_dir, path), id_col).to_frame() for data_dir in data_dirs]
+        lookup = pd.concat(frames, ignore_index=True).drop_duplicates()
+        for col in (id_col, 'name'):
+            repeated = lookup[col][lookup[col].duplicated()]
+            if len(repeated):
+                raise ValueError("Lookup entry with two meanings: [" + os.path.basename(path) + ' ' + str(repeated.iloc[0]) + "]")
+        storage.write_atomic(path, lookup.sort_values(id_col))
+
+    id_allocators.save_allocators(IDS_PATH, next_ids)
+    if os.path.exists(ITEM_INDEX_PATH):
+        os.remove(ITEM_INDEX_PATH)
+    dedup_index.DedupIndex.build(ITEM_INDEX_PATH, items[['name', 'brand', 'upc']].fillna(''))
+
+    with open(DEAD_LETTER_PATH, 'w') as merged:
+        for data_dir in data_dirs:
+            if os.path.exists(moved(data_dir, DEAD_LETTER_PATH)):
+                with open(moved(data_dir, DEAD_LETTER_PATH), 'r') as file:
+                    merged.write(file.read())
+    print('Merged', len(data_dirs), 'data directories,', len(items), 'items')
+
+def reparse(data_dir: str, workers: int = WORKERS):
+    """
+    Rebuilds every table from the page cache with no network access, e.g. after an extractor fix.
+    The crawl is replayed from the cached listing pages, a letter ends at its first listing page missing from the cache.
+
+    Parameters:
+        data_dir (str): The directory the rebuilt tables are written to. A re-parse that was stopped resumes
+                        from the restart file and journal in this directory.
+        workers (int): Number of worker threads, see `main`.
+
+    Raises:
+        ValueError: If the page cache is empty.
+
+    Notes:
+        - The tables of the crawl are left alone, swap them for the rebuilt ones once they check out.
+    """
+    global PAGE_CACHE_PATH, REPARSE
+
+    if not page_cache.PageCache(PAGE_CACHE_PATH).latest():
+        raise ValueError("No pages cached in " + PAGE_CACHE_PATH)
+    REPARSE = True
+    use_data_dir(data_dir)
+    main(workers, 0)
+
+def retry_failed(workers: int = WORKERS, max_per_second: float = MAX_REQUESTS_PER_SECOND):
+    """
+    Tries every page of the dead letter file again. Failed item pages are fetched and added on their own, a letter
+    whose listing page failed is crawled again from that page. Pages that fail again go back to the file.
+
+    Parameters:
+        workers (int): Number of worker threads for the letters crawled again, see `main`.
+        max_per_second (float): Requests per second allowed, 0 or less for no limit.
+
+    Notes:
+        - Retried items are journaled without a position, so they never move the resume point of their letter.
+        - A letter crawled again is put back in the restart file until it is finished, a stopped run resumes it
+          like any other letter.
+        - If the run crashes its entries are taken again by the next one, items already added are then skipped
+          as duplicates.
+        - With `FRONTIER_PATH` set the pages are queued in the frontier again instead and crawled with it, by this
+          process and any other crawling the frontier.
+    """
+    global FRONTIER_PATH
+
+    listener_thread = threading.Thread(target=stop_listener, daemon=True)
+    listener_thread.start()
+
+    session = start_session()
+    start_metrics()
+    entries = session['dead_letters'].take()
+    if FRONTIER_PATH:
+        shared = attach_frontier(session, FRONTIER_PATH)
+        print('Queued', shared.requeue([entry['url'] for entry in entries]), 'pages in the frontier again')
+        session['dead_letters'].done()
+        crawl_frontier(session, shared, workers, max_per_second)
+        end_session(session)
+        stop_metrics()
+        return
+    items = [entry for entry in entries if entry['kind'] == 'item']
+    letters = [key for directory in ('foods', 'brands') for key in crawl_keys(directory)
+               if any(entry['kind'] == 'listing' and entry['letter'] == key for entry in entries)]
+    print('Retrying', len(items), 'item pages and', len(letters), 'letters')
+
+    for entry in entries:
+        if entry['kind'] == 'listing':
+            session['progress'][entry['letter']] = entry['page']
+            session['done'][entry['letter']] = -1
+
+    limiter = fetchers.RateLimiter(max_per_second)
+    fetcher = build_crawl_fetcher(open_page_cache(), limiter, open_breaker())
+    try:
+        for num, entry in enumerate(items):
+            if stop_event.is_set():
+                #not tried yet, kept for the next run
+                for left in items[num:]:
+                    session['dead_letters'].add(left)
+                break
+            handle_item(session, submit_item(session, fetcher, entry['url']), entry['url'], entry['letter'], entry['page'], entry['item'], False)
+    finally:
+        fetcher.close()
+
+    if not stop_event.is_set():
+        crawl_letters(session, letters, workers, max_per_second)
+    session['dead_letters'].done()
+
+    end_session(session)
+    stop_metrics()
+
+def main(workers: int = WORKERS, max_per_second: float = MAX_REQUESTS_PER_SECOND):
+    """
+    Crawls the food letters with `workers` threads, each owning a shard of the letters and its own fetcher.
+    All workers write to one set of tables so the lookup IDs stay consistent.
+
+    Parameters:
+        workers (int): Number of worker threads, 1 crawls the letters in order.
+        max_per_second (float): Requests per second allowed across all workers, 0 or less for no limit.
+
+    Notes:
+        - Letters are dealt out round robin, a resumed run only crawls the letters listed in the restart file.
+        - With 'brands' in `LISTING_DIRECTORIES` the letters of the brand directory are crawled as well, after the
+          foods letters with one worker and alongside them with more. Item links whose name and brand are already
+          in the item index are skipped without a fetch, see `listed_hrefs`.
+        - Every item is journaled as soon as it is scraped and the tables are written every `JOURNAL_CHECKPOINT_ITEMS`
+          items, on stop and on completion, so a crash loses at most the item in flight.
+        - With `PARSE_PROCESSES` above 0 the workers only fetch, pages are parsed by a process pool and applied by
+          a single writer thread, see `start_pipeline`.
+        - Fetch, parse and insert timings, item and error counts and the page of every letter are rewritten to
+          `METRICS_PATH` every `METRICS_INTERVAL` seconds, a summary is printed at the end.
+        - With `LISTING_PREFETCH_DEPTH` above 0 every worker has a prefetch thread that keeps its next listing pages
+          ready with the worker's fetcher, see `listing_pages`.
+        - Transient fetch errors are retried `FETCH_RETRIES` times with backoff, and a host is paused after
+          `BREAKER_THRESHOLD` failures in a row. Pages that still fail go to the dead letter file at
+          `DEAD_LETTER_PATH`, see `retry_failed`.
+        - Every fetched page is stored in the page cache when `CACHE_PAGES` is set. With `REPARSE` set the pages are
+          served from the cache instead, without a rate limit, see `reparse`.
+        - Pages that need a browser are fetched by the `BROWSERS` Firefox instances every worker shares, see
+          `open_browser_pool`.
+        - With `FRONTIER_PATH` set the pages come from the shared frontier instead of the restart file, see
+          `crawl_frontier`. Every process crawling it needs its own data directory, see `use_data_dir`, the tables
+          of all of them together make up the crawl, see `merge_data_dirs`.
+    """
+    global PARSE_PROCESSES, PARSE_QUEUE_DEPTH, FRONTIER_PATH
+
+    listener_thread = threading.Thread(target=stop_listener, daemon=True)
+    listener_thread.start()
+
+    session = start_session()
+    start_metrics()
+    if PARSE_PROCESSES > 0:
+        start_pipeline(session, PARSE_PROCESSES, PARSE_QUEUE_DEPTH)
+    tables = session['tables']
+    print('Length unit_lu:\t', len(tables['unit_lu']), '\n')
+    print('Length Nut_cat:\t', len(tables['nutrient_category_lu']), '\n')
+    print('Length nutrient_lu:\t', len(tables['nutrient_lu']), '\n')
+    print('Length item index:\t', len(tables['item_index']), '\n')
+
+    if FRONTIER_PATH:
+        shared = attach_frontier(session, FRONTIER_PATH)
+        seed_frontier(shared)
+        crawl_frontier(session, shared, workers, max_per_second)
+    else:
+        crawl_letters(session, list(session['progress']), workers, max_per_second)
+
+    stop_pipeline(session)
+    end_session(session)
+    stop_metrics()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gathers the nutrition data')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='number of parallel crawl workers')
+    parser.add_argument('--rate', type=float, default=MAX_REQUESTS_PER_SECOND, help='requests per second across all workers')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='crawl with the asyncio engine')
+    parser.add_argument('--concurrency', type=int, default=ASYNC_CONCURRENCY, help='requests in flight for --async')
+    parser.add_argument('--browsers', type=int, default=BROWSERS, help='Firefox instances shared by the workers for pages that need a browser')
+    parser.add_argument('--prefetch-depth', type=int, default=LISTING_PREFETCH_DEPTH, help='listing pages fetched ahead of the item pages, 0 turns prefetching off')
+    parser.add_argument('--parse-processes', type=int, default=PARSE_PROCESSES, help='parser worker processes, 0 parses on the fetching threads')
+    parser.add_argument('--backend', choices=sorted(storage.EXTENSIONS), default=STORAGE_BACKEND, help='file format of the tables')
+    parser.add_argument('--sink', choices=['files', 'mysql', 'both'], default=SINK, help='where the scraped rows are written')
+    parser.add_argument('--no-cache', dest='cache_pages', action='store_false', help="don't store fetched pages in the page cache")
+    parser.add_argument('--reparse', metavar='DATA_DIR', help='rebuild the tables into DATA_DIR from the page cache, without network access')
+    parser.add_argument('--retry-failed', action='store_true', help='try the pages of the dead letter file again instead of crawling')
+    parser.add_argument('--listings', choices=['foods', 'brands', 'both'], default='foods', help='listing directories to crawl, the foods listing, the brand directory or both')
+    parser.add_argument('--frontier', metavar='PATH', help='crawl the pages of the shared frontier database at PATH, with any number of processes')
+    parser.add_argument('--data-dir', help='write the tables, journal and restart file to DATA_DIR, every --frontier process needs its own')
+    parser.add_argument('--merge', nargs='+', metavar='DIR', help='merge the data dirs of the processes of a --frontier crawl into --data-dir')
+    args = parser.parse_args()
+    if args.frontier and not args.data_dir:
+        parser.error('--frontier needs a --data-dir of its own for every process')
+    if args.merge and not args.data_dir:
+        parser.error('--merge needs a --data-dir to write the merged tables to')
+    if args.frontier and (args.use_async or args.reparse):
+        parser.error('--frontier crawls with the worker threads, not with --async or --reparse')
+
+    STORAGE_BACKEND = args.backend
+    PARSE_PROCESSES = args.parse_processes
+    LISTING_PREFETCH_DEPTH = args.prefetch_depth
+    CACHE_PAGES = args.cache_pages
+    SINK = args.sink
+    BROWSERS = max(args.browsers, 1)
+    FRONTIER_PATH = args.frontier
+    LISTING_DIRECTORIES = ('foods', 'brands') if args.listings == 'both' else (args.listings,)
+    if args.data_dir:
+        use_data_dir(args.data_dir)
+
+    if args.merge:
+        merge_data_dirs(args.merge)
+    elif args.reparse:
+        reparse(args.reparse, args.workers)
+    elif args.retry_failed:
+        retry_failed(args.workers, args.rate)
+    elif args.use_async:
+        run_async(args.concurrency, args.rate)
+    else:
+        main(args.workers, args.rate)
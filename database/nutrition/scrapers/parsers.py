@@ -0,0 +1,69 @@
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml
+    DEFAULT_BACKEND = 'lxml'
+except ImportError:
+    DEFAULT_BACKEND = 'html.parser'
+
+BACKENDS = ('lxml', 'html.parser')
+
+#the regions of an item page the extractors read, as (tag, attribute, value) with None matching any value.
+#Only these tags and their contents are built when an item page is parsed with `ITEM_PAGE`
+ITEM_REGIONS = (
+    ('h1', 'id', 'food-name'),
+    ('option', None, None),
+    ('table', 'class', 'wide results'),
+    ('table', 'class', 'center wide cellpadding3 nutrient results'),
+    ('td', 'id', 'calories'),
+    ('div', 'class', 'upc-digit'),
+)
+
+
+def in_item_region(name: str, attrs: dict = None) -> bool:
+    """
+    Tells whether a tag starts one of the `ITEM_REGIONS`. Used as a `SoupStrainer` name function, which
+    is called with the tag name and its raw attributes while the page is parsed.
+
+    Parameters:
+        name (str): The tag name.
+        attrs (dict): The raw attributes of the tag, e.g. {'class': 'wide results'}.
+
+    Returns:
+        bool: True if the tag and its contents should be built.
+    """
+    if not isinstance(name, str):
+        return False
+    attrs = attrs or {}
+    for tag, attr, value in ITEM_REGIONS:
+        if name == tag and (attr is None or attrs.get(attr) == value):
+            return True
+    return False
+
+ITEM_PAGE = SoupStrainer(in_item_region)
+LISTING_PAGE = SoupStrainer('a', {'class': 'table_item_name'})
+
+
+def parse(html: str, backend: str = None, parse_only: SoupStrainer = None) -> BeautifulSoup:
+    """
+    Parses a page into a BeautifulSoup object.
+
+    Parameters:
+        html (str): The page source.
+        backend (str): The tree builder, 'lxml' or 'html.parser'. `DEFAULT_BACKEND` if None.
+        parse_only (SoupStrainer): Only build the matching tags, e.g. `ITEM_PAGE` or `LISTING_PAGE`. The whole
+                                   page is built if None.
+
+    Returns:
+        BeautifulSoup: The parsed page. With `parse_only` the matching regions are the top level children.
+
+    Raises:
+        ValueError: If `backend` is not one of `BACKENDS`.
+
+    Notes:
+        - 'lxml' needs the lxml package, `DEFAULT_BACKEND` falls back to 'html.parser' when it is not installed.
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError('Unknown parser backend ' + str(backend) + ', expected one of ' + ', '.join(BACKENDS))
+    return BeautifulSoup(html, backend, parse_only=parse_only)
@@ -0,0 +1,146 @@
+import pandas as pd
+import storage
+
+
+class LookupRegistry:
+    """
+    Interning lookup table mapping a name to its ID. Backs `unit_lu`, `nutrient_lu` and `nutrient_category_lu`
+    with a dict and a monotonic counter so lookups and inserts are O(1).
+
+    Parameters:
+        id_col (str): Name of the ID column in the exported table, e.g. 'unit_id'.
+        name_col (str): Name of the name column in the exported table.
+
+    Notes:
+        - IDs are handed out in insertion order starting after the largest ID loaded.
+        - With `shared` set, e.g. to `functools.partial(frontier.Frontier.intern, 'unit_lu')`, new names get the ID
+          it returns instead, so processes writing their own tables agree on every ID.
+    """
+
+    def __init__(self, id_col: str, name_col: str = 'name'):
+        self.id_col = id_col
+        self.name_col = name_col
+        self.ids = {}
+        self.order = []
+        self.next_id = 1
+        self.shared = None
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, id_col: str, name_col: str = 'name') -> 'LookupRegistry':
+        """
+        Builds a registry from an existing lookup table.
+
+        Parameters:
+            df (pd.DataFrame): The lookup table holding `id_col` and `name_col`.
+            id_col (str): Name of the ID column.
+            name_col (str): Name of the name column.
+
+        Returns:
+            LookupRegistry: A registry holding every row of `df`.
+        """
+        registry = cls(id_col, name_col)
+        for id, name in zip(df[id_col], df[name_col]):
+            registry.restore(int(id), name)
+        return registry
+
+    @classmethod
+    def from_table(cls, path: str, id_col: str, name_col: str = 'name') -> 'LookupRegistry':
+        """
+        Loads a registry from a lookup table through `storage`, an empty registry is returned if the table does not exist.
+
+        Parameters:
+            path (str): Path of the table's base file.
+            id_col (str): Name of the ID column.
+            name_col (str): Name of the name column.
+
+        Returns:
+            LookupRegistry: The loaded registry.
+        """
+        if not storage.table_exists(path):
+            return cls(id_col, name_col)
+        return cls.from_frame(storage.read_table(path, columns=[id_col, name_col]), id_col, name_col)
+
+    def get_id(self, name: str) -> int:
+        """
+        Returns the ID of a name, adding the name with the next ID if it is new.
+
+        Parameters:
+            name (str): The name to look up.
+
+        Returns:
+            int: The ID of the name.
+        """
+        id = self.ids.get(name)
+        if id is None:
+            id = self.reserve(name)
+            self.restore(id, name)
+        return id
+
+    def reserve(self, name: str, pending: int = 0) -> int:
+        """
+        Returns the ID a new name would get, without adding it.
+
+        Parameters:
+            name (str): The new name.
+            pending (int): New names already reserved but not added yet, e.g. by an `item_stage.StagedRegistry`.
+
+        Returns:
+            int: The ID from `shared` if set, otherwise the next ID after the pending ones.
+        """
+        if self.shared is not None:
+            return self.shared(name)
+        return self.next_id + pending
+
+    def restore(self, id: int, name: str):
+        """
+        Adds a name with a known ID, e.g. when loading a table or replaying the journal. Names already present are kept.
+
+        Parameters:
+            id (int): The ID of the name.
+            name (str): The name.
+        """
+        self.next_id = max(self.next_id, id + 1)
+        if name in self.ids:
+            return
+        self.ids[name] = id
+        self.order.append(name)
+
+    def entries_since(self, start: int) -> list:
+        """
+        Returns the entries added after the first `start` ones.
+
+        Parameters:
+            start (int): Number of entries to skip, e.g. `len(registry)` taken earlier.
+
+        Returns:
+            list: [id, name] pairs in insertion order.
+        """
+        return [[self.ids[name], name] for name in self.order[start:]]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def empty(self) -> bool:
+        return not self.ids
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Exports the registry in the lookup table layout.
+
+        Returns:
+            pd.DataFrame: A DataFrame with the columns `id_col` and `name_col`, ordered by ID.
+        """
+        return pd.DataFrame({self.id_col: list(self.ids.values()), self.name_col: list(self.ids.keys())}).sort_values(self.id_col)
+
+    def to_csv(self, path: str):
+        """
+        Writes the registry to a CSV in the lookup table layout.
+
+        Parameters:
+            path (str): Path of the CSV file.
+        """
+        self.to_frame().to_csv(path, index=False)
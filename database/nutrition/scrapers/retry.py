@@ -0,0 +1,274 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+from scraper_common import metrics
+
+#HTTP statuses worth another try, every other error status is final
+RETRY_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+
+
+class FetchFailed(Exception):
+    """
+    Raised once a page can't be fetched.
+
+    Parameters:
+        url (str): The URL of the page.
+        cause (Exception): The last error the fetcher raised.
+        attempts (int): The fetches tried.
+        retryable (bool): True if the error looked transient, so the page is worth trying again later.
+    """
+
+    def __init__(self, url: str, cause: Exception, attempts: int = 1, retryable: bool = True):
+        super().__init__("Can't Reach URL: " + type(cause).__name__ + ' ' + str(cause))
+        self.url = url
+        self.cause = cause
+        self.attempts = attempts
+        self.retryable = retryable
+
+
+def error_status(e: Exception) -> int:
+    """
+    HTTP status of a requests or aiohttp error, None if the error has none, e.g. a timeout.
+    """
+    status = getattr(getattr(e, 'response', None), 'status_code', None)
+    if status is None:
+        status = getattr(e, 'status', None)
+    return status if isinstance(status, int) else None
+
+def retryable(e: Exception) -> bool:
+    """
+    Checks whether a fetch error is transient. Error statuses other than `RETRY_STATUSES` are final, and so are
+    ValueErrors, which the scrapers raise for pages that will not change, e.g. a page missing from the page cache.
+    """
+    status = error_status(e)
+    if status is not None:
+        return status in RETRY_STATUSES
+    return not isinstance(e, ValueError)
+
+def fetch_failed(url: str, e: Exception) -> FetchFailed:
+    """
+    Wraps any error of a fetch in a `FetchFailed`, a `FetchFailed` is returned as it is.
+    """
+    if isinstance(e, FetchFailed):
+        return e
+    return FetchFailed(url, e, retryable=retryable(e))
+
+def reraise(e: Exception):
+    """
+    Raises `e`, for a `functools.partial` standing in for the extraction of a page that failed to fetch.
+    """
+    raise e
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """
+    Seconds to wait before retry number `attempt`, counting from 0. The delay doubles with every attempt up to
+    `max_delay`, and a random half of it is taken so workers that failed together do not retry together.
+    """
+    delay = min(max_delay, base_delay * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class CircuitBreaker:
+    """
+    Pauses all fetches to a host after a burst of errors. Once `threshold` fetches in a row have failed the host
+    is closed for `cooldown` seconds, then fetches are let through again and the first failure closes it again.
+    Safe to share between worker threads and coroutines.
+
+    Parameters:
+        threshold (int): Failed fetches in a row that close a host, 0 turns the breaker off.
+        cooldown (float): Seconds a host stays closed.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = {}
+        self.closed_until = {}
+        self.lock = threading.Lock()
+
+    def delay(self, url: str) -> float:
+        """
+        Seconds until the host of `url` may be fetched from again, 0 if it is open.
+        """
+        with self.lock:
+            return max(0, self.closed_until.get(urlparse(url).netloc, 0) - time.monotonic())
+
+    def success(self, url: str):
+        host = urlparse(url).netloc
+        with self.lock:
+            self.failures.pop(host, None)
+
+    def failure(self, url: str):
+        """
+        Counts a failed fetch from the host of `url`, closing the host once `threshold` fetches in a row have failed.
+        """
+        if not self.threshold:
+            return
+        host = urlparse(url).netloc
+        with self.lock:
+            failures = self.failures.get(host, 0) + 1
+            self.failures[host] = failures
+            if failures < self.threshold or self.closed_until.get(host, 0) > time.monotonic():
+                return
+            self.closed_until[host] = time.monotonic() + self.cooldown
+        print('Pausing', host, 'for', self.cooldown, 'seconds after', failures, 'failed fetches in a row')
+        metrics.count('breaker_open_total', host=host)
+
+
+class RetryingFetcher:
+    """
+    Wraps a fetcher so transient errors are retried with exponential backoff and a shared `CircuitBreaker`.
+
+    Parameters:
+        fetcher: The fetcher doing the actual work, put it behind the rate limiter so retries count against it.
+        breaker (CircuitBreaker): The breaker shared by every worker.
+        retries (int): Fetches tried after the first one fails.
+        base_delay (float): Seconds before the first retry, see `backoff_delay`.
+        max_delay (float): Longest wait between two tries.
+
+    Raises:
+        FetchFailed: From `fetch`, once the page failed `retries` + 1 times or with an error that is not transient.
+    """
+
+    def __init__(self, fetcher, breaker: CircuitBreaker, retries: int, base_delay: float, max_delay: float):
+        self.fetcher = fetcher
+        self.breaker = breaker
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def fetch(self, url: str) -> str:
+        attempt = 0
+        while True:
+            wait = self.breaker.delay(url)
+            if wait:
+                time.sleep(wait)
+            try:
+                html = self.fetcher.fetch(url)
+                self.breaker.success(url)
+                return html
+            except Exception as e:
+                if not retryable(e):
+                    raise FetchFailed(url, e, attempt + 1, False)
+                self.breaker.failure(url)
+                if attempt >= self.retries:
+                    raise FetchFailed(url, e, attempt + 1)
+            time.sleep(backoff_delay(attempt, self.base_delay, self.max_delay))
+            attempt += 1
+            metrics.count('retries_total')
+
+    def close(self):
+        self.fetcher.close()
+
+
+class AsyncRetryingFetcher(RetryingFetcher):
+    """
+    Async version of `RetryingFetcher` for fetchers from `async_fetch`, waits without blocking the event loop.
+    """
+
+    async def fetch(self, url: str) -> str:
+        attempt = 0
+        while True:
+            wait = self.breaker.delay(url)
+            if wait:
+                await asyncio.sleep(wait)
+            try:
+                html = await self.fetcher.fetch(url)
+                self.breaker.success(url)
+                return html
+            except Exception as e:
+                if not retryable(e):
+                    raise FetchFailed(url, e, attempt + 1, False)
+                self.breaker.failure(url)
+                if attempt >= self.retries:
+                    raise FetchFailed(url, e, attempt + 1)
+            await asyncio.sleep(backoff_delay(attempt, self.base_delay, self.max_delay))
+            attempt += 1
+            metrics.count('retries_total')
+
+
+class DeadLetters:
+    """
+    Append only file of pages that could not be fetched, one JSON line each, kept so a later run can try them again.
+    Safe to share between worker threads.
+
+    Parameters:
+        path (str): Path of the dead letter file.
+
+    Notes:
+        - `take` moves the entries to a '.retrying' file that is only removed by `done`, so a retry run that
+          crashes loses nothing, its entries are taken again by the next one.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def add(self, entry: dict):
+        """
+        Appends an entry and flushes it.
+
+        Parameters:
+            entry (dict): A JSON serializable entry holding at least 'url'. A 'time' is added if missing.
+        """
+        entry = dict(entry)
+        entry.setdefault('time', datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a') as file:
+                file.write(json.dumps(entry, default=str) + '\n')
+
+    def read(self, path: str = None) -> list:
+        """
+        Reads every complete entry of the file, a torn last line left by a crash is skipped.
+        """
+        path = path or self.path
+        entries = []
+        if not os.path.exists(path):
+            return entries
+        with open(path, 'r') as file:
+            for line in file:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+        return entries
+
+    def take(self) -> list:
+        """
+        Takes every entry for a retry run, the latest entry per URL. Entries that fail again are added anew.
+
+        Returns:
+            list: The entries, oldest first.
+        """
+        retrying = self.path + '.retrying'
+        with self.lock:
+            entries = self.read(retrying) + self.read()
+            with open(retrying + '.tmp', 'w') as file:
+                for entry in entries:
+                    file.write(json.dumps(entry, default=str) + '\n')
+            os.replace(retrying + '.tmp', retrying)
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+        latest = {}
+        for entry in entries:
+            latest.pop(entry['url'], None)
+            latest[entry['url']] = entry
+        return list(latest.values())
+
+    def done(self):
+        """
+        Drops the taken entries, once each was retried or added again.
+        """
+        with self.lock:
+            if os.path.exists(self.path + '.retrying'):
+                os.remove(self.path + '.retrying')
+
+    def __len__(self) -> int:
+        return len(self.read())
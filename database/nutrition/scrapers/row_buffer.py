@@ -0,0 +1,104 @@
+import pandas as pd
+
+
+class RowBuffer:
+    """
+    Append optimized table holding one Python list per column. Rows are only turned into a
+    DataFrame when the buffer is flushed, so appending a row costs O(1) instead of a DataFrame copy.
+
+    Parameters:
+        columns (list): The column names, in output order.
+        ids (id_allocators.IdAllocator): Optional allocator handing out the row IDs of this table.
+    """
+
+    def __init__(self, columns: list, ids=None):
+        self.columns = list(columns)
+        self.data = {col: [] for col in self.columns}
+        self.ids = ids
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, ids=None) -> 'RowBuffer':
+        """
+        Builds a buffer holding the rows of an existing DataFrame.
+
+        Parameters:
+            df (pd.DataFrame): The rows to start with.
+            ids (id_allocators.IdAllocator): Optional allocator handing out the row IDs of this table.
+
+        Returns:
+            RowBuffer: A buffer with the same columns and rows as `df`.
+        """
+        buffer = cls(df.columns, ids)
+        for col in buffer.columns:
+            buffer.data[col] = df[col].tolist()
+        return buffer
+
+    def append(self, row: dict):
+        """
+        Adds a row to the end of the buffer. Keys that are not columns are ignored, missing columns are stored as None.
+
+        Parameters:
+            row (dict): The row to add.
+        """
+        for col in self.columns:
+            self.data[col].append(row.get(col))
+
+    def extend(self, columns: dict):
+        """
+        Adds several rows given column-wise, e.g. the output of `rows_since`.
+
+        Parameters:
+            columns (dict): Maps each column to its list of values, columns missing from the dict are stored as None.
+        """
+        count = len(next(iter(columns.values()))) if columns else 0
+        for col in self.columns:
+            self.data[col].extend(columns.get(col, [None] * count))
+
+    def rows_since(self, start: int) -> dict:
+        """
+        Returns the rows from position `start` on, column-wise.
+
+        Parameters:
+            start (int): Position of the first row to return.
+
+        Returns:
+            dict: Maps each column to its values from `start` on.
+        """
+        return {col: self.data[col][start:] for col in self.columns}
+
+    def column(self, col: str) -> list:
+        """
+        Returns the values of a column. The list is live, do not modify it.
+        """
+        return self.data[col]
+
+    def clear(self):
+        """
+        Removes every row, e.g. once the rows have been flushed.
+        """
+        self.data = {col: [] for col in self.columns}
+
+    def __len__(self) -> int:
+        return len(self.data[self.columns[0]]) if self.columns else 0
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Builds a DataFrame from the buffered rows.
+
+        Returns:
+            pd.DataFrame: The rows of the buffer with the columns in order.
+        """
+        return pd.DataFrame(self.data, columns=self.columns)
+
+    def to_csv(self, path: str):
+        """
+        Writes the buffered rows to a CSV file.
+
+        Parameters:
+            path (str): Path of the CSV file.
+        """
+        self.to_frame().to_csv(path, index=False)
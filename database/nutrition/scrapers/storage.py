@@ -0,0 +1,270 @@
+import glob
+import os
+import re
+import pandas as pd
+
+SEGMENT_DIGITS = 6
+
+#file format of the tables, 'csv' or 'parquet', see `set_backend`
+BACKEND = 'csv'
+EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet'}
+
+#explicit dtypes of every table, keyed by file name without extension.
+#amounts stay text since the site gives values like '<1' and '1/2'
+TABLE_SCHEMAS = {
+    'items': {'item_id': 'Int64', 'name': 'string', 'brand': 'string', 'NLEA_unit': 'Int64', 'NLEA_val': 'string',
+              'ammount': 'string', 'ammount_unit': 'Int64', 'upc': 'string', 'ingredient_list': 'string'},
+    'conversion_junc': {'conversion_id': 'Int64', 'item_id': 'Int64', 'unit_id': 'Int64', 'unit_amt': 'string',
+                        'ammount': 'string', 'amt_unit': 'Int64'},
+    'nutrient_junk': {'nut_junc_id': 'Int64', 'item_id': 'Int64', 'nutrient_id': 'Int64', 'alt_id': 'Int64',
+                      'cat_id': 'Int64', 'ammount': 'string', 'unit_id': 'Int64', 'dv': 'string'},
+    'unit_lu': {'unit_id': 'Int64', 'name': 'string'},
+    'nutrient_lu': {'nutrient_id': 'Int64', 'name': 'string'},
+    'nutrient_category_lu': {'cat_id': 'Int64', 'name': 'string'},
+}
+
+
+def set_backend(backend: str):
+    """
+    Selects the file format every table is read from and written to.
+
+    Parameters:
+        backend (str): 'csv' or 'parquet'.
+
+    Raises:
+        ValueError: If `backend` is not a known format.
+
+    Notes:
+        - Table paths are always given with their '.csv' name, the extension is swapped for the selected backend.
+        - Existing CSV tables are not read by the parquet backend, convert them first with `convert_table`.
+    """
+    global BACKEND
+
+    if backend not in EXTENSIONS:
+        raise ValueError('Unknown storage backend ' + str(backend) + ', expected one of ' + ', '.join(EXTENSIONS))
+    BACKEND = backend
+
+def backend_path(path: str, backend: str = None) -> str:
+    """
+    Returns the file a table is stored in for a backend, e.g. '.../items.parquet' for '.../items.csv'.
+
+    Parameters:
+        path (str): Path of the table's base file.
+        backend (str): The backend, the selected one if None.
+    """
+    return os.path.splitext(path)[0] + EXTENSIONS[backend or BACKEND]
+
+def table_schema(path: str, columns: list = None) -> dict:
+    """
+    Returns the dtypes of a table, limited to `columns` if given. Tables without a schema get an empty dict.
+    Works for base, segment and temp files alike since the table name is everything before the first '.'.
+    """
+    schema = TABLE_SCHEMAS.get(os.path.basename(path).split('.')[0], {})
+    if columns is not None:
+        schema = {col: dtype for col, dtype in schema.items() if col in columns}
+    return schema
+
+def coerce(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """
+    Casts the columns of `df` to the dtypes in `schema`. Empty strings and None become missing values.
+
+    Parameters:
+        df (pd.DataFrame): The rows to cast.
+        schema (dict): Maps a column to its dtype, columns not in `df` are ignored.
+
+    Returns:
+        pd.DataFrame: A copy of `df` with the schema's dtypes.
+
+    Raises:
+        ValueError: If a value can not be cast, e.g. text in an ID column.
+    """
+    df = df.copy()
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        values = df[col].replace('', None)
+        if dtype == 'Int64':
+            values = pd.to_numeric(values)
+        df[col] = values.astype(dtype)
+    return df
+
+def read_file(path: str, backend: str, columns: list = None) -> pd.DataFrame:
+    """
+    Reads one file of a table with the table's dtypes.
+
+    Parameters:
+        path (str): Path of the file.
+        backend (str): Format of the file.
+        columns (list): Columns to read, all of them if None.
+
+    Returns:
+        pd.DataFrame: The rows of the file.
+    """
+    if backend == 'parquet':
+        return pd.read_parquet(path, columns=columns)
+    #only empty fields are missing, so names like 'NA' stay text. The nullable integer columns are cast
+    #after parsing since the C parser is far slower when asked for them directly
+    schema = table_schema(path, columns)
+    text = {col: dtype for col, dtype in schema.items() if dtype == 'string'}
+    df = pd.read_csv(path, usecols=columns, dtype=text, keep_default_na=False, na_values=[''])
+    return df.astype({col: dtype for col, dtype in schema.items() if col in df.columns and col not in text})
+
+def write_file(path: str, df: pd.DataFrame, backend: str):
+    """
+    Writes the rows of a table to one file. Parquet files get the table's dtypes, CSV files are written as given.
+
+    Parameters:
+        path (str): Path of the file.
+        df (pd.DataFrame): The rows to write.
+        backend (str): Format of the file.
+    """
+    if backend == 'parquet':
+        coerce(df, table_schema(path)).to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+def segment_paths(path: str, backend: str = None) -> list:
+    """
+    Lists the segment files appended to a table, oldest first.
+
+    Parameters:
+        path (str): Path of the table's base file, e.g. '.../items.csv'.
+        backend (str): The backend, the selected one if None.
+
+    Returns:
+        list: Paths of the segments, e.g. '.../items.000001.csv', in append order.
+    """
+    root, ext = os.path.splitext(backend_path(path, backend))
+    pattern = re.compile(re.escape(root) + r'\.(\d{' + str(SEGMENT_DIGITS) + r'})' + re.escape(ext) + '$')
+    segments = [p for p in glob.glob(glob.escape(root) + '.*' + ext) if pattern.match(p)]
+    return sorted(segments, key=lambda p: int(pattern.match(p).group(1)))
+
+def table_paths(path: str, backend: str = None) -> list:
+    """
+    Lists every file holding rows of a table, the base file first if it exists.
+    """
+    base = backend_path(path, backend)
+    return ([base] if os.path.exists(base) else []) + segment_paths(path, backend)
+
+def table_exists(path: str, backend: str = None) -> bool:
+    return bool(table_paths(path, backend))
+
+def read_table(path: str, columns: list = None, backend: str = None) -> pd.DataFrame:
+    """
+    Reads a table from its base file and all of its segments.
+
+    Parameters:
+        path (str): Path of the table's base file.
+        columns (list): Columns to read, all of them if None. Parquet only reads the requested columns from disk.
+        backend (str): The backend, the selected one if None.
+
+    Returns:
+        pd.DataFrame: Every row of the table in append order with the table's dtypes, an empty DataFrame
+                      if the table does not exist.
+    """
+    backend = backend or BACKEND
+    frames = [read_file(p, backend, columns) for p in table_paths(path, backend)]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+def write_atomic(path: str, df: pd.DataFrame, backend: str = None):
+    """
+    Writes a table's base file through a temp file and a rename, so readers never see a half written file.
+
+    Parameters:
+        path (str): Path of the table's base file.
+        df (pd.DataFrame): The rows to write.
+        backend (str): The backend, the selected one if None.
+    """
+    backend = backend or BACKEND
+    path = backend_path(path, backend)
+    tmp_path = path + '.tmp'
+    write_file(tmp_path, df, backend)
+    os.replace(tmp_path, path)
+
+def append_rows(path: str, df: pd.DataFrame) -> str:
+    """
+    Appends rows to a table without touching the rows already written. The rows become the base file if the table
+    does not exist yet, otherwise they go to the next numbered segment. The cost is proportional to `len(df)` only.
+
+    Parameters:
+        path (str): Path of the table's base file.
+        df (pd.DataFrame): The new rows.
+
+    Returns:
+        str: The path the rows were written to, None if there were no rows.
+
+    Notes:
+        - The rows are written to a temp file first and then linked into place, which fails instead of
+          overwriting if another writer took the same segment number, in that case the next number is tried.
+    """
+    if df.empty:
+        return None
+
+    base = backend_path(path)
+    tmp_path = base + '.' + str(os.getpid()) + '.tmp'
+    write_file(tmp_path, df, BACKEND)
+
+    try:
+        if not table_exists(path):
+            try:
+                os.link(tmp_path, base)
+                return base
+            except FileExistsError:
+                pass
+
+        root, ext = os.path.splitext(base)
+        while True:
+            segments = segment_paths(path)
+            last = int(segments[-1][len(root) + 1:-len(ext)]) if segments else 0
+            segment = root + '.' + str(last + 1).zfill(SEGMENT_DIGITS) + ext
+            try:
+                os.link(tmp_path, segment)
+                return segment
+            except FileExistsError:
+                continue
+    finally:
+        os.remove(tmp_path)
+
+def replace_table(path: str, df: pd.DataFrame, backend: str = None):
+    """
+    Replaces a table with `df` as a single base file and removes its segments.
+
+    Parameters:
+        path (str): Path of the table's base file.
+        df (pd.DataFrame): Every row of the table.
+        backend (str): The backend, the selected one if None.
+    """
+    segments = segment_paths(path, backend)
+    write_atomic(path, df, backend)
+    for segment in segments:
+        os.remove(segment)
+
+def compact_table(path: str, backend: str = None):
+    """
+    Merges the segments of a table back into its base file.
+
+    Parameters:
+        path (str): Path of the table's base file.
+        backend (str): The backend, the selected one if None.
+    """
+    if segment_paths(path, backend):
+        replace_table(path, read_table(path, backend=backend), backend)
+
+def convert_table(path: str, source: str, target: str) -> int:
+    """
+    Copies a table, with all of its segments, from one backend to another as a single base file.
+    The source files are left in place.
+
+    Parameters:
+        path (str): Path of the table's base file.
+        source (str): The backend the table is stored in, e.g. 'csv'.
+        target (str): The backend to write, e.g. 'parquet'.
+
+    Returns:
+        int: The number of rows converted.
+    """
+    df = read_table(path, backend=source)
+    replace_table(path, df, target)
+    return len(df)
@@ -0,0 +1,169 @@
+import re
+import pandas as pd
+
+#"<value> <unit> = <amount> <amount unit>", the characters either side of the '=' are dropped
+MEASURE_PATTERN = re.compile(r'([^ ]*) ([^=]*)=(.*)', re.DOTALL)
+#a number followed by a unit, e.g. "2.5 kg" or "15g"
+AMMOUNT_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(\w+)')
+#an alternate unit in parentheses, e.g. "tbsp (aprx)"
+ALT_UNIT_PATTERN = re.compile(r'\((.*?)\)')
+
+MEASURE_COLUMNS = ['value', 'unit', 'ammount', 'ammount_unit']
+
+
+def split_unit_value_and_ammount(NLEA_info: str)->tuple[str, str, str, str]:
+    """
+    Parses a measure option value such as "1 cup = 240 g" into its value, unit, amount, and amount unit.
+
+    Parameters:
+        NLEA_info (str): A string containing NLEA information in the format
+                         "<value> <unit> = <amount> <amount unit>".
+
+    Returns:
+        tuple[str, str, str, str]:
+            - Value (str): The numeric value of the serving size, e.g. '1'.
+            - Unit (str): The unit of the serving size, e.g. 'cup'.
+            - Amount (str): The amount of the serving size, e.g. '240', '' if it has no numeric amount.
+            - Amount unit (str): The unit of the amount, e.g. 'g', '' if it has no numeric amount.
+
+    Raises:
+        ValueError: If the input string does not conform to the expected format.
+    """
+    match = MEASURE_PATTERN.match(NLEA_info)
+    if not match:
+        raise ValueError("Can't split measure [" + str(NLEA_info) + "]")
+    val, unit, ammount = match.groups()
+    ammount, amt_unit = clean_ammount(ammount[1:])
+    return val.strip(), unit[:-1], ammount, amt_unit
+
+def clean_ammount(ammount: str)->tuple[str, str]:
+    """
+    Cleans and parses an amount string, extracting the numeric value and its unit.
+
+    Parameters:
+        ammount (str): A string representing the amount, which typically contains a numeric value followed by a unit
+                       (e.g., "100 g" or "2.5 kg").
+
+    Returns:
+        tuple[str, str]:
+            - Numeric value (str): The extracted numeric value of the amount.
+            - Unit (str): The unit associated with the amount (e.g., "g", "kg").
+
+        Returns an empty tuple ('', '') if the input string does not match the expected format.
+    """
+    match = AMMOUNT_PATTERN.match(ammount)
+    if not match:
+        return '', ''
+    return match.groups()
+
+def clean_unit_measure(unit: str)->tuple[str, str]:
+    """
+    Cleans and standardizes a unit string by removing additional information, such as text in parentheses `(info)`
+    and the word "aprx". Extracts alternate units, if present, from the parentheses.
+
+    Parameters:
+        unit (str): A string representing the unit, which may include additional information or alternate units
+                    in parentheses and the word "aprx".
+
+    Returns:
+        tuple[str, str]:
+            - Cleaned unit (str): The standardized unit string with extraneous information removed.
+            - Alternate unit (str): A string of alternate units extracted from the parentheses, separated by '/'
+              if multiple are found.
+    """
+    matches = ALT_UNIT_PATTERN.findall(unit)
+    alt = join_alt_units(matches)
+    unit = unit.replace('aprx', '').strip()
+    unit = unit.replace('approximate', '').strip()
+    unit = ALT_UNIT_PATTERN.sub('', unit).strip()
+    return unit, alt
+
+def join_alt_units(matches: list)->str:
+    """
+    Joins the alternate units found in a unit string, each followed by '/' when there is more than one.
+    """
+    if len(matches) > 1:
+        return ''.join(match + '/' for match in matches)
+    if matches:
+        return matches[0]
+    return ''
+
+def parse_unique(values, parse)->pd.DataFrame:
+    """
+    Runs a column parser once per distinct value and spreads the results back over `values`. Measure and
+    amount columns repeat the same few strings, so this is where most of the batch speed comes from.
+
+    Parameters:
+        values: The strings to parse, any list-like or a pd.Series.
+        parse (callable): Parses a pd.Series of distinct strings into a DataFrame with one row per string.
+
+    Returns:
+        pd.DataFrame: The parsed rows aligned with the index of `values`, missing values give missing rows.
+    """
+    values = pd.Series(values, dtype='string')
+    codes, uniques = pd.factorize(values)
+    parsed = parse(pd.Series(uniques, dtype='string'))
+    parsed = parsed.reindex(codes)
+    parsed.index = values.index
+    return parsed
+
+def split_measures(values)->pd.DataFrame:
+    """
+    Batch version of `split_unit_value_and_ammount`, vectorized through pandas string methods.
+    Takes every option value of a page or a whole column of a table at once.
+
+    Parameters:
+        values: The measure strings, any list-like or a pd.Series.
+
+    Returns:
+        pd.DataFrame: One row per value with the columns in `MEASURE_COLUMNS`, aligned with the index of `values`.
+                      Values that are not a measure get missing values in every column, numberless amounts get ''.
+    """
+    return parse_unique(values, split_measure_column)
+
+def split_measure_column(values: pd.Series)->pd.DataFrame:
+    parts = values.str.extract(MEASURE_PATTERN)
+    ammounts = clean_ammount_column(parts[2].str[1:])
+    measured = parts[0].notna()
+    return pd.DataFrame({
+        'value': parts[0].str.strip(),
+        'unit': parts[1].str[:-1],
+        'ammount': ammounts['ammount'].where(~measured | ammounts['ammount'].notna(), ''),
+        'ammount_unit': ammounts['unit'].where(~measured | ammounts['unit'].notna(), ''),
+    })
+
+def clean_ammounts(values)->pd.DataFrame:
+    """
+    Batch version of `clean_ammount`, e.g. for the amounts of every nutrient row of a page or a table column.
+
+    Parameters:
+        values: The amount strings, any list-like or a pd.Series.
+
+    Returns:
+        pd.DataFrame: The columns 'ammount' and 'unit', aligned with the index of `values`. Amounts that
+                      do not start with a number get missing values.
+    """
+    return parse_unique(values, clean_ammount_column)
+
+def clean_ammount_column(values: pd.Series)->pd.DataFrame:
+    parts = values.str.extract('^' + AMMOUNT_PATTERN.pattern)
+    return pd.DataFrame({'ammount': parts[0], 'unit': parts[1]})
+
+def clean_unit_measures(values)->pd.DataFrame:
+    """
+    Batch version of `clean_unit_measure`, used by normalize_units.py to re-normalize the unit names of `unit_lu`.
+
+    Parameters:
+        values: The unit strings, any list-like or a pd.Series.
+
+    Returns:
+        pd.DataFrame: The columns 'unit' and 'alt', aligned with the index of `values`.
+    """
+    return parse_unique(values, clean_unit_column)
+
+def clean_unit_column(values: pd.Series)->pd.DataFrame:
+    alt = values.str.findall(ALT_UNIT_PATTERN).map(join_alt_units, na_action='ignore')
+    unit = values.str.replace('aprx', '', regex=False).str.strip()
+    unit = unit.str.replace('approximate', '', regex=False).str.strip()
+    unit = unit.str.replace(ALT_UNIT_PATTERN, '', regex=True).str.strip()
+    return pd.DataFrame({'unit': unit, 'alt': alt.astype('string')})
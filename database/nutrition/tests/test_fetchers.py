@@ -0,0 +1,125 @@
+import asyncio
+import os
+import sys
+import unittest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(TESTS_DIR, '..', 'scrapers'))
+
+from aiohttp import web
+import fetchers
+import async_fetch
+import retry
+
+# Offline tests of the fetch stack, the pages come from fake fetchers or from an aiohttp server on localhost.
+#
+#   python -m pytest database/nutrition/tests
+
+LISTING_URL = 'https://example.com/foods/list_Q_3'
+#the listing page past the end of a letter, served in full but without any items
+END_OF_LETTER_PAGE = '<html><head><title>Q</title></head><body><table class="list"></table></body></html>'
+LISTING_PAGE = '<html><body><a class="table_item_name" href="/item/1">1</a></body></html>'
+TRUNCATED_PAGE = '<html><body><table class="list"><tr><td>'
+
+
+class FakeFetcher:
+    """
+    Returns `html` for every URL and counts the fetches.
+    """
+
+    def __init__(self, html: str):
+        self.html = html
+        self.fetches = 0
+
+    def fetch(self, url: str) -> str:
+        self.fetches += 1
+        return self.html
+
+    def close(self):
+        pass
+
+
+def retrying(fetcher, breaker: retry.CircuitBreaker) -> retry.RetryingFetcher:
+    return retry.RetryingFetcher(fetcher, breaker, retries=7, base_delay=0, max_delay=0)
+
+
+class FallbackFetcherTest(unittest.TestCase):
+
+    def test_end_of_letter_is_returned_without_retries(self):
+        primary, fallback = FakeFetcher(END_OF_LETTER_PAGE), FakeFetcher(END_OF_LETTER_PAGE)
+        breaker = retry.CircuitBreaker(threshold=5, cooldown=60)
+
+        html = retrying(fetchers.FallbackFetcher(primary, fallback), breaker).fetch(LISTING_URL)
+
+        self.assertEqual(html, END_OF_LETTER_PAGE)
+        self.assertEqual((primary.fetches, fallback.fetches), (1, 1))
+        self.assertEqual(breaker.failures, {})
+
+    def test_complete_page_skips_fallback(self):
+        primary, fallback = FakeFetcher(LISTING_PAGE), FakeFetcher(LISTING_PAGE)
+
+        html = fetchers.FallbackFetcher(primary, fallback).fetch(LISTING_URL)
+
+        self.assertEqual(html, LISTING_PAGE)
+        self.assertEqual(fallback.fetches, 0)
+
+    def test_fallback_fixes_truncated_page(self):
+        fallback = FakeFetcher(LISTING_PAGE)
+
+        html = fetchers.FallbackFetcher(FakeFetcher(TRUNCATED_PAGE), fallback).fetch(LISTING_URL)
+
+        self.assertEqual(html, LISTING_PAGE)
+        self.assertEqual(fallback.fetches, 1)
+
+    def test_truncated_page_is_retried(self):
+        primary, fallback = FakeFetcher(TRUNCATED_PAGE), FakeFetcher(TRUNCATED_PAGE)
+        breaker = retry.CircuitBreaker(threshold=0, cooldown=0)
+
+        with self.assertRaises(retry.FetchFailed) as raised:
+            retrying(fetchers.FallbackFetcher(primary, fallback), breaker).fetch(LISTING_URL)
+
+        self.assertIsInstance(raised.exception.cause, fetchers.IncompletePage)
+        self.assertTrue(raised.exception.retryable)
+        self.assertEqual(raised.exception.attempts, 8)
+        self.assertEqual(fallback.fetches, 8)
+
+
+class AsyncHttpFetcherTest(unittest.TestCase):
+
+    def fetch(self, page: str, fallback: FakeFetcher) -> str:
+        """
+        Serves `page` on localhost and fetches it through an `async_fetch.AsyncHttpFetcher` using `fallback`.
+        """
+        async def handler(request):
+            return web.Response(text=page, content_type='text/html')
+
+        async def run():
+            app = web.Application()
+            app.router.add_get('/{tail:.*}', handler)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, '127.0.0.1', 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            try:
+                async with async_fetch.AsyncHttpFetcher(rate=0, fallback=fallback) as fetcher:
+                    return await fetcher.fetch('http://127.0.0.1:' + str(port) + '/foods/list_Q_3')
+            finally:
+                await runner.cleanup()
+
+        return asyncio.run(run())
+
+    def test_end_of_letter_is_returned(self):
+        fallback = FakeFetcher(END_OF_LETTER_PAGE)
+
+        self.assertEqual(self.fetch(END_OF_LETTER_PAGE, fallback), END_OF_LETTER_PAGE)
+        self.assertEqual(fallback.fetches, 1)
+
+    def test_truncated_page_raises(self):
+        with self.assertRaises(fetchers.IncompletePage):
+            self.fetch(TRUNCATED_PAGE, FakeFetcher(TRUNCATED_PAGE))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import json
+import os
+import re
+import sys
+import tempfile
+import unittest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, '..', 'scrapers'))
+
+import mysql_sink
+
+# Tests of the database sink against the schema of database/SQL_Scripts/CreateScripts. The integration tests load the
+# table scripts into a throwaway database on the server of `mysql_sink.connection_config` and are skipped when
+# mysql-connector-python is missing or no server is reachable:
+#
+#   docker run -d --name fms-test-db -p 3306:3306 -e MARIADB_ROOT_PASSWORD=root mariadb:11
+#   DBUSER=root DBPASS=root python -m pytest database/nutrition/tests/test_mysql_sink.py
+
+CREATE_SCRIPTS_DIR = os.path.join(TESTS_DIR, '..', '..', 'SQL_Scripts', 'CreateScripts')
+#the scripts of the tables the sink writes, the database and user scripts are left out
+TABLE_SCRIPTS = ('02-CreateNutrientLU.sql', '03-CreateUnitLU.sql', '04-CreateItemTable.sql', '05-CreateNutCatLU.sql',
+                 '06-CreateNutrientJunc.sql', '07-CreateConversionJunc.sql')
+TEST_DATABASE = 'fms_sink_test'
+
+
+def table_statements() -> list:
+    """
+    The CREATE TABLE statements of `TABLE_SCRIPTS`, without their USE lines.
+    """
+    statements = []
+    for script in TABLE_SCRIPTS:
+        with open(os.path.join(CREATE_SCRIPTS_DIR, script), 'r') as file:
+            sql = file.read()
+        statements += [part.strip() for part in sql.split(';') if part.strip() and not part.strip().upper().startswith('USE ')]
+    return statements
+
+def schema_references() -> dict:
+    """
+    Maps each table of `TABLE_SCRIPTS` to the set of tables its foreign keys reference.
+    """
+    references = {}
+    for statement in table_statements():
+        table = re.search(r'CREATE TABLE IF NOT EXISTS\s+(\w+)', statement).group(1)
+        references[table] = set(re.findall(r'REFERENCES\s+(\w+)', statement)) - {table}
+    return references
+
+def fixture_tables() -> dict:
+    """
+    One item with its nutrients and conversions, plus an item whose serving unit is not in unit_lu, so the database
+    rejects it and its nutrient row by their foreign keys.
+    """
+    return {
+        'unit_lu': {'unit_id': [1, 2], 'name': ['g', 'cup']},
+        'nutrient_lu': {'nutrient_id': [1, 2], 'name': ['Protein', 'Sodium']},
+        'nutrient_category_lu': {'cat_id': [1], 'name': ['Macros']},
+        'items': {'item_id': [1, 2], 'name': ['Oat Milk', 'Bad Unit'], 'brand': ['Brand', 'Brand'], 'NLEA_unit': [2, 99],
+                  'NLEA_val': [1, 1], 'ammount': [240, 100], 'ammount_unit': [1, 1], 'upc': ['012345678905', ''],
+                  'ingredient_list': ['oats, water', '']},
+        'nutrient_junc': {'nut_junc_id': [1, 2, 3], 'item_id': [1, 1, 2], 'nutrient_id': [1, 2, 1], 'alt_id': [None, None, None],
+                          'cat_id': [1, 1, 1], 'ammount': ['3', '<1', '2'], 'unit_id': [1, 1, 1], 'dv': ['6%', '0%', '']},
+        'conversion_junc': {'conversion_id': [1], 'item_id': [1], 'unit_id': [2], 'unit_amt': ['1/2'], 'ammount': [120],
+                            'amt_unit': [1]},
+    }
+
+
+class SchemaOrderTest(unittest.TestCase):
+
+    def test_tables_are_written_after_the_tables_they_reference(self):
+        references = schema_references()
+        order = [table for table, _ in mysql_sink.SCHEMA_TABLES.values()]
+
+        self.assertEqual(set(order), set(references))
+        for position, table in enumerate(order):
+            self.assertLessEqual(references[table], set(order[:position]), table + ' is written before a table it references')
+
+
+class MySQLSinkIntegrationTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            import mysql.connector
+        except ImportError:
+            raise unittest.SkipTest('mysql-connector-python is not installed')
+        config = mysql_sink.connection_config()
+        config.pop('database')
+        try:
+            cls.admin = mysql.connector.connect(**config)
+        except mysql.connector.Error as e:
+            raise unittest.SkipTest('No MySQL server reachable: ' + str(e))
+        cursor = cls.admin.cursor()
+        cursor.execute('DROP DATABASE IF EXISTS ' + TEST_DATABASE)
+        cursor.execute('CREATE DATABASE ' + TEST_DATABASE)
+        cursor.execute('USE ' + TEST_DATABASE)
+        for statement in table_statements():
+            cursor.execute(statement)
+        cursor.close()
+        cls.config = dict(config, database=TEST_DATABASE)
+
+    @classmethod
+    def tearDownClass(cls):
+        cursor = cls.admin.cursor()
+        cursor.execute('DROP DATABASE IF EXISTS ' + TEST_DATABASE)
+        cursor.close()
+        cls.admin.close()
+
+    def setUp(self):
+        self.quarantine_dir = tempfile.TemporaryDirectory()
+        self.quarantine_path = os.path.join(self.quarantine_dir.name, 'sink_quarantine.jsonl')
+        self.sink = mysql_sink.MySQLSink(self.config, pool_size=1, quarantine_path=self.quarantine_path)
+
+    def tearDown(self):
+        cursor = self.admin.cursor()
+        for table, _ in reversed(list(mysql_sink.SCHEMA_TABLES.values())):
+            cursor.execute('DELETE FROM ' + TEST_DATABASE + '.' + table)
+        self.admin.commit()
+        cursor.close()
+        self.quarantine_dir.cleanup()
+
+    def counts(self) -> dict:
+        return {name: self.sink.query('SELECT COUNT(*) FROM ' + table)[0][0] for name, (table, _) in mysql_sink.SCHEMA_TABLES.items()}
+
+    def quarantined(self) -> list:
+        with open(self.quarantine_path, 'r') as file:
+            return [json.loads(line) for line in file]
+
+    def test_write_fixture_item(self):
+        sent = self.sink.write(fixture_tables())
+
+        expected = {'unit_lu': 2, 'nutrient_lu': 2, 'nutrient_category_lu': 1, 'items': 1, 'nutrient_junc': 2, 'conversion_junc': 1}
+        self.assertEqual(sent, expected)
+        self.assertEqual(self.counts(), expected)
+        self.assertEqual(self.sink.max_ids(['items', 'conversion_junc', 'nutrient_junc']),
+                         {'items': 1, 'conversion_junc': 1, 'nutrient_junc': 2})
+        self.assertEqual(self.sink.read_items().values.tolist(), [['Oat Milk', 'Brand', '012345678905']])
+        self.assertEqual(self.sink.query('SELECT unit_amt FROM conversion_junc')[0][0], 0.5)
+
+    def test_rejected_rows_are_quarantined(self):
+        self.sink.write(fixture_tables())
+
+        entries = self.quarantined()
+        rejected = [(entry['table'], entry['row'][mysql_sink.SCHEMA_TABLES[entry['table']][1][0][0]])
+                    for entry in entries if not entry.get('kept')]
+        kept = [(entry['table'], entry['column'], entry['value']) for entry in entries if entry.get('kept')]
+        self.assertEqual(rejected, [('items', 2), ('nutrient_junc', 3)])
+        self.assertEqual(kept, [('nutrient_junc', 'ammount', '<1')])
+        self.assertEqual(self.sink.query('SELECT ammount FROM nutrition_junc WHERE nut_junc_id = 2')[0][0], None)
+
+    def test_write_again_is_harmless(self):
+        self.sink.write(fixture_tables())
+        counts = self.counts()
+
+        self.sink.write(fixture_tables())
+
+        self.assertEqual(self.counts(), counts)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,17 +1,179 @@
-import pandas as pd
+import atexit
+import glob
+import json
+import os
+import queue
+import threading
+import time
 from datetime import datetime
 
-logging_DF = pd.DataFrame(columns=['Error Message', 'Line Number', 'URL Causing Error', 'time'])
 LOGGING_PATH = '/home/bg-labs/bg_labs/fms/database/recipes/scrapers/logs/log_'
 
+#a log file is rotated once it reaches MAX_BYTES or has been open MAX_AGE_SECONDS, 0 turns either off
+MAX_BYTES = 10 * 1024 * 1024
+MAX_AGE_SECONDS = 24 * 60 * 60
+#log files kept, the oldest are removed past this, 0 keeps all of them
+BACKUP_COUNT = 50
+#once a message was logged SAMPLE_AFTER times within SAMPLE_WINDOW seconds only every SAMPLE_EVERY-th copy is written,
+#with the number of copies seen so far. 0 writes every copy
+SAMPLE_AFTER = 20
+SAMPLE_EVERY = 100
+SAMPLE_WINDOW = 60
+#entries waiting for the writer, add_to_log drops and counts entries instead of blocking once it is full
+QUEUE_SIZE = 10000
+
+entries = queue.Queue(maxsize=QUEUE_SIZE)
+lock = threading.Lock()
+writer = None
+dropped = 0
+seen = {}
+window_start = time.time()
+
+
 def add_to_log(mssg: str, url: str, line: str):
-    global logging_DF
-    
-    new_row = {'Error Message': mssg, 'Line Number': line, 'URL Causing Error': url,  'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-    logging_DF.loc[len(logging_DF)] = new_row
+    """
+    Queues an error for the log writer without blocking the caller.
+
+    Parameters:
+        mssg (str): The error message.
+        url (str): The URL being handled when the error happened.
+        line: The line number of the error or any other detail.
+
+    Notes:
+        - Entries are written as JSON lines by a background thread, see `run_writer`.
+        - Repeats of a message past `SAMPLE_AFTER` are sampled, and entries are dropped and counted if the queue is full.
+    """
+    global dropped
+
+    repeats = sample(str(mssg))
+    if repeats is None:
+        return
+
+    entry = {'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 'message': mssg, 'line': line, 'url': url}
+    if repeats > 1:
+        entry['repeats'] = repeats
+
+    start_writer()
+    try:
+        entries.put_nowait(entry)
+    except queue.Full:
+        with lock:
+            dropped += 1
+
+def sample(mssg: str) -> int:
+    """
+    Counts a copy of `mssg` in the current sampling window.
+
+    Returns:
+        int: The copies of the message seen in the window, None if this copy is not to be written.
+    """
+    global window_start, seen
+
+    with lock:
+        now = time.time()
+        if now - window_start >= SAMPLE_WINDOW:
+            window_start = now
+            seen = {}
+        copies = seen.get(mssg, 0) + 1
+        seen[mssg] = copies
+
+    if SAMPLE_AFTER and copies > SAMPLE_AFTER and (copies - SAMPLE_AFTER) % SAMPLE_EVERY:
+        return None
+    return copies
 
 def write_to_file():
-    global LOGGING_PATH, logging_DF
+    """
+    Waits until every queued entry is written and flushed. The log is streamed to disk as it grows, so this
+    only makes sure nothing is left in the queue, e.g. before a checkpoint or shutdown.
+    """
+    if writer is not None:
+        entries.join()
+
+def close():
+    """
+    Writes the queued entries and stops the writer thread. Runs at interpreter exit.
+    """
+    global writer
+
+    if writer is None:
+        return
+    entries.put(None)
+    writer.join()
+    writer = None
+
+def start_writer():
+    global writer
+
+    if writer is not None:
+        return
+    with lock:
+        if writer is None:
+            writer = threading.Thread(target=run_writer, daemon=True)
+            writer.start()
+
+def open_log_file():
+    """
+    Opens a new log file named after the current time and removes the oldest files past `BACKUP_COUNT`.
+
+    Returns:
+        tuple: The open file and the time it was opened.
+    """
+    os.makedirs(os.path.dirname(LOGGING_PATH) or '.', exist_ok=True)
+    stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    path = LOGGING_PATH + stamp + '.jsonl'
+    suffix = 1
+    while os.path.exists(path):
+        suffix += 1
+        path = LOGGING_PATH + stamp + '.' + str(suffix) + '.jsonl'
+
+    if BACKUP_COUNT:
+        old = sorted(glob.glob(glob.escape(LOGGING_PATH) + '*.jsonl'), key=os.path.getmtime)
+        for old_path in old[:max(0, len(old) - BACKUP_COUNT + 1)]:
+            os.remove(old_path)
+
+    return open(path, 'a'), time.time()
+
+def run_writer():
+    """
+    Writer thread. Streams queued entries to the log file as JSON lines, flushing after every batch, and rotates
+    the file by size and age. Stops when it gets None.
+    """
+    global dropped
+
+    file, opened = None, 0
+    while True:
+        batch = [entries.get()]
+        while True:
+            try:
+                batch.append(entries.get_nowait())
+            except queue.Empty:
+                break
+
+        lines = [entry for entry in batch if entry is not None]
+        with lock:
+            lost, dropped = dropped, 0
+        if lost:
+            lines.insert(0, {'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                             'message': 'Dropped ' + str(lost) + ' log entries, the log queue was full', 'line': None, 'url': None})
+
+        try:
+            for entry in lines:
+                if file is None or (MAX_BYTES and file.tell() >= MAX_BYTES) or (MAX_AGE_SECONDS and time.time() - opened >= MAX_AGE_SECONDS):
+                    if file is not None:
+                        file.close()
+                    file, opened = open_log_file()
+                file.write(json.dumps(entry, default=str) + '\n')
+            if file is not None:
+                file.flush()
+        except OSError as e:
+            print('Failed to write the log:', e)
+        finally:
+            for _ in batch:
+                entries.task_done()
+
+        if None in batch:
+            if file is not None:
+                file.close()
+            return
 
-    path = LOGGING_PATH + datetime.now().strftime("%Y-%m-%d %H:%M:%S") + '.csv'
-    logging_DF.to_csv(path)
+atexit.register(close)
@@ -1,30 +1,73 @@
 import pandas as pd
 from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.firefox.service import Service
-from selenium.webdriver.firefox.options import Options
 from webdriver_manager.firefox import GeckoDriverManager
 import re
 import os
+import sys
+#the database directory, home of the scraper_common package shared by both scrapers
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
 import logging_helper
 from collections import deque
 import threading
 import traceback
 import random
-
-options = Options()
-service = Service(executable_path='/snap/bin/geckodriver')
-DRIVER = webdriver.Firefox(service=service, options=options)
+import argparse
+from scraper_common import page_cache
+from scraper_common import metrics
+from scraper_common import frontier
+from scraper_common import browser_pool
+
+#started by the first page fetched, see `get_browser`
+BROWSER = None
+#pages the browser loads before it is restarted, and its memory in MB above which it is restarted
+BROWSER_MAX_PAGES = 200
+BROWSER_MAX_RSS_MB = 1500
+#elements the browser waits for before a page is read, per page kind: the links and tags the extractors read
+WAIT_SELECTORS = {
+    'page': 'a.mntl-link-list__link, a.mntl-taxonomy-nodes__link',
+    'tag': 'a.mntl-card-list-items',
+    'article': 'a.mntl-sc-block-universal-featured-link__link',
+    'recipe': 'ul.mntl-universal-breadcrumbs',
+}
 
 
 BASE_WEBSITE = 'https://www.allrecipes.com/'
 WEBSITE_CATEGORIES = ['recipes-a-z-6735880', 'ingredients-a-z-6740416', 'cuisine-a-z-6740455']
 WEBSITE_ALT_CATEGORIES = ['recipes/85/holidays-and-events/', 'recipes/17562/dinner/']
 RECIPE_TAGS_PATH = '/home/bg-labs/bg_labs/fms/database/recipes/data/tags_lu.csv'
+PAGE_CACHE_PATH = '/home/bg-labs/bg_labs/fms/database/recipes/data/page_cache'
+METRICS_PATH = '/home/bg-labs/bg_labs/fms/database/recipes/data/metrics.prom'
+#seconds between rewrites of METRICS_PATH
+METRICS_INTERVAL = 15
+#keep a compressed copy of every fetched page in PAGE_CACHE_PATH so the tables can be rebuilt with --reparse
+CACHE_PAGES = True
+#serve every page from the page cache instead of Firefox, set by --reparse
+REPARSE = False
+PAGE_CACHE = None
+#shared crawl frontier for crawling with several processes, see `crawl_frontier`, None walks the tags at random
+FRONTIER_PATH = None
+#seconds to wait before asking an empty frontier again while other processes may still queue pages
+FRONTIER_POLL_SECONDS = 1
+#leases of a page whose handling raised before it is given up on and marked done instead of released again
+FRONTIER_MAX_ATTEMPTS = 3
 
 TAGS_LU_COLUMNS = ['id', 'tag', 'href']
 TAG_JUNC_COLUMNS = ['id', 'tag_id', 'recipe_id']
 
+#the metrics written to METRICS_PATH while the crawl runs, see `metrics.start`
+METRIC_HELP = {
+    'fetch_seconds': ('histogram', 'Time to load a page, by page kind.'),
+    'parse_seconds': ('histogram', 'Time to parse a page into a tree, by page kind.'),
+    'insert_seconds': ('histogram', 'Time to add the tags of a page to tags_lu.'),
+    'pages_total': ('counter', 'Pages loaded, by page kind.'),
+    'recipes_total': ('counter', 'Recipe pages gathered.'),
+    'errors_total': ('counter', 'Errors by kind.'),
+    'browser_restarts_total': ('counter', 'Browsers restarted, by reason: pages, memory or error.'),
+    'current_tag': ('gauge', 'Row of tags_lu the crawl is on.'),
+    'tags': ('gauge', 'Rows in tags_lu.'),
+    'per_second': ('gauge', 'Recipe pages gathered per second since the last write of the metrics file.'),
+}
+
 stop_event = threading.Event()
 
 def stop_listener():
@@ -38,21 +81,59 @@ def stop_listener():
     print("Stopping the Recipe Gather...Please be patient while we clean up you will be notified when it is safe to close")
     stop_event.set()
 
-def get_page_source(url: str)->BeautifulSoup:
-    """"""
-    global DRIVER
+def get_browser()->browser_pool.DriverPool:
+    """
+    Returns the pool of the one headless Firefox the crawl loads its pages in. The browser is started on the first
+    page, so a re-parse never opens one, and restarted after `BROWSER_MAX_PAGES` pages or `BROWSER_MAX_RSS_MB` of memory.
+    """
+    global BROWSER, BROWSER_MAX_PAGES, BROWSER_MAX_RSS_MB
+
+    if BROWSER is None:
+        BROWSER = browser_pool.DriverPool(1, max_pages=BROWSER_MAX_PAGES, max_rss_mb=BROWSER_MAX_RSS_MB)
+    return BROWSER
+
+def close_browser():
+    """
+    Quits the browser, if one was started.
+    """
+    global BROWSER
+
+    if BROWSER is not None:
+        BROWSER.close()
+        BROWSER = None
+
+def get_page_source(url: str, kind: str = 'page')->BeautifulSoup:
+    """
+    Loads a page in Firefox, or from the page cache when re-parsing, and parses it.
+    Fetched pages are stored in the page cache if one is open.
+    The page is read once it shows the elements of its kind in `WAIT_SELECTORS`.
+
+    Parameters:
+        url (str): The page to load.
+        kind (str): Label of the page in the metrics, e.g. 'tag', 'article' or 'recipe'.
+    """
+    global PAGE_CACHE, REPARSE, WAIT_SELECTORS
 
     try:
-        DRIVER.get(url)
-        bs = BeautifulSoup(DRIVER.page_source, 'html.parser')
+        with metrics.timer('fetch_seconds', kind=kind):
+            if REPARSE:
+                html = PAGE_CACHE.get(url)
+            else:
+                html = get_browser().fetch(url, WAIT_SELECTORS.get(kind))
+                if PAGE_CACHE is not None:
+                    PAGE_CACHE.store(url, html)
+        with metrics.timer('parse_seconds', kind=kind):
+            bs = BeautifulSoup(html, 'html.parser')
+        metrics.count('pages_total', kind=kind)
         return bs
     except:
         error = "Can't Reach URL:\t" + url
         print(error)
+        metrics.count('errors_total', kind="Can't Reach URL")
 
 def gather_list_of_tags():
     """Gathers all of the 'Types' links if the file does not exist"""
-    global TAGS_LU_COLUMNS, DRIVER, WEBSITE_CATEGORIES, BASE_WEBSITE, WEBSITE_ALT_CATEGORIES, RECIPE_TAGS_PATH
+    global TAGS_LU_COLUMNS, WEBSITE_CATEGORIES, BASE_WEBSITE, WEBSITE_ALT_CATEGORIES, RECIPE_TAGS_PATH
 
     types = pd.DataFrame(columns=TAGS_LU_COLUMNS)
 
@@ -219,7 +300,7 @@ def get_recipe_links_from_article(bs:BeautifulSoup)->list[str]:
     else:
         raise ValueError('Failed to get Recipe Links From Article')
 
-    return recipeLinks
+    return recipeHref
 
 def get_tag_id(tag:str, tag_lu)
 
@@ -228,9 +309,155 @@ def create_recipe_tag_rows(newTags:list[str], tag_lu:pd.DataFrame)->list[dict]:
     tagJuncRow = {'id', 'tag_id', 'recipe_id'}
     get_tag_id()
 
+def reparse(data_dir: str):
+    """
+    Rebuilds tags_lu into `data_dir` from the page cache, without network access. The crawl is a random walk
+    so it is not replayed, every cached page is read once in the order it was first fetched instead.
+
+    Parameters:
+        data_dir (str): The directory the rebuilt tables are written to, created if missing.
+
+    Raises:
+        ValueError: If the page cache is empty.
+    """
+    global PAGE_CACHE_PATH, PAGE_CACHE, REPARSE, RECIPE_TAGS_PATH
+
+    PAGE_CACHE = page_cache.PageCache(PAGE_CACHE_PATH)
+    urls = list(PAGE_CACHE.latest())
+    if not urls:
+        raise ValueError("No pages cached in " + PAGE_CACHE_PATH)
+    REPARSE = True
+    os.makedirs(data_dir, exist_ok=True)
+    RECIPE_TAGS_PATH = os.path.join(data_dir, os.path.basename(RECIPE_TAGS_PATH))
+
+    tags_lu = open_tags_lu()
+    for url in urls:
+        bs = get_page_source(url)
+        if bs is None:
+            continue
+        try:
+            tags_lu = add_new_tags(get_new_tags(bs), tags_lu)
+        except Exception as e:
+            metrics.count('errors_total', kind='Error Gathering New Tags')
+            print("Error Gathering New Tags:", e, "\nURL:", url)
+            logging_helper.add_to_log("Error Gathering New Tags: " + str(e), url, 'NA')
+
+    write_tags_lu(tags_lu)
+
+def page_tasks(kind: str, bs: BeautifulSoup, url: str)->list:
+    """
+    The pages a loaded page leads to, as `frontier.Frontier.add` tasks: the tags of tag and recipe pages, the
+    articles of tag pages and the recipes of article pages. Recipes go first, then articles, so the crawl
+    finishes what it found before opening more tags.
+    """
+    tasks = []
+    if kind in ('tag', 'recipe'):
+        try:
+            tasks += [(tag['href'], 'tag', {'tag': tag['tag']}, 0) for tag in get_new_tags(bs)]
+        except Exception as e:
+            metrics.count('errors_total', kind='Error Gathering New Tags')
+            print("Error Gathering New Tags:", e, "\nURL:", url)
+            logging_helper.add_to_log("Error Gathering New Tags: " + str(e), url, 'NA')
+    try:
+        if kind == 'tag':
+            tasks += [(href, 'article', None, 1) for href in get_article_links(get_card_links(bs))]
+        elif kind == 'article':
+            tasks += [(href, 'recipe', None, 2) for href in get_recipe_links_from_article(bs)]
+    except Exception as e:
+        metrics.count('errors_total', kind='Error Gathering Links')
+        print("Error Gathering Links:", e, "\nURL:", url)
+        logging_helper.add_to_log("Error Gathering Links: " + str(e), url, 'NA')
+    return tasks
+
+def merge_frontier_tags(shared: frontier.Frontier)->pd.DataFrame:
+    """
+    Adds every tag found by any process crawling the frontier to tags_lu and writes it, holding the frontier's
+    write lock so processes finishing together take turns. Tags already in tags_lu keep their IDs, new ones are
+    numbered on in the order they were found.
+    """
+    global TAGS_LU_COLUMNS
+
+    with shared.transaction():
+        tags_lu = open_tags_lu()
+        known = set(tags_lu['tag'])
+        next_id = int(tags_lu['id'].max()) + 1 if len(tags_lu) else 1
+        rows = []
+        for task in shared.tasks('tag'):
+            tag = task.data['tag']
+            if tag in known:
+                continue
+            known.add(tag)
+            rows.append({'id': next_id, 'tag': tag, 'href': task.url})
+            next_id += 1
+        if rows:
+            tags_lu = pd.concat([tags_lu, pd.DataFrame(rows, columns=TAGS_LU_COLUMNS)], ignore_index=True)
+        write_tags_lu(tags_lu)
+    return tags_lu
+
+def crawl_frontier(path: str):
+    """
+    Crawls the site through a shared frontier instead of a random walk, so any number of processes can crawl it
+    together and no page is loaded twice. Starts from the tags in tags_lu, every page queues the pages it links
+    to, see `page_tasks`, until every page is done or the crawl is stopped.
+
+    Parameters:
+        path (str): Path of the frontier database.
+
+    Notes:
+        - A page is only acknowledged once its links are queued, a page leased by a process that crashed is
+          handed out again once its lease runs out.
+        - A page leased as the crawl stops is released at once so another process can take it without waiting for
+          the lease to run out. A page whose handling raised is logged and released as well, after
+          `FRONTIER_MAX_ATTEMPTS` leases it is marked done instead, and the crawl goes on with the next page.
+        - tags_lu is rebuilt from the tags in the frontier on exit, see `merge_frontier_tags`.
+    """
+    global FRONTIER_POLL_SECONDS, FRONTIER_MAX_ATTEMPTS
+
+    shared = frontier.Frontier(path)
+    tags_lu = open_tags_lu()
+    shared.add([(href, 'tag', {'tag': tag}, 0) for tag, href in zip(tags_lu['tag'], tags_lu['href'])])
+    owner = frontier.owner_name()
+
+    while not stop_event.is_set():
+        tasks = shared.lease(owner)
+        if not tasks:
+            if shared.finished():
+                break
+            #other processes may still queue pages
+            stop_event.wait(FRONTIER_POLL_SECONDS)
+            continue
+        task = tasks[0]
+        if stop_event.is_set():
+            shared.release(task.id, owner)
+            break
+        try:
+            bs = get_page_source(task.url, task.kind)
+            found = []
+            if bs is not None:
+                found = page_tasks(task.kind, bs, task.url)
+                if task.kind == 'recipe':
+                    metrics.count('recipes_total')
+            shared.ack(task.id, owner, found)
+        except Exception as e:
+            metrics.count('errors_total', kind=metrics.error_kind(e))
+            print("Error Crawling Page:", e, "\nURL:", task.url, "\nAttempt:", task.attempts)
+            logging_helper.add_to_log("Error Crawling Page: " + str(e), task.url, task.attempts)
+            if task.attempts < FRONTIER_MAX_ATTEMPTS:
+                shared.release(task.id, owner)
+            else:
+                shared.ack(task.id, owner)
+        except BaseException:
+            #handed to another process now rather than once the lease runs out
+            shared.release(task.id, owner)
+            raise
+
+    tags_lu = merge_frontier_tags(shared)
+    metrics.set_gauge('tags', len(tags_lu))
+    print('Frontier:', shared.counts())
+
 def main():
     
-    global BASE_WEBSITE, DRIVER, RECIPE_TAGS_PATH
+    global BASE_WEBSITE, RECIPE_TAGS_PATH, PAGE_CACHE_PATH, PAGE_CACHE, CACHE_PAGES, METRICS_PATH, METRICS_INTERVAL, METRIC_HELP, FRONTIER_PATH
 
     recipeRow = {'recipe_id', 'name', 'servings', 'yeild' 'href'}
     ingredientJuncRow = {'id', 'item_id', 'recipe_id', 'unit_id', 'unit_amt', 'grouping'}
@@ -245,6 +472,15 @@ def main():
     listener_thread = threading.Thread(target=stop_listener, daemon=True)
     listener_thread.start()
 
+    if CACHE_PAGES:
+        PAGE_CACHE = page_cache.PageCache(PAGE_CACHE_PATH)
+    metrics.start(METRICS_PATH, METRICS_INTERVAL, 'recipe_scrape', METRIC_HELP, 'recipes_total')
+    if FRONTIER_PATH:
+        crawl_frontier(FRONTIER_PATH)
+        close_browser()
+        metrics.stop()
+        print(metrics.summary())
+        return
     tags_lu = open_tags_lu()
 
     bs = BeautifulSoup()
@@ -252,13 +488,17 @@ def main():
     while not stop_event.is_set():
         tagNum = select_random_from_DF(tags_lu)
         tagURL = tags_lu['href'].iloc[tagNum]
+        metrics.set_gauge('current_tag', tagNum)
+        metrics.set_gauge('tags', len(tags_lu))
         try:
-            bs = get_page_source(tagURL)
+            bs = get_page_source(tagURL, 'tag')
             if bs:
                 try:
                     newTags = get_new_tags(bs)
-                    tags_lu = add_new_tags(newTags, tags_lu)
+                    with metrics.timer('insert_seconds'):
+                        tags_lu = add_new_tags(newTags, tags_lu)
                 except Exception as e:
+                    metrics.count('errors_total', kind='Error Gathering New Tags')
                     print("Error Gathering New Tags:", e, "\nURL:", tagURL)
                     logging_helper.add_to_log("Error Gathering New Tags: " + e,tagURL, 'NA')
 
@@ -266,40 +506,61 @@ def main():
                     cardLinks = get_card_links(bs)
                     articleCards = get_article_links(cardLinks)
                 except:
+                    metrics.count('errors_total', kind='Error Gathering Card Links')
                     print("Error Gathering Card Link:", e, "\nURL:", tagURL)
                     logging_helper.add_to_log("Error Gathering Card Links: " + e,tagURL, 'NA')
                     continue
 
                 for article in articleCards:
                     try:
-                        bs = get_page_source(article)
+                        bs = get_page_source(article, 'article')
                         recipeLinks = get_recipe_links_from_article(bs)
                     except:
+                        metrics.count('errors_total', kind='Error Gathering Recipe Links')
                         print("Error Gathering Recipe Links:", e, "\nURL:", article)
                         logging_helper.add_to_log("Error Gathering Recipe Links: " + e, article, 'NA')
                         continue
                 for recipe in recipeLinks:
                     try:
-                        bs = get_page_source(recipe)
+                        bs = get_page_source(recipe, 'recipe')
                         newTags = get_new_tags(bs)
-                        tags_lu = add_new_tags(newTags, tags_lu)
+                        with metrics.timer('insert_seconds'):
+                            tags_lu = add_new_tags(newTags, tags_lu)
                         #build recipe row
                         #build tag junc row(s)
                         #build times junc row(s)
                         #build ingredient rows
                         #build method rows
                         #add all rows to data frames
+                        metrics.count('recipes_total')
                     except:
+                        metrics.count('errors_total', kind='Failed on Recipe Page Gather')
                         print('Failed on Recipe Page Gather:', e, recipe, 'N/A' )
 
 
         except Exception as e:
+            metrics.count('errors_total', kind=metrics.error_kind(e))
             print("Error:", e)
             continue
         
     write_tags_lu(tags_lu)
+    close_browser()
+    metrics.stop()
+    print(metrics.summary())
 
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Gathers the recipe data')
+    parser.add_argument('--no-cache', dest='cache_pages', action='store_false', help="don't store fetched pages in the page cache")
+    parser.add_argument('--reparse', metavar='DATA_DIR', help='rebuild the tables into DATA_DIR from the page cache, without network access')
+    parser.add_argument('--frontier', metavar='PATH', help='crawl the pages of the shared frontier database at PATH, with any number of processes')
+    args = parser.parse_args()
+
+    CACHE_PAGES = args.cache_pages
+    FRONTIER_PATH = args.frontier
+
+    if args.reparse:
+        reparse(args.reparse)
+    else:
+        main()
\ No newline at end of file
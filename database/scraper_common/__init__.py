@@ -0,0 +1,2 @@
+# Modules used by both the nutrition and the recipe scrapers. The scrapers put the database directory on sys.path
+# before importing them, e.g. `from scraper_common import frontier`.
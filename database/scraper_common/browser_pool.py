@@ -0,0 +1,201 @@
+import os
+import queue
+import threading
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.firefox.options import Options
+from selenium.webdriver.firefox.service import Service
+from selenium.webdriver.support.ui import WebDriverWait
+from . import metrics
+
+GECKODRIVER_PATH = '/snap/bin/geckodriver'
+#the scrapers only read the markup, so images, web fonts and media are never loaded
+FIREFOX_PREFS = {
+    'permissions.default.image': 2,
+    'gfx.downloadable_fonts.enabled': False,
+    'browser.display.use_document_fonts': 0,
+    'media.autoplay.default': 5,
+    'media.autoplay.blocking_policy': 2,
+    'media.mediasource.enabled': False,
+    'media.video_stats.enabled': False,
+}
+#seconds before a page load is given up
+PAGE_LOAD_TIMEOUT = 30
+#seconds to wait for the elements a page is fetched for, the page is used as it is after that
+WAIT_SECONDS = 10
+
+
+def make_firefox_driver(headless: bool = True) -> webdriver.Firefox:
+    """
+    Starts a Firefox WebDriver using the local geckodriver, with `FIREFOX_PREFS` set. Pages are handed over once
+    their DOM is ready, without waiting for styles, images or frames.
+
+    Parameters:
+        headless (bool): Runs the browser without a window when True.
+
+    Returns:
+        webdriver.Firefox: A running Firefox WebDriver instance.
+    """
+    options = Options()
+    if headless:
+        options.add_argument("--headless")
+    options.page_load_strategy = 'eager'
+    for name, value in FIREFOX_PREFS.items():
+        options.set_preference(name, value)
+    service = Service(executable_path=GECKODRIVER_PATH)
+
+    driver = webdriver.Firefox(service=service, options=options)
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    return driver
+
+def wait_for_elements(driver, selector: str, timeout: float = WAIT_SECONDS) -> bool:
+    """
+    Waits until the page of `driver` holds an element matching a CSS selector.
+
+    Returns:
+        bool: False if none showed up within `timeout` seconds.
+    """
+    try:
+        WebDriverWait(driver, timeout).until(lambda d: d.find_elements(By.CSS_SELECTOR, selector))
+        return True
+    except TimeoutException:
+        return False
+
+def process_rss(pid: int) -> int:
+    """
+    Resident memory in bytes of a process and every process below it, read from /proc.
+
+    Returns:
+        int: The memory, 0 where /proc is not available.
+    """
+    rss = 0
+    try:
+        with open('/proc/' + str(pid) + '/status', 'r') as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) * 1024
+                    break
+        for task in os.listdir('/proc/' + str(pid) + '/task'):
+            with open('/proc/' + str(pid) + '/task/' + task + '/children', 'r') as file:
+                rss += sum(process_rss(int(child)) for child in file.read().split())
+    except (OSError, ValueError):
+        pass
+    return rss
+
+def driver_rss(driver) -> int:
+    """
+    Resident memory in bytes of a WebDriver's geckodriver and the browser processes it started.
+    """
+    process = getattr(getattr(driver, 'service', None), 'process', None)
+    return process_rss(process.pid) if process is not None else 0
+
+
+class DriverPool:
+    """
+    Browsers shared by worker threads. A browser is started when a fetch finds none free, up to `size`, and
+    restarted after `max_pages` pages or once its memory passes `max_rss_mb`, so memory stays flat over long runs.
+    Safe to share between worker threads.
+
+    Parameters:
+        size (int): Most browsers running at once, a fetch waits for a free one.
+        factory (callable): Starts a browser, `make_firefox_driver` by default.
+        max_pages (int): Pages a browser loads before it is restarted, 0 for no limit.
+        max_rss_mb (float): Memory in MB of a browser with its child processes above which it is restarted,
+                            0 for no limit.
+
+    Notes:
+        - A browser that raised during a fetch is quit rather than reused, it may be wedged.
+        - Restarts are counted in the 'browser_restarts_total' metric, by reason.
+    """
+
+    def __init__(self, size: int = 1, factory=make_firefox_driver, max_pages: int = 200, max_rss_mb: float = 1500):
+        self.size = size
+        self.factory = factory
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.slots = threading.Semaphore(size)
+        self.idle = queue.LifoQueue()
+        self.closed = False
+
+    def fetch(self, url: str, wait_for: str = None) -> str:
+        """
+        Loads a page in a free browser.
+
+        Parameters:
+            url (str): The URL of the page.
+            wait_for (str): CSS selector of the elements the page is fetched for, waited on for `WAIT_SECONDS`.
+                            None returns the page once its DOM is ready.
+
+        Returns:
+            str: The page source.
+        """
+        entry = self.acquire()
+        healthy = False
+        try:
+            driver = entry[0]
+            driver.get(url)
+            entry[1] += 1
+            if wait_for:
+                wait_for_elements(driver, wait_for)
+            html = driver.page_source
+            healthy = True
+            return html
+        finally:
+            self.release(entry, healthy)
+
+    def acquire(self) -> list:
+        """
+        Takes a free browser as a [driver, pages loaded] entry, starting one if none is idle.
+        """
+        self.slots.acquire()
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return [self.factory(), 0]
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def release(self, entry: list, healthy: bool = True):
+        """
+        Gives a browser back, quitting it if it failed, is worn out or the pool was closed.
+        """
+        reason = self.worn(entry) if healthy else 'error'
+        if reason or self.closed:
+            self.quit(entry[0])
+            if reason:
+                metrics.count('browser_restarts_total', reason=reason)
+        else:
+            self.idle.put(entry)
+        self.slots.release()
+
+    def worn(self, entry: list) -> str:
+        """
+        The reason a browser is due for a restart, 'pages' or 'memory', None if it is not.
+        """
+        driver, pages = entry
+        if self.max_pages and pages >= self.max_pages:
+            return 'pages'
+        if self.max_rss_mb and driver_rss(driver) > self.max_rss_mb * 2**20:
+            return 'memory'
+        return None
+
+    def quit(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        """
+        Quits every idle browser, browsers in use are quit when they are given back.
+        """
+        self.closed = True
+        while True:
+            try:
+                self.quit(self.idle.get_nowait()[0])
+            except queue.Empty:
+                return
@@ -0,0 +1,304 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+# Crawl frontier shared by any number of scraper processes on one machine, kept in a SQLite database in WAL mode.
+# Every page to crawl is a task, unique by URL so a page is only ever queued once. Workers lease tasks and
+# acknowledge them once handled, a lease that runs out, e.g. because its worker crashed, is handed out again.
+# The database lives on a local disk, SQLite locking does not work over network file systems.
+
+#seconds a leased task is kept from other workers before it is handed out again
+LEASE_SECONDS = 600
+#seconds to wait for another process holding the write lock
+BUSY_TIMEOUT = 60
+
+PENDING, LEASED, DONE = 0, 1, 2
+
+Task = namedtuple('Task', ['id', 'url', 'kind', 'data', 'attempts'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    data TEXT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS tasks_ready ON tasks (state, priority DESC, id);
+CREATE INDEX IF NOT EXISTS tasks_leases ON tasks (state, lease_until);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, next_id INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS lookups (tbl TEXT NOT NULL, name TEXT NOT NULL, id INTEGER NOT NULL, PRIMARY KEY (tbl, name));
+CREATE TABLE IF NOT EXISTS claims (key INTEGER PRIMARY KEY, url TEXT NOT NULL);
+"""
+
+
+def signed_key(key: int) -> int:
+    """
+    An unsigned 64 bit key as the signed integer SQLite stores.
+    """
+    return key - 2**64 if key >= 2**63 else key
+
+def owner_name(worker: str = '') -> str:
+    """
+    Name of a worker in the leases, unique across the processes and threads of the machine.
+    """
+    return socket.gethostname() + ':' + str(os.getpid()) + ':' + str(worker or threading.get_ident())
+
+
+class Frontier:
+    """
+    Persistent crawl frontier with lease and acknowledge semantics. Safe to share between threads, every thread
+    gets its own connection, and between processes through SQLite's locking.
+
+    Parameters:
+        path (str): Path of the database, created if missing.
+        lease_seconds (float): Seconds a lease lasts.
+
+    Notes:
+        - Besides the tasks it hands out blocks of row IDs, see `allocate`, and interns lookup names, see `intern`,
+          so rows written by different processes never share an ID. It also keeps the keys of what was scraped,
+          see `claim`, so two processes never scrape the same thing from two pages.
+        - The database runs with synchronous=NORMAL, a power loss may undo the last acknowledgements, which only
+          means their tasks are handled again.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connect().executescript(SCHEMA)
+
+    def connect(self) -> sqlite3.Connection:
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self.local.db = db
+        return db
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs the body of a with block as one write transaction, taking the write lock up front.
+        """
+        db = self.connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def add(self, tasks: list, db: sqlite3.Connection = None) -> int:
+        """
+        Queues tasks, URLs that were ever queued before are skipped.
+
+        Parameters:
+            tasks (list): (url, kind, data, priority) tuples, data being any JSON serializable value.
+                          Tasks with a higher priority are leased first.
+            db (sqlite3.Connection): The connection of a running transaction, a new transaction if None.
+
+        Returns:
+            int: The tasks actually added.
+        """
+        if db is None:
+            with self.transaction() as db:
+                return self.add(tasks, db)
+        rows = [(url, kind, json.dumps(data), priority) for url, kind, data, priority in tasks]
+        before = db.total_changes
+        db.executemany('INSERT OR IGNORE INTO tasks (url, kind, data, priority) VALUES (?, ?, ?, ?)', rows)
+        return db.total_changes - before
+
+    def lease(self, owner: str, count: int = 1) -> list:
+        """
+        Leases the next tasks, highest priority first then in the order they were queued. Expired leases are
+        handed out again.
+
+        Parameters:
+            owner (str): The leasing worker, see `owner_name`.
+            count (int): Most tasks to lease.
+
+        Returns:
+            list: The leased `Task`s, empty if nothing is pending.
+        """
+        now = time.time()
+        with self.transaction() as db:
+            db.execute('UPDATE tasks SET state = ?, owner = NULL WHERE state = ? AND lease_until < ?', (PENDING, LEASED, now))
+            rows = db.execute('SELECT id, url, kind, data, attempts FROM tasks WHERE state = ? ORDER BY priority DESC, id LIMIT ?',
+                              (PENDING, count)).fetchall()
+            db.executemany('UPDATE tasks SET state = ?, owner = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?',
+                           [(LEASED, owner, now + self.lease_seconds, row[0]) for row in rows])
+        return [Task(id, url, kind, json.loads(data), attempts + 1) for id, url, kind, data, attempts in rows]
+
+    def ack(self, task_id: int, owner: str, add: list = ()) -> bool:
+        """
+        Marks a leased task as done and queues the tasks it found, in one transaction.
+
+        Parameters:
+            task_id (int): The task.
+            owner (str): The worker holding the lease.
+            add (list): Tasks to queue, see `add`.
+
+        Returns:
+            bool: False if the lease had run out and was taken by another worker, which will handle the task again.
+        """
+        with self.transaction() as db:
+            if add:
+                self.add(add, db)
+            return db.execute('UPDATE tasks SET state = ?, lease_until = NULL WHERE id = ? AND owner = ? AND state = ?',
+                              (DONE, task_id, owner, LEASED)).rowcount == 1
+
+    def release(self, task_id: int, owner: str):
+        """
+        Gives a leased task back without handling it, e.g. on stop.
+        """
+        with self.transaction() as db:
+            db.execute('UPDATE tasks SET state = ?, owner = NULL, lease_until = NULL WHERE id = ? AND owner = ? AND state = ?',
+                       (PENDING, task_id, owner, LEASED))
+
+    def requeue(self, urls: list) -> int:
+        """
+        Queues tasks that are done again, e.g. pages that failed to fetch.
+
+        Returns:
+            int: The tasks queued again.
+        """
+        with self.transaction() as db:
+            before = db.total_changes
+            db.executemany('UPDATE tasks SET state = ?, owner = NULL, lease_until = NULL WHERE url = ? AND state = ?',
+                           [(PENDING, url, DONE) for url in urls])
+            return db.total_changes - before
+
+    def counts(self) -> dict:
+        """
+        Number of tasks per state, keyed 'pending', 'leased' and 'done'.
+        """
+        names = {PENDING: 'pending', LEASED: 'leased', DONE: 'done'}
+        counts = dict.fromkeys(names.values(), 0)
+        for state, count in self.connect().execute('SELECT state, COUNT(*) FROM tasks GROUP BY state'):
+            counts[names[state]] = count
+        return counts
+
+    def finished(self) -> bool:
+        """
+        True once every task is done. A task leased by a worker that is still running may still queue more.
+        """
+        counts = self.counts()
+        return counts['done'] > 0 and not counts['pending'] and not counts['leased']
+
+    def allocate(self, name: str, count: int, floor: int = 1) -> range:
+        """
+        Takes a block of IDs from a shared counter.
+
+        Parameters:
+            name (str): The counter, e.g. 'item_id'.
+            count (int): IDs to take.
+            floor (int): Lowest ID the block may start at, e.g. the first free ID of the local table.
+
+        Returns:
+            range: The IDs, never handed out to anyone else.
+        """
+        with self.transaction() as db:
+            db.execute('INSERT OR IGNORE INTO counters (name, next_id) VALUES (?, ?)', (name, floor))
+            db.execute('UPDATE counters SET next_id = MAX(next_id, ?) + ? WHERE name = ?', (floor, count, name))
+            end = db.execute('SELECT next_id FROM counters WHERE name = ?', (name,)).fetchone()[0]
+        return range(end - count, end)
+
+    def intern(self, table: str, name: str) -> int:
+        """
+        Returns the shared ID of a lookup name, adding it with the next ID of the table if it is new.
+        """
+        row = self.connect().execute('SELECT id FROM lookups WHERE tbl = ? AND name = ?', (table, name)).fetchone()
+        if row is not None:
+            return row[0]
+        with self.transaction() as db:
+            row = db.execute('SELECT id FROM lookups WHERE tbl = ? AND name = ?', (table, name)).fetchone()
+            if row is not None:
+                return row[0]
+            db.execute('INSERT OR IGNORE INTO counters (name, next_id) VALUES (?, 1)', (table,))
+            id = db.execute('SELECT next_id FROM counters WHERE name = ?', (table,)).fetchone()[0]
+            db.execute('UPDATE counters SET next_id = ? WHERE name = ?', (id + 1, table))
+            db.execute('INSERT INTO lookups (tbl, name, id) VALUES (?, ?, ?)', (table, name, id))
+        return id
+
+    def seed_lookup(self, table: str, entries: list):
+        """
+        Adds the entries of a local lookup table, so a data set started without the frontier keeps its IDs.
+
+        Parameters:
+            table (str): The lookup table.
+            entries (list): [id, name] pairs.
+
+        Raises:
+            ValueError: If a name already has another ID, or an ID another name, in the frontier.
+        """
+        with self.transaction() as db:
+            for id, name in entries:
+                row = db.execute('SELECT id FROM lookups WHERE tbl = ? AND name = ?', (table, name)).fetchone()
+                if row is None:
+                    taken = db.execute('SELECT name FROM lookups WHERE tbl = ? AND id = ?', (table, id)).fetchone()
+                    if taken is not None:
+                        raise ValueError('Lookup ID conflict in ' + table + ': ' + str(id) + ' is ' + repr(taken[0]) + ' in the frontier, not ' + repr(name))
+                    db.execute('INSERT INTO lookups (tbl, name, id) VALUES (?, ?, ?)', (table, name, id))
+                elif row[0] != id:
+                    raise ValueError('Lookup ID conflict in ' + table + ': ' + repr(name) + ' is ' + str(row[0]) + ' in the frontier, not ' + str(id))
+            if entries:
+                top = max(id for id, _ in entries) + 1
+                db.execute('INSERT OR IGNORE INTO counters (name, next_id) VALUES (?, ?)', (table, top))
+                db.execute('UPDATE counters SET next_id = MAX(next_id, ?) WHERE name = ?', (top, table))
+
+    def claim(self, claims: list) -> list:
+        """
+        Claims keys for the pages they are scraped from, e.g. the (name, brand) and UPC keys of an item for its
+        item page. A page may claim its keys again, e.g. when it is handled again after a crash.
+
+        Parameters:
+            claims (list): (keys, url) tuples, keys being a list of unsigned 64 bit integers.
+
+        Returns:
+            list: For each claim True if none of its keys was claimed for another page, its keys are then claimed
+                  for its page. Claims are made in order in one transaction, a claim sees those before it.
+        """
+        claimed = []
+        with self.transaction() as db:
+            for keys, url in claims:
+                keys = [signed_key(key) for key in keys]
+                placeholders = ', '.join(['?'] * len(keys))
+                owners = db.execute('SELECT url FROM claims WHERE key IN (' + placeholders + ')', keys).fetchall() if keys else []
+                free = all(owner == url for owner, in owners)
+                if free:
+                    db.executemany('INSERT OR IGNORE INTO claims (key, url) VALUES (?, ?)', [(key, url) for key in keys])
+                claimed.append(free)
+        return claimed
+
+    def seed_claims(self, keys: list):
+        """
+        Adds keys scraped before the frontier was used, so no process scrapes them again. They belong to no page.
+        """
+        with self.transaction() as db:
+            db.executemany("INSERT OR IGNORE INTO claims (key, url) VALUES (?, '')", [(signed_key(key),) for key in keys])
+
+    def tasks(self, kind: str) -> list:
+        """
+        Every task of a kind, in the order they were queued.
+        """
+        rows = self.connect().execute('SELECT id, url, kind, data, attempts FROM tasks WHERE kind = ? ORDER BY id', (kind,))
+        return [Task(id, url, kind, json.loads(data), attempts) for id, url, kind, data, attempts in rows]
+
+    def close(self):
+        db = getattr(self.local, 'db', None)
+        if db is not None:
+            db.close()
+            self.local.db = None
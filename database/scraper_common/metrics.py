@@ -0,0 +1,233 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+#upper bounds of the histogram buckets in seconds, a fetch through the Selenium fallback can take tens of seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+NAMESPACE = 'scrape'
+HELP = {}
+RATE_COUNTER = None
+
+lock = threading.Lock()
+counters = {}
+gauges = {}
+histograms = {}
+started = time.time()
+last_rate = (started, 0)
+writer = None
+stop_writing = threading.Event()
+
+
+def start(path: str, interval: float, namespace: str, help: dict = None, rate_counter: str = None):
+    """
+    Clears the metrics and starts rewriting them to `path` every `interval` seconds in the Prometheus text format.
+
+    Parameters:
+        path (str): The metrics file, rewritten atomically so a reader never sees half of it. None to only keep
+                    the metrics in memory for `summary`.
+        interval (float): Seconds between writes.
+        namespace (str): Prefix of every metric name, e.g. 'nut_scrape'.
+        help (dict): Maps a metric name to its (type, help text), type being 'counter', 'gauge' or 'histogram'.
+        rate_counter (str): A counter whose rate is published as the 'per_second' gauge, e.g. 'items_total'.
+    """
+    global NAMESPACE, HELP, RATE_COUNTER, counters, gauges, histograms, started, last_rate, writer
+
+    stop()
+    with lock:
+        NAMESPACE = namespace
+        HELP = dict(help or {})
+        RATE_COUNTER = rate_counter
+        counters, gauges, histograms = {}, {}, {}
+        started = time.time()
+        last_rate = (started, 0)
+
+    if path:
+        stop_writing.clear()
+        writer = threading.Thread(target=write_periodically, args=(path, interval), daemon=True)
+        writer.start()
+
+def stop(path: str = None):
+    """
+    Stops the periodic writer after one last write, so the file holds the final values.
+    """
+    global writer
+
+    if writer is not None:
+        stop_writing.set()
+        writer.join()
+        writer = None
+    elif path:
+        write(path)
+
+def write_periodically(path: str, interval: float):
+    while not stop_writing.wait(interval):
+        write(path)
+    write(path)
+
+def labels_key(labels: dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def count(name: str, amount: float = 1, **labels):
+    """
+    Adds `amount` to a counter, e.g. count('errors_total', kind='Failed to Get Category').
+    """
+    key = (name, labels_key(labels))
+    with lock:
+        counters[key] = counters.get(key, 0) + amount
+
+def set_gauge(name: str, value: float, **labels):
+    with lock:
+        gauges[(name, labels_key(labels))] = value
+
+def remove_gauge(name: str, **labels):
+    with lock:
+        gauges.pop((name, labels_key(labels)), None)
+
+def observe(name: str, seconds: float, **labels):
+    """
+    Adds a duration to a histogram.
+    """
+    key = (name, labels_key(labels))
+    with lock:
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram['buckets'][i] += 1
+                break
+        histogram['sum'] += seconds
+        histogram['count'] += 1
+
+@contextmanager
+def timer(name: str, **labels):
+    """
+    Times the body of a with block into a histogram. Nothing is recorded if the body raises.
+    """
+    start = time.perf_counter()
+    yield
+    observe(name, time.perf_counter() - start, **labels)
+
+def error_kind(e: Exception) -> str:
+    """
+    Short label for an error. The scrapers raise ValueErrors whose message names the failure followed by the
+    offending value in brackets or after a colon, only the name is kept so the label set stays small.
+    """
+    if isinstance(e, ValueError) and e.args:
+        return str(e.args[0]).split('[')[0].split(':')[0].strip(' ,') or type(e).__name__
+    return type(e).__name__
+
+def total(name: str) -> float:
+    """
+    Sums a counter over all of its labels.
+    """
+    with lock:
+        return sum(value for (key, _), value in counters.items() if key == name)
+
+def update_rate():
+    """
+    Publishes the rate of `RATE_COUNTER` since the last call as the 'per_second' gauge.
+    """
+    global last_rate
+
+    if RATE_COUNTER is None:
+        return
+    now, value = time.time(), total(RATE_COUNTER)
+    then, before = last_rate
+    if now > then:
+        set_gauge('per_second', (value - before) / (now - then), counter=RATE_COUNTER)
+    last_rate = (now, value)
+
+def format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ''
+    escaped = [(key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for key, value in pairs]
+    return '{' + ','.join(key + '="' + value + '"' for key, value in escaped) + '}'
+
+def format_bound(bound: float) -> str:
+    return repr(float(bound))
+
+def render() -> str:
+    """
+    Returns every metric in the Prometheus text exposition format, plus the seconds since `start` as 'uptime_seconds'.
+    """
+    with lock:
+        lines = []
+        described = set()
+        def header(name, kind):
+            if name in described:
+                return
+            described.add(name)
+            kind, text = HELP.get(name, (kind, ''))
+            if text:
+                lines.append('# HELP ' + NAMESPACE + '_' + name + ' ' + text)
+            lines.append('# TYPE ' + NAMESPACE + '_' + name + ' ' + kind)
+
+        header('uptime_seconds', 'gauge')
+        lines.append(NAMESPACE + '_uptime_seconds ' + str(round(time.time() - started, 3)))
+        for (name, labels), value in sorted(counters.items()):
+            header(name, 'counter')
+            lines.append(NAMESPACE + '_' + name + format_labels(labels) + ' ' + str(value))
+        for (name, labels), value in sorted(gauges.items()):
+            header(name, 'gauge')
+            lines.append(NAMESPACE + '_' + name + format_labels(labels) + ' ' + str(value))
+        for (name, labels), histogram in sorted(histograms.items()):
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS, histogram['buckets']):
+                cumulative += bucket
+                lines.append(NAMESPACE + '_' + name + '_bucket' + format_labels(labels, (('le', format_bound(bound)),)) + ' ' + str(cumulative))
+            lines.append(NAMESPACE + '_' + name + '_bucket' + format_labels(labels, (('le', '+Inf'),)) + ' ' + str(histogram['count']))
+            lines.append(NAMESPACE + '_' + name + '_sum' + format_labels(labels) + ' ' + str(round(histogram['sum'], 6)))
+            lines.append(NAMESPACE + '_' + name + '_count' + format_labels(labels) + ' ' + str(histogram['count']))
+    return '\n'.join(lines) + '\n'
+
+def write(path: str):
+    """
+    Rewrites the metrics file through a temp file and a rename.
+    """
+    update_rate()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        file.write(render())
+    os.replace(tmp_path, path)
+
+def quantile(histogram: dict, q: float) -> float:
+    """
+    Upper bound of the bucket holding the `q` quantile of a histogram, None past the last bucket.
+    """
+    rank = q * histogram['count']
+    cumulative = 0
+    for bound, bucket in zip(BUCKETS, histogram['buckets']):
+        cumulative += bucket
+        if cumulative >= rank:
+            return bound
+    return None
+
+def summary() -> str:
+    """
+    Human readable summary of the run, e.g. to print at shutdown. Histograms are given as count, mean and
+    the bucket bounds of their median and 95th percentile.
+    """
+    elapsed = time.time() - started
+    lines = ['Run summary after ' + str(timedelta(seconds=round(elapsed)))]
+    with lock:
+        for (name, labels), value in sorted(counters.items()):
+            line = '  ' + name + format_labels(labels) + ': ' + str(value)
+            if name == RATE_COUNTER and elapsed > 0:
+                line += ' (%.2f/s)' % (value / elapsed)
+            lines.append(line)
+        for (name, labels), histogram in sorted(histograms.items()):
+            if not histogram['count']:
+                continue
+            p50, p95 = quantile(histogram, 0.5), quantile(histogram, 0.95)
+            lines.append('  %s%s: n=%d, mean=%.1fms, p50<=%s, p95<=%s, total=%.1fs' % (
+                name, format_labels(labels), histogram['count'], histogram['sum'] * 1000 / histogram['count'],
+                '%gs' % p50 if p50 is not None else '>' + str(BUCKETS[-1]) + 's',
+                '%gs' % p95 if p95 is not None else '>' + str(BUCKETS[-1]) + 's', histogram['sum']))
+    return '\n'.join(lines)
@@ -0,0 +1,158 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+COMPRESS_LEVEL = 6
+
+
+class PageCache:
+    """
+    Content-addressed store of every fetched page. Pages are gzip compressed and stored once per distinct content
+    under their sha256, an append-only index records which URL returned which content and when.
+
+    Layout:
+        <root>/objects/ab/cdef....html.gz   the page whose sha256 is 'abcdef...'
+        <root>/index.jsonl                  one {"url", "sha256", "time"} line per fetch
+
+    Parameters:
+        root (str): Directory of the cache, created if missing.
+
+    Notes:
+        - Safe to share between worker threads, and between processes: objects are written under a temporary name
+          and moved into place, index lines are appended in one write each.
+        - A page fetched again with the same content only adds an index line.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.index_path = os.path.join(root, 'index.jsonl')
+        self.lock = threading.Lock()
+        self.urls = None
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.root, 'objects', digest[:2], digest[2:] + '.html.gz')
+
+    def store(self, url: str, html: str) -> str:
+        """
+        Adds a fetched page to the cache.
+
+        Parameters:
+            url (str): The URL the page was fetched from.
+            html (str): The page source.
+
+        Returns:
+            str: The sha256 of the page.
+        """
+        data = html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + '.' + str(os.getpid()) + '.' + str(threading.get_ident()) + '.tmp'
+            with open(tmp_path, 'wb') as file:
+                file.write(gzip.compress(data, compresslevel=COMPRESS_LEVEL))
+            os.replace(tmp_path, path)
+
+        line = json.dumps({'url': url, 'sha256': digest, 'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+        with self.lock:
+            with open(self.index_path, 'a') as file:
+                file.write(line + '\n')
+            if self.urls is not None:
+                self.urls[url] = digest
+        return digest
+
+    def load(self, digest: str) -> str:
+        """
+        Returns the page stored under a sha256.
+        """
+        with open(self.object_path(digest), 'rb') as file:
+            return gzip.decompress(file.read()).decode('utf-8')
+
+    def latest(self) -> dict:
+        """
+        Maps every URL in the index to the sha256 of its most recent fetch, in the order the URLs were first fetched.
+        """
+        with self.lock:
+            if self.urls is None:
+                urls = {}
+                if os.path.exists(self.index_path):
+                    with open(self.index_path, 'r') as file:
+                        for line in file:
+                            try:
+                                entry = json.loads(line)
+                            except json.JSONDecodeError:
+                                continue
+                            urls[entry['url']] = entry['sha256']
+                self.urls = urls
+            return self.urls
+
+    def get(self, url: str) -> str:
+        """
+        Returns the most recent copy of a URL.
+
+        Raises:
+            KeyError: If the URL was never fetched.
+        """
+        return self.load(self.latest()[url])
+
+
+class CachingFetcher:
+    """
+    Wraps a fetcher so every page it fetches is stored in a `PageCache`.
+
+    Parameters:
+        fetcher: The wrapped fetcher.
+        cache (PageCache): The cache pages are stored in.
+    """
+
+    def __init__(self, fetcher, cache: PageCache):
+        self.fetcher = fetcher
+        self.cache = cache
+
+    def fetch(self, url: str) -> str:
+        html = self.fetcher.fetch(url)
+        self.cache.store(url, html)
+        return html
+
+    def close(self):
+        self.fetcher.close()
+
+
+class AsyncCachingFetcher:
+    """
+    Async version of `CachingFetcher` for fetchers from `async_fetch`.
+    """
+
+    def __init__(self, fetcher, cache: PageCache):
+        self.fetcher = fetcher
+        self.cache = cache
+
+    async def fetch(self, url: str) -> str:
+        html = await self.fetcher.fetch(url)
+        self.cache.store(url, html)
+        return html
+
+
+class CacheFetcher:
+    """
+    Fetcher that serves pages from a `PageCache` only, never touching the network. Used to re-parse a crawl.
+
+    Parameters:
+        cache (PageCache): The cache to read.
+    """
+
+    def __init__(self, cache: PageCache):
+        self.cache = cache
+
+    def fetch(self, url: str) -> str:
+        try:
+            return self.cache.get(url)
+        except KeyError:
+            raise ValueError("Page not in cache: " + url)
+
+    def close(self):
+        pass
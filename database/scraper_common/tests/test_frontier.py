@@ -0,0 +1,145 @@
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import unittest
+from collections import Counter
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, '..', '..'))
+
+from scraper_common import frontier
+
+# Tests of the crawl frontier with several processes sharing one database, as the scrapers run with --frontier.
+#
+#   python -m pytest database/scraper_common/tests
+
+#pages of the synthetic site, page i links to pages 2i+1 and 2i+2 and back to page i // 2, already queued
+PAGES = 40
+PROCESSES = 4
+
+
+def page_url(num: int) -> str:
+    return 'https://example.com/page/' + str(num)
+
+def page_links(num: int) -> list:
+    return [(page_url(link), 'page', {'num': link}, 0) for link in (2 * num + 1, 2 * num + 2, num // 2) if link < PAGES]
+
+def crawl(path: str, worker: int, handled):
+    """
+    Worker process: leases pages until the frontier is finished, queueing the links of every page it handles.
+    """
+    shared = frontier.Frontier(path, lease_seconds=30)
+    owner = frontier.owner_name(worker)
+    while True:
+        tasks = shared.lease(owner)
+        if not tasks:
+            if shared.finished():
+                return
+            time.sleep(0.01)
+            continue
+        task = tasks[0]
+        handled.put(task.url)
+        shared.ack(task.id, owner, page_links(task.data['num']))
+
+def lease_and_die(path: str, lease_seconds: float, leased):
+    """
+    Worker process that leases a page and exits without acknowledging it, as a crashed scraper does.
+    """
+    shared = frontier.Frontier(path, lease_seconds=lease_seconds)
+    task = shared.lease(frontier.owner_name('crashed'))[0]
+    leased.put((task.id, frontier.owner_name('crashed')))
+    leased.close()
+    leased.join_thread()
+    os._exit(3)
+
+def claim_keys(path: str, url: str, start, claimed):
+    """
+    Worker process claiming the same keys as every other one, each for its own URL.
+    """
+    shared = frontier.Frontier(path)
+    start.wait()
+    claimed.put((url, shared.claim([([1, 2**64 - 1], url)])[0]))
+
+
+class FrontierProcessTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'frontier.db')
+        self.context = multiprocessing.get_context('spawn')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def run_processes(self, target, args_list: list):
+        processes = [self.context.Process(target=target, args=args) for args in args_list]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+        return [process.exitcode for process in processes]
+
+    def test_every_page_is_handled_once(self):
+        frontier.Frontier(self.path).add([(page_url(0), 'page', {'num': 0}, 0)])
+        handled = self.context.Queue()
+
+        codes = self.run_processes(crawl, [(self.path, worker, handled) for worker in range(PROCESSES)])
+
+        self.assertEqual(codes, [0] * PROCESSES)
+        urls = Counter(handled.get(timeout=5) for _ in range(PAGES))
+        self.assertTrue(handled.empty())
+        self.assertEqual(set(urls), {page_url(num) for num in range(PAGES)})
+        self.assertEqual(max(urls.values()), 1)
+        self.assertEqual(frontier.Frontier(self.path).counts(), {'pending': 0, 'leased': 0, 'done': PAGES})
+
+    def test_lease_of_crashed_process_runs_out(self):
+        shared = frontier.Frontier(self.path, lease_seconds=30)
+        shared.add([(page_url(0), 'page', {'num': 0}, 0)])
+        leased = self.context.Queue()
+
+        self.assertEqual(self.run_processes(lease_and_die, [(self.path, 1, leased)]), [3])
+        task_id, crashed_owner = leased.get(timeout=5)
+
+        self.assertEqual(shared.lease(frontier.owner_name('other')), [])
+        time.sleep(1.1)
+        task = shared.lease(frontier.owner_name('other'))[0]
+        self.assertEqual((task.id, task.attempts), (task_id, 2))
+        self.assertFalse(shared.ack(task_id, crashed_owner))
+        self.assertTrue(shared.ack(task_id, frontier.owner_name('other')))
+        self.assertTrue(shared.finished())
+
+    def test_requeue_only_done_pages(self):
+        shared = frontier.Frontier(self.path)
+        owner = frontier.owner_name('worker')
+        shared.add([(page_url(0), 'page', {'num': 0}, 0), (page_url(1), 'page', {'num': 1}, 0)])
+        first = shared.lease(owner)[0]
+        shared.ack(first.id, owner)
+
+        self.assertEqual(shared.requeue([page_url(0), page_url(1)]), 1)
+        self.assertEqual(shared.add([(page_url(0), 'page', {'num': 0}, 0)]), 0)
+        self.assertEqual(shared.counts(), {'pending': 2, 'leased': 0, 'done': 0})
+        again = shared.lease(owner, 2)
+        self.assertEqual(sorted((task.url, task.attempts) for task in again), [(page_url(0), 2), (page_url(1), 1)])
+
+    def test_keys_are_claimed_by_one_process(self):
+        frontier.Frontier(self.path)
+        start, claimed = self.context.Event(), self.context.Queue()
+        processes = [self.context.Process(target=claim_keys, args=(self.path, page_url(num), start, claimed)) for num in range(PROCESSES)]
+        for process in processes:
+            process.start()
+        start.set()
+        for process in processes:
+            process.join(60)
+
+        results = dict(claimed.get(timeout=5) for _ in range(PROCESSES))
+        winners = [url for url, won in results.items() if won]
+        self.assertEqual(len(winners), 1)
+        shared = frontier.Frontier(self.path)
+        self.assertEqual(shared.claim([([1], winners[0])]), [True])
+        self.assertEqual(shared.claim([([2**64 - 1], page_url(PROCESSES))]), [False])
+
+
+if __name__ == '__main__':
+    unittest.main()